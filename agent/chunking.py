@@ -0,0 +1,63 @@
+"""
+Split streamed agent text into WhatsApp-sized messages.
+"""
+import re
+from typing import List
+
+# End of a sentence: punctuation (optionally followed by closing quotes,
+# parentheses or emoji) and then whitespace
+SENTENCE_END = re.compile(r"[.!?…]+[\"')\]]*(?:\s*[\U0001F300-\U0001FAFF☀-➿])*\s+")
+PARAGRAPH_END = re.compile(r"\n\s*\n")
+
+
+class SentenceChunker:
+    """
+    Incrementally split a text stream at paragraph and sentence boundaries.
+
+    Paragraph breaks always end a chunk. Sentences are grouped until a
+    chunk reaches ``min_chars`` so short sentences are not sent one by one.
+    """
+
+    def __init__(self, min_chars: int = 80):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        """
+        Add streamed text.
+
+        Args:
+            delta: Newly generated text
+
+        Returns:
+            Chunks that are complete and can be sent now
+        """
+        self._buffer += delta
+        chunks = []
+
+        while True:
+            cut = self._next_cut()
+            if cut is None:
+                break
+            chunk, self._buffer = self._buffer[:cut].strip(), self._buffer[cut:]
+            if chunk:
+                chunks.append(chunk)
+
+        return chunks
+
+    def flush(self) -> List[str]:
+        """Return whatever text is left once the stream has ended."""
+        chunk, self._buffer = self._buffer.strip(), ""
+        return [chunk] if chunk else []
+
+    def _next_cut(self):
+        paragraph = PARAGRAPH_END.search(self._buffer)
+        if paragraph:
+            return paragraph.end()
+
+        cut = None
+        for match in SENTENCE_END.finditer(self._buffer):
+            cut = match.end()
+            if cut >= self.min_chars:
+                return cut
+        return None
@@ -0,0 +1,266 @@
+"""
+Semantic search over the knowledge base with cached vector embeddings.
+
+Embeddings are computed once per entry and stored as a memory-mapped NumPy
+matrix named after a content hash of the corpus. When the knowledge base
+changes only new or edited entries are re-embedded.
+"""
+import hashlib
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from agent.retrieval import TOKEN_PATTERN, fold_accents, stem
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBackend(ABC):
+    """Turns texts into L2-normalized vectors."""
+
+    name: str
+    dim: int
+
+    @abstractmethod
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed a batch of texts.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            float32 matrix of shape (len(texts), dim) with unit-length rows
+        """
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Deterministic, offline embedding based on hashed features.
+
+    Each text is represented by its stemmed words and the character n-grams
+    of its accent-folded words, hashed into a fixed number of signed buckets.
+    Useful for tests and as a dependency-free fallback.
+    """
+
+    def __init__(self, dim: int = 512, ngram_range: Tuple[int, int] = (3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        for word in TOKEN_PATTERN.findall(fold_accents(text)):
+            features.append(f"w:{stem(word)}")
+            padded = f"<{word}>"
+            low, high = self.ngram_range
+            for n in range(low, high + 1):
+                features.extend(
+                    f"c:{padded[i:i + n]}" for i in range(max(len(padded) - n + 1, 0))
+                )
+        return features
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                sign = 1.0 if value & 1 else -1.0
+                matrix[row, (value >> 1) % self.dim] += sign
+        return _normalize(matrix)
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """Embeddings from the OpenAI embeddings API."""
+
+    DIMENSIONS = {
+        "text-embedding-3-small": 1536,
+        "text-embedding-3-large": 3072,
+        "text-embedding-ada-002": 1536,
+    }
+
+    def __init__(self, model: Optional[str] = None, batch_size: int = 256):
+        from openai import OpenAI
+
+        self.model = model or settings.embedding_model
+        self.dim = self.DIMENSIONS.get(self.model, 1536)
+        self.name = f"openai-{self.model}"
+        self.batch_size = batch_size
+        self.client = OpenAI(api_key=settings.openai_api_key)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            response = self.client.embeddings.create(
+                model=self.model, input=list(texts[start:start + self.batch_size])
+            )
+            vectors.extend(item.embedding for item in response.data)
+        return _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dim))
+
+
+def get_embedding_backend(name: Optional[str] = None) -> EmbeddingBackend:
+    """
+    Create the embedding backend configured in settings.
+
+    Args:
+        name: Backend name ("hashing" or "openai"); defaults to settings
+
+    Returns:
+        Embedding backend instance
+    """
+    name = name or settings.embedding_backend
+    if name == "hashing":
+        return HashingEmbeddingBackend()
+    if name == "openai":
+        return OpenAIEmbeddingBackend()
+    raise ValueError(f"Unknown embedding backend: {name}")
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingIndex:
+    """
+    Cosine-similarity index over a list of texts with an on-disk cache.
+
+    Cache layout in the cache directory, per namespace and backend:
+        <namespace>-<backend>-<corpus hash>.npy  embedding matrix (memory-mapped)
+        <namespace>-<backend>.json               manifest: corpus hash and entry hashes
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        texts: Sequence[str],
+        backend: EmbeddingBackend,
+        cache_dir: Optional[str] = None,
+    ):
+        self.namespace = namespace
+        self.backend = backend
+        self.cache_dir = Path(cache_dir or settings.embedding_cache_dir)
+        self.entry_hashes = [_text_hash(text) for text in texts]
+        self.corpus_hash = _text_hash("\n".join(self.entry_hashes))[:16]
+        self.matrix = self._load_or_build(texts)
+
+    def __len__(self) -> int:
+        return len(self.entry_hashes)
+
+    @property
+    def _prefix(self) -> str:
+        return f"{self.namespace}-{self.backend.name}"
+
+    def _matrix_path(self, corpus_hash: str) -> Path:
+        return self.cache_dir / f"{self._prefix}-{corpus_hash}.npy"
+
+    def _load_or_build(self, texts: Sequence[str]) -> np.ndarray:
+        path = self._matrix_path(self.corpus_hash)
+        if path.exists():
+            return np.load(path, mmap_mode="r")
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path = self.cache_dir / f"{self._prefix}.json"
+
+        # Reuse vectors of unchanged entries from the previous build
+        previous: Dict[str, np.ndarray] = {}
+        old_path: Optional[Path] = None
+        if manifest_path.exists():
+            try:
+                manifest = json.loads(manifest_path.read_text())
+                old_path = self._matrix_path(manifest["corpus_hash"])
+                old_matrix = np.load(old_path, mmap_mode="r")
+                previous = {
+                    entry_hash: old_matrix[row]
+                    for row, entry_hash in enumerate(manifest["entries"])
+                }
+            except (OSError, KeyError, ValueError) as e:
+                logger.warning(f"Ignoring embedding cache for {self.namespace}: {e}")
+
+        missing = [i for i, h in enumerate(self.entry_hashes) if h not in previous]
+        matrix = np.zeros((len(texts), self.backend.dim), dtype=np.float32)
+        for row, entry_hash in enumerate(self.entry_hashes):
+            if entry_hash in previous:
+                matrix[row] = previous[entry_hash]
+
+        if missing:
+            matrix[missing] = self.backend.embed([texts[i] for i in missing])
+
+        logger.info(
+            f"Embedded {len(missing)} of {len(texts)} {self.namespace} entries "
+            f"with {self.backend.name}"
+        )
+
+        # Write atomically, then point the manifest at the new matrix
+        tmp_path = path.with_suffix(".tmp.npy")
+        np.save(tmp_path, matrix)
+        os.replace(tmp_path, path)
+        manifest_path.write_text(json.dumps({
+            "corpus_hash": self.corpus_hash,
+            "entries": self.entry_hashes,
+        }))
+        if old_path is not None and old_path != path:
+            old_path.unlink(missing_ok=True)
+
+        return np.load(path, mmap_mode="r")
+
+    def search_many(self, queries: Sequence[str], k: int = 5) -> List[List[Tuple[int, float]]]:
+        """
+        Rank entries for several queries at once.
+
+        Args:
+            queries: Query texts
+            k: Maximum number of results per query
+
+        Returns:
+            For each query, (entry position, cosine similarity) pairs, best first
+        """
+        if not len(self) or not queries:
+            return [[] for _ in queries]
+
+        scores = self.backend.embed(queries) @ self.matrix.T
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+        results = []
+        for row, candidates in enumerate(top):
+            ordered = candidates[np.argsort(-scores[row, candidates])]
+            results.append([(int(i), float(scores[row, i])) for i in ordered])
+        return results
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Rank entries for a single query."""
+        return self.search_many([query], k=k)[0]
+
+
+def reciprocal_rank_fusion(
+    *rankings: List[Tuple[int, float]], k: int = 5, constant: int = 60
+) -> List[int]:
+    """
+    Merge several rankings of the same entries.
+
+    Args:
+        rankings: (entry position, score) lists, best first
+        k: Maximum number of merged results
+        constant: RRF damping constant
+
+    Returns:
+        Entry positions, best first
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, (position, _score) in enumerate(ranking):
+            fused[position] = fused.get(position, 0.0) + 1.0 / (constant + rank + 1)
+    return sorted(fused, key=fused.get, reverse=True)[:k]
@@ -0,0 +1,147 @@
+"""
+Keyword retrieval engine for the clinic knowledge base.
+
+Accent-folded Portuguese tokenization, a light suffix stemmer and an
+inverted index with BM25 ranking.
+"""
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "ao", "aos", "as", "ate", "com", "como", "da", "das", "de", "do", "dos",
+    "e", "ela", "ele", "em", "entre", "essa", "esse", "esta", "estao", "este",
+    "estou", "eu", "ha", "isso", "ja", "la", "lhe", "mais", "mas", "me", "meu",
+    "meus", "minha", "minhas", "muito", "na", "nas", "no", "nos", "o", "os", "ou",
+    "para", "pela", "pelo", "por", "pra", "quais", "qual", "que", "sao", "se",
+    "sem", "ser", "seu", "seus", "so", "sua", "suas", "tem", "ter", "um", "uma",
+    "umas", "uns", "voce", "voces", "vou",
+}
+
+# Ordered longest-first within each group so the first match wins
+PLURAL_SUFFIXES = [("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"), ("is", "il")]
+DERIVATIONAL_SUFFIXES = [
+    "amentos", "imentos", "amento", "imento", "mente", "acoes", "icoes", "acao",
+    "icao", "adoras", "adores", "adora", "ador", "istas", "ista", "ados", "idos",
+    "adas", "idas", "ado", "ido", "ada", "ida", "ivel", "avel", "ico", "ica",
+    "oso", "osa", "zinho", "zinha", "inho", "inha", "ia", "io",
+]
+MIN_STEM_LENGTH = 3
+
+
+def fold_accents(text: str) -> str:
+    """Lowercase and strip diacritics (e.g. 'Ortodôntico' -> 'ortodontico')."""
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in normalized if not unicodedata.combining(char))
+
+
+@lru_cache(maxsize=65536)
+def stem(token: str) -> str:
+    """
+    Reduce a Portuguese word to an approximate stem.
+
+    A light, rule-based stemmer: it strips plural and common derivational
+    suffixes and the final vowel, which is enough to match "amarelados",
+    "amarelos" and "amarelo" to the same stem.
+    """
+    if len(token) <= MIN_STEM_LENGTH or token.isdigit():
+        return token
+
+    for suffix, replacement in PLURAL_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM_LENGTH:
+            token = token[: -len(suffix)] + replacement
+            break
+    else:
+        if token.endswith("s") and len(token) - 1 >= MIN_STEM_LENGTH:
+            token = token[:-1]
+
+    for suffix in DERIVATIONAL_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM_LENGTH:
+            token = token[: -len(suffix)]
+            break
+
+    if token[-1] in "aeo" and len(token) - 1 >= MIN_STEM_LENGTH:
+        token = token[:-1]
+
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into stemmed, accent-folded tokens without stopwords."""
+    return [
+        stem(token)
+        for token in TOKEN_PATTERN.findall(fold_accents(text))
+        if token not in STOPWORDS
+    ]
+
+
+class BM25Index:
+    """Inverted index over a fixed set of documents ranked with Okapi BM25."""
+
+    def __init__(self, documents: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        """
+        Build the index.
+
+        Args:
+            documents: Text of each document; results refer to their positions
+            k1: Term-frequency saturation
+            b: Document-length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_lengths: List[int] = []
+
+        for doc_id, text in enumerate(documents):
+            term_counts = Counter(tokenize(text))
+            self.doc_lengths.append(sum(term_counts.values()))
+            for term, count in term_counts.items():
+                self.postings[term].append((doc_id, count))
+
+        self.doc_count = len(self.doc_lengths)
+        self.avg_doc_length = (
+            sum(self.doc_lengths) / self.doc_count if self.doc_count else 0.0
+        )
+        self.idf = {
+            term: math.log(1 + (self.doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def __len__(self) -> int:
+        return self.doc_count
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """
+        Rank documents for a query.
+
+        Args:
+            query: Free-text query
+            k: Maximum number of results
+
+        Returns:
+            (document position, score) pairs, best first
+        """
+        scores: Dict[int, float] = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+
+            idf = self.idf[term]
+            for doc_id, tf in postings:
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_doc_length
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+def weighted_text(*fields: Tuple[str, int]) -> str:
+    """Join document fields, repeating each one by its weight to boost it."""
+    return " ".join(" ".join([text] * weight) for text, weight in fields if text)
@@ -2,16 +2,37 @@
 SDR Agent for dental clinic using PydanticAI.
 """
 import logging
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
 from dataclasses import dataclass
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from pydantic import BaseModel, Field
 from pydantic_ai import Agent, RunContext
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    PartDeltaEvent,
+    PartStartEvent,
+    SystemPromptPart,
+    TextPart,
+    TextPartDelta,
+    ToolCallPart,
+    UserPromptPart,
+)
 from pydantic_ai.providers.openai import OpenAIProvider
 from pydantic_ai.models.openai import OpenAIModel
+from pydantic_ai.models.wrapper import WrapperModel
 
 from config.settings import settings
 from config.prompts import SDR_SYSTEM_PROMPT
 from services.graphiti_service import graphiti_service
+from services.memory_service import conversation_memory
+from services.cache_service import response_cache
+from services.knowledge_service import knowledge_base
+from services import resilience_service as resilience
+from services.tracing_service import traced, tracer
+from services import metrics_service as metrics
 from agent.tools import (
     search_treatment,
     get_treatment_info,
@@ -34,6 +55,8 @@ class SDRDependencies:
     phone: str
     patient_name: str = "paciente"
     graphiti_client: Any = None
+    # Patient facts prefetched from Graphiti while the turn started (None if not fetched)
+    patient_context: Optional[List[Dict[str, Any]]] = None
 
 
 # ========== Define result models ==========
@@ -65,24 +88,137 @@ class AvailabilitySlot(BaseModel):
 
 
 # ========== Helper function to get model configuration ==========
+def _record_usage(span: Any, usage: Any):
+    span.set_attribute("gen_ai.usage.input_tokens", usage.request_tokens or 0)
+    span.set_attribute("gen_ai.usage.output_tokens", usage.response_tokens or 0)
+
+
+class TracedModel(WrapperModel):
+    """Records each model request as an "llm.request" span with token usage."""
+
+    async def request(self, messages, model_settings, model_request_parameters) -> ModelResponse:
+        with tracer.span(
+            "llm.request", kind="client", attributes={"gen_ai.request.model": self.model_name}
+        ) as span:
+            response = await self.wrapped.request(messages, model_settings, model_request_parameters)
+            _record_usage(span, response.usage)
+            return response
+
+    @asynccontextmanager
+    async def request_stream(self, messages, model_settings, model_request_parameters):
+        # Not made the active span: the caller consumes the stream between yields
+        span = tracer.start_span(
+            "llm.request",
+            kind="client",
+            attributes={"gen_ai.request.model": self.model_name, "gen_ai.stream": True},
+        )
+        try:
+            async with self.wrapped.request_stream(
+                messages, model_settings, model_request_parameters
+            ) as stream:
+                yield stream
+            _record_usage(span, stream.usage())
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            tracer.end_span(span)
+
+
 def get_model():
     """Configure and return the LLM model to use."""
     model_choice = settings.model_choice
     api_key = settings.openai_api_key
 
-    return OpenAIModel(model_choice, provider=OpenAIProvider(api_key=api_key))
+    return TracedModel(OpenAIModel(model_choice, provider=OpenAIProvider(api_key=api_key)))
 
 
 # ========== Create the SDR agent ==========
+SYSTEM_PROMPT = SDR_SYSTEM_PROMPT.format(clinic_name=settings.clinic_name)
+
 sdr_agent = Agent(
     get_model(),
-    system_prompt=SDR_SYSTEM_PROMPT.format(clinic_name=settings.clinic_name),
+    system_prompt=SYSTEM_PROMPT,
     deps_type=SDRDependencies,
 )
 
+# Tools whose output only depends on the knowledge base; a reply that used
+# any other tool (patient history, appointment slots, tools added later) is
+# never served to other patients from the response cache.
+CACHEABLE_TOOLS = {
+    "find_treatment_info",
+    "get_frequently_asked_questions",
+    "handle_objection",
+    "show_payment_options",
+    "calculate_payment_plan",
+    "check_insurance_accepted",
+}
+
+
+# ========== Create the history summarizer ==========
+summary_agent = Agent(
+    get_model(),
+    system_prompt=(
+        "Você resume conversas de WhatsApp entre a recepção de uma clínica "
+        "odontológica e um paciente. Produza um resumo curto em português com "
+        "nome do paciente, tratamentos de interesse, objeções, valores e "
+        "horários discutidos e próximos passos. Não invente informações."
+    ),
+)
+
+
+async def summarize_history(previous_summary: str, messages: List[ModelMessage]) -> str:
+    """
+    Fold older conversation turns into the running conversation summary.
+
+    Args:
+        previous_summary: Summary produced so far (may be empty)
+        messages: Turns dropped from the message history
+
+    Returns:
+        Updated summary
+    """
+    transcript = []
+    for message in messages:
+        for part in message.parts:
+            if part.part_kind == "user-prompt":
+                transcript.append(f"Paciente: {part.content}")
+            elif part.part_kind == "text":
+                transcript.append(f"Atendente: {part.content}")
+
+    prompt = (
+        f"Resumo atual:\n{previous_summary or '(vazio)'}\n\n"
+        f"Novas mensagens:\n" + "\n".join(transcript)
+    )
+    result = await summary_agent.run(prompt)
+    return result.data
+
+
+conversation_memory.set_summarizer(summarize_history)
+
+
+# ========== Dynamic system prompt ==========
+@sdr_agent.system_prompt(dynamic=True)
+def patient_context_prompt(ctx: RunContext[SDRDependencies]) -> str:
+    """Patient facts prefetched from the knowledge graph, refreshed every turn."""
+    facts = [item["fact"] for item in ctx.deps.patient_context or [] if item.get("fact")]
+    if not facts:
+        return "Nenhum histórico prévio carregado; use search_patient_history se precisar."
+    lines = "\n".join(f"- {fact}" for fact in facts)
+    return f"Histórico conhecido deste paciente:\n{lines}"
+
 
 # ========== Define tools ==========
+def instrumented_tool(func):
+    """Trace and measure a tool; the wrapper keeps the signature pydantic-ai reads."""
+    name = func.__name__
+    return metrics.timed(metrics.TOOL_DURATION, metrics.TOOL_CALLS, tool=name)(
+        traced(f"tool.{name}")(func)
+    )
+
+
 @sdr_agent.tool
+@instrumented_tool
 async def search_patient_history(
     ctx: RunContext[SDRDependencies], query: str
 ) -> List[PatientHistoryResult]:
@@ -130,6 +266,7 @@ async def search_patient_history(
 
 
 @sdr_agent.tool
+@instrumented_tool
 def find_treatment_info(
     ctx: RunContext[SDRDependencies], treatment_query: str
 ) -> List[TreatmentResult]:
@@ -158,6 +295,7 @@ def find_treatment_info(
 
 
 @sdr_agent.tool
+@instrumented_tool
 def get_frequently_asked_questions(
     ctx: RunContext[SDRDependencies], question_topic: str
 ) -> List[Dict[str, str]]:
@@ -184,6 +322,7 @@ def get_frequently_asked_questions(
 
 
 @sdr_agent.tool
+@instrumented_tool
 def handle_objection(
     ctx: RunContext[SDRDependencies], objection_type: str
 ) -> List[str]:
@@ -211,6 +350,7 @@ def handle_objection(
 
 
 @sdr_agent.tool
+@instrumented_tool
 def show_payment_options(ctx: RunContext[SDRDependencies]) -> Dict[str, Any]:
     """
     Get all available payment options.
@@ -234,6 +374,7 @@ def show_payment_options(ctx: RunContext[SDRDependencies]) -> Dict[str, Any]:
 
 
 @sdr_agent.tool
+@instrumented_tool
 def calculate_payment_plan(
     ctx: RunContext[SDRDependencies], amount: float, months: int = 12
 ) -> Dict[str, Any]:
@@ -261,6 +402,7 @@ def calculate_payment_plan(
 
 
 @sdr_agent.tool
+@instrumented_tool
 def check_insurance_accepted(ctx: RunContext[SDRDependencies]) -> List[str]:
     """
     Get list of accepted dental insurance plans.
@@ -284,6 +426,7 @@ def check_insurance_accepted(ctx: RunContext[SDRDependencies]) -> List[str]:
 
 
 @sdr_agent.tool
+@instrumented_tool
 def find_available_appointments(
     ctx: RunContext[SDRDependencies], preferred_period: str = None
 ) -> List[AvailabilitySlot]:
@@ -310,9 +453,112 @@ def find_available_appointments(
         return []
 
 
+# ========== Response cache helpers ==========
+def _is_cacheable(messages: List[ModelMessage], response: str, patient_name: str) -> bool:
+    """A reply can be shared only if it is free of patient-specific context."""
+    for message in messages:
+        for part in message.parts:
+            if isinstance(part, ToolCallPart) and part.tool_name not in CACHEABLE_TOOLS:
+                return False
+
+    first_name = (patient_name or "").split(" ")[0]
+    if len(first_name) > 2 and first_name.lower() in response.lower():
+        return False
+
+    return True
+
+
+def _cached_turn(message: str, response: str) -> List[ModelMessage]:
+    """Messages recorded in conversation memory for a reply served from cache."""
+    context_part = SystemPromptPart(content="", dynamic_ref=patient_context_prompt.__qualname__)
+    return [
+        ModelRequest(parts=[
+            SystemPromptPart(content=SYSTEM_PROMPT), context_part, UserPromptPart(content=message),
+        ]),
+        ModelResponse(parts=[TextPart(content=response)]),
+    ]
+
+
 # ========== Main agent execution function ==========
+ERROR_RESPONSE = (
+    "Desculpe, tive um problema ao processar sua mensagem. "
+    "Pode repetir ou reformular sua pergunta? 😊"
+)
+
+
+def _is_model_failure(error: BaseException) -> bool:
+    """Request errors (4xx other than 429) do not mean the model provider is down."""
+    status = getattr(error, "status_code", None)
+    return not (isinstance(status, int) and 400 <= status < 500 and status != 429)
+
+
+def _record_run(mode: str, outcome: str, start: float, result: Any = None):
+    """Count an agent run and the LLM tokens it used."""
+    metrics.AGENT_RUNS.inc(mode=mode, outcome=outcome)
+    metrics.AGENT_RUN_DURATION.observe(time.perf_counter() - start, mode=mode)
+    if result is None:
+        return
+
+    usage = result.usage()
+    model = next(
+        (m.model_name for m in reversed(result.new_messages()) if isinstance(m, ModelResponse)),
+        None,
+    ) or settings.model_choice
+    metrics.LLM_REQUESTS.inc(usage.requests, model=model)
+    metrics.LLM_TOKENS.inc(usage.request_tokens or 0, model=model, type="input")
+    metrics.LLM_TOKENS.inc(usage.response_tokens or 0, model=model, type="output")
+
+
+async def _prepare_turn(
+    phone: str, message: str
+) -> Tuple[List[ModelMessage], Optional[Tuple], Optional[str]]:
+    """
+    Load the conversation history and look the message up in the response cache.
+
+    Frequent first questions are answered from cache; ongoing conversations
+    carry patient context and always go to the model.
+
+    Returns:
+        (history, cache key or None, cached response or None)
+    """
+    history = await conversation_memory.get_history(phone)
+
+    if history:
+        return history, None, None
+
+    cache_key = response_cache.key_for(message, knowledge_base.snapshot.version)
+    cached = response_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        logger.info(f"Response cache hit for {phone}")
+        await conversation_memory.save(phone, _cached_turn(message, cached))
+
+    return history, cache_key, cached
+
+
+async def _finish_turn(
+    deps: SDRDependencies,
+    cache_key: Optional[Tuple],
+    all_messages: List[ModelMessage],
+    new_messages: List[ModelMessage],
+    response: str,
+):
+    """Remember the turn and cache the reply when it is shareable."""
+    await conversation_memory.save(deps.phone, all_messages)
+
+    # Replies written with prefetched patient facts are never shared
+    if (
+        cache_key
+        and not deps.patient_context
+        and _is_cacheable(new_messages, response, deps.patient_name)
+    ):
+        response_cache.set(cache_key, response)
+
+
 async def process_patient_message(
-    phone: str, patient_name: str, message: str
+    phone: str,
+    patient_name: str,
+    message: str,
+    patient_context: Optional[List[Dict[str, Any]]] = None,
 ) -> str:
     """
     Process a patient message and generate a response.
@@ -321,24 +567,176 @@ async def process_patient_message(
         phone: Patient phone number
         patient_name: Patient name
         message: Patient message
+        patient_context: Patient facts prefetched from Graphiti, if any
 
     Returns:
         Agent response
     """
+    start = time.perf_counter()
     try:
-        # Create dependencies
-        deps = SDRDependencies(
-            phone=phone, patient_name=patient_name, graphiti_client=graphiti_service
-        )
+        # One time budget for the whole turn (history, Graphiti, model and tools)
+        with resilience.deadline(settings.agent_turn_timeout):
+            # Create dependencies
+            deps = SDRDependencies(
+                phone=phone,
+                patient_name=patient_name,
+                graphiti_client=graphiti_service,
+                patient_context=patient_context,
+            )
 
-        # Run agent
-        result = await sdr_agent.run(message, deps=deps)
+            history, cache_key, cached = await _prepare_turn(phone, message)
+            if cached is not None:
+                _record_run("cache", "ok", start)
+                return cached
 
-        return result.data
+            # Run agent with the recent conversation as context
+            result = await resilience.call(
+                "openai",
+                lambda: sdr_agent.run(message, deps=deps, message_history=history or None),
+                is_failure=_is_model_failure,
+            )
+
+            await _finish_turn(
+                deps, cache_key, result.all_messages(), result.new_messages(), result.data
+            )
+
+            _record_run("run", "ok", start, result)
+            return result.data
 
     except Exception as e:
         logger.error(f"Error processing message: {e}", exc_info=True)
-        return (
-            "Desculpe, tive um problema ao processar sua mensagem. "
-            "Pode repetir ou reformular sua pergunta? 😊"
+        _record_run("run", "error", start)
+        return ERROR_RESPONSE
+
+
+async def _reply_deltas(response_stream: AsyncIterator[Any]) -> AsyncIterator[str]:
+    """
+    Text deltas of one streamed model response that are meant for the patient.
+
+    A response may open with a short preamble ("Vou verificar...") and then
+    call tools; that text is not the reply. Text is therefore held back until
+    it reaches stream_min_chunk_chars (nothing is sent to WhatsApp before
+    that anyway) and dropped if a tool call shows up first. Text of a
+    response without tool calls is always yielded in full.
+    """
+    held: List[str] = []
+    held_chars = 0
+    released = False
+    tool_call = False
+
+    async for event in response_stream:
+        if isinstance(event, PartStartEvent):
+            if isinstance(event.part, ToolCallPart):
+                tool_call = True
+                held.clear()
+                continue
+            text = event.part.content if isinstance(event.part, TextPart) else ""
+        elif isinstance(event, PartDeltaEvent) and isinstance(event.delta, TextPartDelta):
+            text = event.delta.content_delta
+        else:
+            continue
+
+        if not text:
+            continue
+        if released:
+            yield text
+        elif not tool_call:
+            held.append(text)
+            held_chars += len(text)
+            if held_chars >= settings.stream_min_chunk_chars:
+                released = True
+                yield "".join(held)
+                held.clear()
+
+    if held and not tool_call:
+        yield "".join(held)
+
+
+async def stream_patient_message(
+    phone: str,
+    patient_name: str,
+    message: str,
+    patient_context: Optional[List[Dict[str, Any]]] = None,
+) -> AsyncIterator[str]:
+    """
+    Process a patient message and stream the response as it is generated.
+
+    Args:
+        phone: Patient phone number
+        patient_name: Patient name
+        message: Patient message
+        patient_context: Patient facts prefetched from Graphiti, if any
+
+    Yields:
+        Text deltas of the agent response
+    """
+    yielded = False
+    start = time.perf_counter()
+
+    # The deadline is entered only around awaits that do not span a yield,
+    # so it never leaks into the caller's code between deltas. Tool calls
+    # (Graphiti) run in run.next(); while text streams, the model client's
+    # own timeouts apply.
+    turn_deadline = (
+        time.monotonic() + settings.agent_turn_timeout if settings.agent_turn_timeout > 0 else None
+    )
+    breaker = resilience.get_breaker("openai")
+
+    try:
+        deps = SDRDependencies(
+            phone=phone,
+            patient_name=patient_name,
+            graphiti_client=graphiti_service,
+            patient_context=patient_context,
         )
+
+        with resilience.use_deadline(turn_deadline):
+            history, cache_key, cached = await _prepare_turn(phone, message)
+        if cached is not None:
+            _record_run("cache", "ok", start)
+            yield cached
+            return
+
+        breaker.before_call()
+        parts = []
+        try:
+            async with AsyncExitStack() as stack:
+                with resilience.use_deadline(turn_deadline):
+                    run = await stack.enter_async_context(
+                        sdr_agent.iter(message, deps=deps, message_history=history or None)
+                    )
+
+                # Walk the run node by node: every model response is streamed,
+                # so the answer written after tool calls reaches the patient
+                node = run.next_node
+                while not Agent.is_end_node(node):
+                    if Agent.is_model_request_node(node):
+                        async with node.stream(run.ctx) as response_stream:
+                            async for delta in _reply_deltas(response_stream):
+                                parts.append(delta)
+                                yielded = True
+                                yield delta
+                    with resilience.use_deadline(turn_deadline):
+                        node = await run.next(node)
+                result = run.result
+        except Exception as e:
+            if _is_model_failure(e):
+                breaker.record_failure(e)
+            else:
+                breaker.release_trial()
+            raise
+        except BaseException:
+            breaker.release_trial()
+            raise
+        breaker.record_success()
+
+        await _finish_turn(
+            deps, cache_key, result.all_messages(), result.new_messages(), "".join(parts)
+        )
+        _record_run("stream", "ok", start, result)
+
+    except Exception as e:
+        logger.error(f"Error streaming message: {e}", exc_info=True)
+        _record_run("stream", "error", start)
+        if not yielded:
+            yield ERROR_RESPONSE
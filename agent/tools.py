@@ -1,50 +1,80 @@
 """
 Custom tools for the SDR agent.
 """
-import json
 import logging
 from typing import List, Dict, Any
-from pathlib import Path
+from agent.retrieval import BM25Index
+from agent.embeddings import reciprocal_rank_fusion
+from services.knowledge_service import KnowledgeSnapshot, knowledge_base
+from services.cache_service import memoize, tool_cache
+from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
-# Load knowledge base
-KNOWLEDGE_DIR = Path(__file__).parent.parent / "knowledge"
-
-with open(KNOWLEDGE_DIR / "treatments.json", "r", encoding="utf-8") as f:
-    TREATMENTS_DATA = json.load(f)
+# English objection types the agent may pass, mapped to Portuguese terms
+OBJECTION_ALIASES = {
+    "price": "caro",
+    "cost": "caro",
+    "expensive": "caro",
+    "time": "tempo",
+    "busy": "tempo",
+    "fear": "medo",
+    "afraid": "medo",
+    "indecision": "pensar",
+    "think": "pensar",
+    "insurance": "plano saúde",
+    "competitor": "orçamento outro lugar barato",
+}
+
+
+def _hybrid_search(
+    snapshot: KnowledgeSnapshot, name: str, keyword_index: BM25Index, query: str, limit: int
+) -> List[int]:
+    """Combine keyword and semantic rankings; falls back to keywords on errors."""
+    keyword_results = keyword_index.search(query, k=limit)
+    if not settings.semantic_search:
+        return [position for position, _score in keyword_results]
+
+    try:
+        semantic_results = [
+            (position, score)
+            for position, score in snapshot.semantic_index(name).search(query, k=limit)
+            if score >= settings.semantic_min_score
+        ]
+    except Exception as e:
+        logger.error(f"Semantic search failed for {name}: {e}")
+        semantic_results = []
 
-with open(KNOWLEDGE_DIR / "faqs.json", "r", encoding="utf-8") as f:
-    FAQS_DATA = json.load(f)
+    return reciprocal_rank_fusion(keyword_results, semantic_results, k=limit)
 
 
-def search_treatment(query: str) -> List[Dict[str, Any]]:
+def search_treatment(query: str, limit: int = 3) -> List[Dict[str, Any]]:
     """
     Search for treatments based on keywords.
 
     Args:
         query: Search query (treatment type, symptoms, etc.)
+        limit: Maximum number of treatments to return
 
     Returns:
-        List of matching treatments with details
+        List of matching treatments with details, best match first
     """
-    query_lower = query.lower()
+    snapshot = knowledge_base.snapshot
     matches = []
 
-    for treatment in TREATMENTS_DATA["treatments"]:
-        # Check if query matches treatment name or keywords
-        if query_lower in treatment["name"].lower() or any(
-            keyword in query_lower for keyword in treatment.get("keywords", [])
-        ):
-            matches.append(
-                {
-                    "name": treatment["name"],
-                    "description": treatment["description"],
-                    "duration": treatment["duration"],
-                    "price_range": treatment["price_range"],
-                    "benefits": treatment["benefits"],
-                }
-            )
+    for position in _hybrid_search(
+        snapshot, "treatments", snapshot.treatment_index, query, limit
+    ):
+        treatment = snapshot.treatments_data["treatments"][position]
+        matches.append(
+            {
+                "name": treatment["name"],
+                "description": treatment["description"],
+                "duration": treatment["duration"],
+                "price_range": treatment["price_range"],
+                "benefits": treatment["benefits"],
+            }
+        )
 
     logger.info(f"Found {len(matches)} treatments for query: {query}")
     return matches
@@ -60,32 +90,33 @@ def get_treatment_info(treatment_id: str) -> Dict[str, Any]:
     Returns:
         Treatment details
     """
-    for treatment in TREATMENTS_DATA["treatments"]:
+    for treatment in knowledge_base.snapshot.treatments_data["treatments"]:
         if treatment["id"] == treatment_id:
             return treatment
 
     return {}
 
 
-def search_faq(query: str) -> List[Dict[str, str]]:
+def search_faq(query: str, limit: int = 3) -> List[Dict[str, str]]:
     """
     Search for FAQs matching the query.
 
     Args:
         query: Search query
+        limit: Maximum number of FAQs to return
 
     Returns:
-        List of matching FAQs
+        List of matching FAQs, best match first
     """
-    query_lower = query.lower()
+    snapshot = knowledge_base.snapshot
     matches = []
 
-    for faq in FAQS_DATA["faqs"]:
-        if query_lower in faq["question"].lower() or query_lower in faq["answer"].lower():
-            matches.append({"question": faq["question"], "answer": faq["answer"]})
+    for position in _hybrid_search(snapshot, "faqs", snapshot.faq_index, query, limit):
+        faq = snapshot.faqs_data["faqs"][position]
+        matches.append({"question": faq["question"], "answer": faq["answer"]})
 
     logger.info(f"Found {len(matches)} FAQs for query: {query}")
-    return matches[:3]  # Return top 3 matches
+    return matches
 
 
 def get_objection_response(objection_type: str) -> List[str]:
@@ -98,15 +129,22 @@ def get_objection_response(objection_type: str) -> List[str]:
     Returns:
         List of suggested responses
     """
-    objection_lower = objection_type.lower()
+    query = OBJECTION_ALIASES.get(objection_type.strip().lower(), objection_type)
+
+    snapshot = knowledge_base.snapshot
+    results = snapshot.objection_index.search(query, k=1)
+    if not results:
+        return []
+
+    position, _score = results[0]
+    return snapshot.faqs_data["objection_handling"][position]["responses"]
 
-    for objection in FAQS_DATA["objection_handling"]:
-        if objection_lower in objection["objection"].lower():
-            return objection["responses"]
 
-    return []
+def _knowledge_version() -> int:
+    return knowledge_base.snapshot.version
 
 
+@memoize(tool_cache, version=_knowledge_version)
 def get_payment_options() -> Dict[str, Any]:
     """
     Get available payment options.
@@ -114,9 +152,10 @@ def get_payment_options() -> Dict[str, Any]:
     Returns:
         Dictionary with payment options
     """
-    return TREATMENTS_DATA["payment_options"]
+    return knowledge_base.snapshot.treatments_data["payment_options"]
 
 
+@memoize(tool_cache, version=_knowledge_version)
 def get_insurance_list() -> List[str]:
     """
     Get list of accepted insurance providers.
@@ -124,9 +163,10 @@ def get_insurance_list() -> List[str]:
     Returns:
         List of insurance names
     """
-    return TREATMENTS_DATA["accepted_insurance"]
+    return knowledge_base.snapshot.treatments_data["accepted_insurance"]
 
 
+@memoize(tool_cache)
 def calculate_installments(amount: float, months: int = 12) -> Dict[str, Any]:
     """
     Calculate installment options for a given amount.
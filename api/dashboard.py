@@ -2,12 +2,18 @@
 Dashboard API endpoints for monitoring conversations.
 """
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
 from datetime import datetime
 from services.websocket_service import ws_manager
-from api.webhooks import conversation_states
+from services.conversation_service import conversation_store
+from services.transcript_service import transcript_store
 from services.graphiti_service import graphiti_service
+from services.queue_service import message_queue
+from services.memory_service import conversation_memory
+from services.knowledge_service import knowledge_base
+from services.cache_service import response_cache, tool_cache
+from services.tracing_service import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -15,13 +21,20 @@ router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
 
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(
+    websocket: WebSocket,
+    offset: Optional[int] = None,
+    log_id: Optional[str] = None,
+):
     """
     WebSocket endpoint for real-time dashboard updates.
 
     Client connects here to receive live updates of all conversations.
+    A reconnecting client passes the log_id from the greeting and the last
+    event offset it saw (?log_id=...&offset=...) to receive the events it
+    missed in a single "replay" message.
     """
-    await ws_manager.connect(websocket)
+    await ws_manager.connect(websocket, offset=offset, log_id=log_id)
 
     try:
         while True:
@@ -30,7 +43,7 @@ async def websocket_endpoint(websocket: WebSocket):
 
             # Handle client commands if needed
             if data == "ping":
-                await websocket.send_json({"type": "pong"})
+                ws_manager.send_to(websocket, {"type": "pong"})
 
     except WebSocketDisconnect:
         ws_manager.disconnect(websocket)
@@ -48,13 +61,13 @@ async def get_conversations():
     try:
         conversations = []
 
-        for phone, state in conversation_states.items():
+        for state in await conversation_store.list():
             conversations.append({
-                "phone": phone,
+                "phone": state["phone"],
                 "patient_name": state.get("patient_name", "Unknown"),
                 "started_at": state.get("started_at").isoformat() if state.get("started_at") else None,
                 "messages_count": state.get("messages_count", 0),
-                "last_activity": state.get("started_at").isoformat() if state.get("started_at") else None,
+                "last_activity": state.get("last_activity").isoformat() if state.get("last_activity") else None,
             })
 
         return {
@@ -69,27 +82,30 @@ async def get_conversations():
 
 
 @router.get("/conversation/{phone}")
-async def get_conversation_history(phone: str, limit: int = 50):
+async def get_conversation_history(phone: str, limit: int = 50, before: Optional[str] = None):
     """
     Get conversation history for a specific patient.
 
     Args:
         phone: Patient phone number
         limit: Maximum number of messages to retrieve
+        before: Cursor (next_cursor of a previous page) to fetch older messages
 
     Returns:
-        Conversation history from Graphiti
+        Ordered transcript page (oldest first) and the cursor for the previous page
     """
     try:
-        # Get history from Graphiti
-        history = await graphiti_service.get_patient_context(phone, limit=limit)
+        page = await transcript_store.page(phone, limit=min(max(limit, 1), 500), before=before)
 
         return {
             "success": True,
             "phone": phone,
-            "messages": history
+            "messages": page["messages"],
+            "next_cursor": page["next_cursor"],
         }
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting conversation history: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -104,10 +120,11 @@ async def get_stats():
         System stats including active conversations, total messages, etc.
     """
     try:
-        total_conversations = len(conversation_states)
-        total_messages = sum(
-            state.get("messages_count", 0) for state in conversation_states.values()
-        )
+        from services.zapi_service import zapi_service
+
+        states = await conversation_store.list()
+        total_conversations = len(states)
+        total_messages = sum(state.get("messages_count", 0) for state in states)
 
         active_connections = len(ws_manager.active_connections)
 
@@ -115,7 +132,18 @@ async def get_stats():
             "active_conversations": total_conversations,
             "total_messages": total_messages,
             "dashboard_connections": active_connections,
-            "graphiti_status": "connected" if graphiti_service.graphiti else "disconnected",
+            "websocket": ws_manager.stats(),
+            "graphiti_status": "degraded" if graphiti_service.degraded else "connected",
+            "queue": message_queue.stats(),
+            "zapi": zapi_service.stats(),
+            "graphiti_writer": graphiti_service.writer_stats(),
+            "memory": conversation_memory.stats(),
+            "transcripts": transcript_store.stats(),
+            "knowledge_base": knowledge_base.info(),
+            "cache": {
+                "responses": response_cache.stats(),
+                "tools": tool_cache.stats(),
+            },
             "timestamp": datetime.now().isoformat()
         }
 
@@ -129,6 +157,66 @@ async def get_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/traces")
+async def get_traces(limit: int = 20):
+    """
+    Get recent turn traces and latency percentiles per stage.
+
+    Args:
+        limit: Maximum number of traces (newest first)
+
+    Returns:
+        Recent traces with their spans, and p50/p95/p99 per span name
+    """
+    return {
+        "success": True,
+        "traces": tracer.exporter.recent_traces(limit),
+        "stages": tracer.exporter.stage_percentiles(),
+        "tracer": {"enabled": tracer.enabled, **tracer.exporter.stats()},
+    }
+
+
+@router.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """
+    Get a single trace (turn) with all its spans.
+
+    Args:
+        trace_id: Trace ID (the turn ID logged with each processed message)
+
+    Returns:
+        The trace
+    """
+    trace = tracer.exporter.trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return {"success": True, "trace": trace}
+
+
+@router.post("/knowledge/reload")
+async def reload_knowledge(force: bool = False):
+    """
+    Reload treatments.json and faqs.json without restarting the server.
+
+    Args:
+        force: Rebuild indexes even if the files did not change
+
+    Returns:
+        Whether a new snapshot was loaded and the current snapshot info
+    """
+    # Judge this call's outcome, not last_error (the watcher also sets it)
+    try:
+        reloaded = await knowledge_base.reload(force=force, raise_errors=True)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    return {
+        "success": True,
+        "reloaded": reloaded,
+        "knowledge_base": knowledge_base.info(),
+    }
+
+
 @router.post("/send-message")
 async def send_manual_message(phone: str, message: str):
     """
@@ -146,11 +234,13 @@ async def send_manual_message(phone: str, message: str):
 
         # Send message via Z-API
         result = await zapi_service.send_text(phone, message)
+        await transcript_store.append(phone, "output", message, author="operator")
 
         # Broadcast to dashboard
+        state = await conversation_store.get(phone) or {}
         await ws_manager.broadcast_outgoing_message(
             phone=phone,
-            patient_name=conversation_states.get(phone, {}).get("patient_name", "Unknown"),
+            patient_name=state.get("patient_name", "Unknown"),
             message_text=message,
         )
 
@@ -176,8 +266,8 @@ async def clear_conversation(phone: str):
         Success response
     """
     try:
-        if phone in conversation_states:
-            del conversation_states[phone]
+        if await conversation_store.delete(phone):
+            await conversation_memory.clear(phone)
 
             await ws_manager.broadcast({
                 "type": "conversation_cleared",
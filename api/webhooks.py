@@ -4,12 +4,24 @@ Webhook endpoints for receiving Z-API messages.
 import logging
 import asyncio
 from datetime import datetime
-from fastapi import APIRouter, BackgroundTasks, Request
-from models.message import WebhookMessage
+from typing import Any, Awaitable, Dict, List, Optional
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+from models.message import WebhookMessage, parse_json_body, webhook_ignore_reason
 from services.zapi_service import zapi_service
+from services.queue_service import message_queue
+from services.conversation_service import conversation_store
+from services.transcript_service import transcript_store
+from services.dedup_service import message_deduplicator
 from services.graphiti_service import graphiti_service
 from services.websocket_service import ws_manager
+from services.timing_service import TurnTimer, turn_timings
+from services import tracing_service as tracing
+from services.metrics_service import TURN_DURATION, WEBHOOK_DURATION, WEBHOOKS, timed
+from services.capture_service import traffic_capture
 from config.prompts import get_welcome_message
+from agent.chunking import SentenceChunker
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -17,50 +29,94 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/webhook", tags=["webhooks"])
 
 
-# Simple in-memory storage for conversation states
-# In production, use Redis or a database
-conversation_states = {}
+def _record_outcome(span: Any, outcome: str, reason: str = ""):
+    span.set_attribute("webhook.outcome", f"{outcome}:{reason}" if reason else outcome)
+    WEBHOOKS.inc(outcome=outcome, reason=reason)
 
 
 @router.post("/message")
-async def receive_message(
-    message: WebhookMessage,
-    background_tasks: BackgroundTasks,
-    request: Request,
-):
+@tracing.traced("webhook.receive_message", kind="server")
+@timed(WEBHOOK_DURATION)
+async def receive_message(request: Request):
     """
     Webhook endpoint to receive messages from Z-API.
 
+    The raw body is pre-filtered before validation: callbacks we ignore
+    (own messages, groups, newsletters, non-message events) never build a
+    WebhookMessage.
+
     Args:
-        message: Incoming message from Z-API
-        background_tasks: FastAPI background tasks
         request: FastAPI request object
 
     Returns:
         Success response
     """
+    span = tracing.current_span() or tracing.NOOP_SPAN
     try:
-        # Ignore messages sent by us
-        if message.fromMe:
-            logger.info(f"Ignoring message from self: {message.messageId}")
-            return {"status": "ignored", "reason": "message_from_self"}
+        body = await request.body()
+        traffic_capture.record("message", body)
+        try:
+            data = parse_json_body(body)
+        except ValueError as e:
+            _record_outcome(span, "invalid", "json")
+            return JSONResponse(status_code=422, content={"detail": f"Invalid JSON: {e}"})
 
-        # Ignore group messages for now
-        if message.isGroup:
-            logger.info(f"Ignoring group message: {message.messageId}")
-            return {"status": "ignored", "reason": "group_message"}
+        reason = webhook_ignore_reason(data)
+        if reason:
+            _record_outcome(span, "ignored", reason)
+            logger.debug(f"Ignoring webhook ({reason}): {data.get('messageId')}")
+            return {"status": "ignored", "reason": reason}
+
+        try:
+            message = WebhookMessage.model_validate(data)
+        except ValidationError as e:
+            _record_outcome(span, "invalid", "schema")
+            return JSONResponse(
+                status_code=422,
+                content={"detail": e.errors(include_url=False, include_context=False)},
+            )
+
+        # The pre-filter only catches JSON booleans; flags sent as "true" or 1
+        # are coerced by validation and must still be ignored
+        if message.fromMe:
+            reason = "message_from_self"
+        elif message.isGroup:
+            reason = "group_message"
+        elif message.isNewsletter:
+            reason = "newsletter"
+        if reason:
+            _record_outcome(span, "ignored", reason)
+            logger.info(f"Ignoring webhook ({reason}): {message.messageId}")
+            return {"status": "ignored", "reason": reason}
 
         # Extract message details
         phone = message.phone
+        span.set_attribute("message.id", message.messageId)
+        span.set_attribute("patient.phone", phone)
         sender_name = message.get_sender_name()
         message_text = message.get_message_text()
 
         if not message_text:
             logger.warning(f"No text content in message {message.messageId}")
+            _record_outcome(span, "ignored", "no_text_content")
             return {"status": "ignored", "reason": "no_text_content"}
 
+        # Z-API redelivers on timeouts: answer duplicates with the original ack
+        ack = {"status": "received", "messageId": message.messageId}
+        original_ack = await message_deduplicator.claim(message.messageId, ack)
+        if original_ack is not None:
+            _record_outcome(span, "duplicate")
+            return original_ack
+
         logger.info(f"Received message from {sender_name} ({phone}): {message_text[:50]}...")
 
+        # Keep the exact transcript for the dashboard: every message, in
+        # arrival order, even if its turn is coalesced, fails or is dropped
+        await transcript_store.append(
+            phone, "input", message_text, author="patient",
+            sender_name=sender_name, message_id=message.messageId,
+        )
+
         # Broadcast incoming message to dashboard
         await ws_manager.broadcast_incoming_message(
             phone=phone,
@@ -69,106 +125,244 @@ async def receive_message(
             message_id=message.messageId,
         )
 
-        # Add message processing to background tasks
-        background_tasks.add_task(
-            process_message,
-            phone=phone,
-            sender_name=sender_name,
-            message_text=message_text,
-            message_id=message.messageId,
+        # Enqueue message processing (ordered per phone, concurrency-limited)
+        accepted = await message_queue.enqueue(
+            phone,
+            {
+                "phone": phone,
+                "sender_name": sender_name,
+                "message_text": message_text,
+                "message_id": message.messageId,
+                # Lets the turn continue this webhook's trace
+                "trace_parents": [tracing.format_traceparent(span)] if span.trace_id else [],
+            },
         )
+        _record_outcome(span, "queued" if accepted else "busy")
+
+        if not accepted:
+            # Non-2xx makes Z-API redeliver later instead of dropping the message
+            await message_deduplicator.release(message.messageId)
+            return JSONResponse(
+                status_code=503,
+                content={"status": "busy", "reason": "queue_full"},
+            )
 
-        return {"status": "received", "messageId": message.messageId}
+        return ack
 
     except Exception as e:
         logger.error(f"Error processing webhook: {e}", exc_info=True)
+        _record_outcome(span, "error")
         return {"status": "error", "message": str(e)}
 
 
+def merge_message_payloads(payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge rapid-fire messages from the same patient into a single turn.
+
+    Args:
+        payloads: Queued process_message payloads, oldest first
+
+    Returns:
+        A single payload whose text joins all messages in order
+    """
+    message_ids = []
+    trace_parents = []
+    for payload in payloads:
+        message_ids.extend(payload.get("message_ids") or [payload["message_id"]])
+        trace_parents.extend(payload.get("trace_parents") or [])
+
+    return {
+        "phone": payloads[-1]["phone"],
+        "sender_name": payloads[-1]["sender_name"],
+        "message_text": "\n".join(payload["message_text"] for payload in payloads),
+        "message_id": payloads[-1]["message_id"],
+        "message_ids": message_ids,
+        "trace_parents": trace_parents,
+    }
+
+
+async def _concurrently(*coroutines: Awaitable[Any]) -> List[Any]:
+    """
+    Await coroutines concurrently. Unlike passing asyncio.gather() to a stage,
+    the tasks are created inside the stage, so they inherit its span.
+    """
+    return await asyncio.gather(*coroutines)
+
+
+async def _best_effort(awaitable: Awaitable[Any], what: str):
+    """Await a side effect whose failure must not abort the turn."""
+    try:
+        await awaitable
+    except Exception as e:
+        logger.warning(f"{what} failed: {e}")
+
+
+async def _open_conversation(phone: str, sender_name: str):
+    """Record the turn in the conversation store and greet new conversations."""
+    try:
+        # Record the message; the store tells us if this is a new conversation
+        is_new_conversation, _state = await conversation_store.touch(phone, sender_name)
+
+        if is_new_conversation:
+            # Send welcome message
+            hour = datetime.now().hour
+            welcome_msg = get_welcome_message(hour, settings.clinic_name)
+            await zapi_service.send_text(phone, welcome_msg)
+            await transcript_store.append(
+                phone, "output", welcome_msg, author="agent", sender_name=settings.clinic_name
+            )
+    except Exception as e:
+        logger.error(f"Failed to open conversation with {phone}: {e}")
+
+
+async def _prefetch_patient_context(phone: str) -> Optional[List[Dict[str, Any]]]:
+    """Patient facts for the agent, or None if Graphiti is too slow this turn."""
+    try:
+        return await asyncio.wait_for(
+            graphiti_service.get_patient_context(phone),
+            timeout=settings.patient_context_prefetch_timeout,
+        )
+    except asyncio.TimeoutError:
+        logger.info(f"Patient context for {phone} not ready, agent starts without it")
+        return None
+
+
+@timed(TURN_DURATION)
 async def process_message(
     phone: str,
     sender_name: str,
     message_text: str,
     message_id: str,
+    message_ids: Optional[List[str]] = None,
+    trace_parents: Optional[List[str]] = None,
 ):
     """
     Process incoming message from patient.
 
-    This function runs in the background to avoid blocking the webhook response.
+    This function is run by the message queue worker for the patient's phone.
+    The turn continues the trace of its (latest) webhook; coalesced earlier
+    webhooks are linked.
+
+    The turn is a dependency-aware pipeline:
+        presence, read receipt, dashboard status  -> fire and forget
+        conversation (+ welcome)                 -> before the first reply
+        typing delay                              -> before the first reply
+        patient context prefetch                  -> before the agent
+        agent -> reply -> dashboard idle
 
     Args:
         phone: Patient phone number
         sender_name: Patient name
         message_text: Message content
-        message_id: Message ID
+        message_id: Message ID (the latest one when messages were coalesced)
+        message_ids: All message IDs merged into this turn, if coalesced
+        trace_parents: traceparents of the webhooks merged into this turn
     """
+    contexts = [tracing.parse_traceparent(value) for value in trace_parents or []]
+    contexts = [context for context in contexts if context is not None]
+    with tracing.tracer.span(
+        "turn.process_message",
+        kind="consumer",
+        attributes={"patient.phone": phone, "message.id": message_id},
+        parent=contexts[-1] if contexts else None,
+        links=contexts[:-1],
+    ):
+        await _process_turn(phone, sender_name, message_text, message_id, message_ids)
+
+
+async def _process_turn(
+    phone: str,
+    sender_name: str,
+    message_text: str,
+    message_id: str,
+    message_ids: Optional[List[str]],
+):
+    """The turn pipeline of process_message."""
+    timer = TurnTimer()
     try:
-        # Show typing indicator
-        await zapi_service.typing_on(phone)
-
-        # Add small delay to simulate human typing
-        await asyncio.sleep(1)
-
-        # Store conversation in Graphiti
-        await graphiti_service.add_conversation_episode(
+        # Side effects nothing else waits for
+        side_effects = [
+            asyncio.create_task(_best_effort(
+                timer.stage("presence", zapi_service.typing_on(phone)), "Typing indicator"
+            )),
+            # Marks earlier coalesced messages as read too
+            asyncio.create_task(_best_effort(
+                timer.stage("read_receipt", zapi_service.mark_as_read(phone, message_id)),
+                "Read receipt",
+            )),
+            asyncio.create_task(_best_effort(
+                timer.stage("dashboard", ws_manager.broadcast_agent_thinking(phone, "processing")),
+                "Dashboard broadcast",
+            )),
+        ]
+
+        # Store conversation in Graphiti (write-behind, off the reply path)
+        graphiti_service.enqueue_conversation_episode(
             phone=phone,
             patient_name=sender_name,
             message_text=message_text,
             metadata={
                 "message_id": message_id,
+                "message_ids": message_ids or [message_id],
                 "timestamp": datetime.now().isoformat(),
             },
         )
 
-        # Check if this is a new conversation
-        is_new_conversation = phone not in conversation_states
+        conversation = asyncio.create_task(timer.stage(
+            "conversation", _open_conversation(phone, sender_name)
+        ))
+        # Human-like typing time, overlapped with the agent instead of added to it
+        typing_delay = asyncio.create_task(
+            timer.stage("typing_delay", asyncio.sleep(settings.typing_delay))
+        )
+        # Replies go out after the welcome message and the typing delay
+        reply_ready = asyncio.gather(conversation, typing_delay)
 
-        if is_new_conversation:
-            # Send welcome message
-            hour = datetime.now().hour
-            welcome_msg = get_welcome_message(hour, settings.clinic_name)
-            await zapi_service.send_text(phone, welcome_msg)
+        patient_context = await timer.stage("prefetch_context", _prefetch_patient_context(phone))
 
-            # Initialize conversation state
-            conversation_states[phone] = {
-                "started_at": datetime.now(),
-                "patient_name": sender_name,
-                "messages_count": 1,
-            }
+        if settings.stream_responses:
+            # Stream the reply, sending each complete sentence group as it arrives
+            await timer.stage(
+                "agent", stream_reply(phone, sender_name, message_text, patient_context, reply_ready)
+            )
         else:
-            conversation_states[phone]["messages_count"] += 1
-
-        # Broadcast agent thinking status
-        await ws_manager.broadcast_agent_thinking(phone, "processing")
-
-        # Process message with SDR agent
-        from agent.sdr_agent import process_patient_message
+            # Process message with SDR agent
+            from agent.sdr_agent import process_patient_message
 
-        response = await process_patient_message(phone, sender_name, message_text)
-
-        # Hide typing indicator
-        await zapi_service.typing_off(phone)
-
-        # Send response
-        await zapi_service.send_text(phone, response)
-
-        # Broadcast outgoing message to dashboard
-        await ws_manager.broadcast_outgoing_message(
-            phone=phone,
-            patient_name=sender_name,
-            message_text=response,
-        )
+            response = await timer.stage(
+                "agent", process_patient_message(phone, sender_name, message_text, patient_context)
+            )
+            await timer.stage("reply_ready", reply_ready)
+
+            # Hide typing indicator and send the response
+            await timer.stage("send", _concurrently(
+                zapi_service.typing_off(phone),
+                zapi_service.send_text(phone, response),
+            ))
+            await timer.stage("record_reply", _concurrently(
+                transcript_store.append(
+                    phone, "output", response, author="agent", sender_name=settings.clinic_name
+                ),
+                # Broadcast outgoing message to dashboard
+                ws_manager.broadcast_outgoing_message(
+                    phone=phone,
+                    patient_name=sender_name,
+                    message_text=response,
+                ),
+            ))
 
         # Broadcast agent done status
-        await ws_manager.broadcast_agent_thinking(phone, "idle")
-
-        # Mark original message as read
-        await zapi_service.mark_as_read(phone, message_id)
+        await timer.stage("dashboard_idle", ws_manager.broadcast_agent_thinking(phone, "idle"))
+        await asyncio.gather(*side_effects)
 
-        logger.info(f"Successfully processed message from {phone}")
+        turn_timings.record(timer)
+        logger.info(
+            f"Successfully processed message from {phone} "
+            f"(turn {tracing.current_trace_id()}, {timer.summary()})"
+        )
 
     except Exception as e:
-        logger.error(f"Error in process_message: {e}", exc_info=True)
+        logger.error(f"Error in process_message: {e} ({timer.summary()})", exc_info=True)
         # Try to inform the user about the error
         try:
             await zapi_service.send_text(
@@ -180,6 +374,67 @@ async def process_message(
             pass
 
 
+async def stream_reply(
+    phone: str,
+    sender_name: str,
+    message_text: str,
+    patient_context: Optional[List[Dict[str, Any]]] = None,
+    reply_ready: Optional[Awaitable[Any]] = None,
+) -> str:
+    """
+    Generate the agent reply in streaming mode.
+
+    Text deltas are relayed live to the dashboard, and the reply is split at
+    paragraph/sentence boundaries into several WhatsApp messages, each sent
+    as soon as it is complete.
+
+    Args:
+        phone: Patient phone number
+        sender_name: Patient name
+        message_text: Message content
+        patient_context: Patient facts prefetched from Graphiti, if any
+        reply_ready: Awaited before the first message is sent (welcome
+            message and typing delay)
+
+    Returns:
+        The full reply text
+    """
+    from agent.sdr_agent import stream_patient_message
+
+    chunker = SentenceChunker(min_chars=settings.stream_min_chunk_chars)
+    parts = []
+
+    async def send_chunk(chunk: str):
+        if reply_ready is not None:
+            await reply_ready
+        await zapi_service.send_text(phone, chunk)
+        await asyncio.gather(
+            transcript_store.append(
+                phone, "output", chunk, author="agent", sender_name=settings.clinic_name
+            ),
+            ws_manager.broadcast_outgoing_message(
+                phone=phone,
+                patient_name=sender_name,
+                message_text=chunk,
+            ),
+        )
+
+    async for delta in stream_patient_message(phone, sender_name, message_text, patient_context):
+        parts.append(delta)
+        await ws_manager.broadcast_agent_stream(phone, delta)
+
+        for chunk in chunker.feed(delta):
+            await send_chunk(chunk)
+
+    # Hide typing indicator before the last message goes out
+    await zapi_service.typing_off(phone)
+
+    for chunk in chunker.flush():
+        await send_chunk(chunk)
+
+    return "".join(parts)
+
+
 @router.post("/status")
 async def receive_status(request: Request):
     """
@@ -192,7 +447,9 @@ async def receive_status(request: Request):
         Success response
     """
     try:
-        data = await request.json()
+        body = await request.body()
+        traffic_capture.record("status", body)
+        data = parse_json_body(body)
         logger.info(f"Received status update: {data}")
         return {"status": "received"}
     except Exception as e:
@@ -206,5 +463,9 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "berenice-ai-webhook",
-        "active_conversations": len(conversation_states),
+        "active_conversations": await conversation_store.count(),
+        "queue": message_queue.stats(),
+        "dedup": message_deduplicator.stats(),
+        "capture": traffic_capture.stats(),
+        "turn_timings": turn_timings.stats(),
     }
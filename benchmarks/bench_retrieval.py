@@ -0,0 +1,101 @@
+"""
+Benchmark: BM25 inverted index vs. the previous linear substring scan.
+
+Builds synthetic FAQ knowledge bases of increasing size from knowledge/faqs.json
+and measures index build time and per-query latency of both approaches.
+
+Run: python -m benchmarks.bench_retrieval [--sizes 20 1000 5000] [--repeat 200]
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from agent.retrieval import BM25Index, weighted_text
+
+KNOWLEDGE_DIR = Path(__file__).parent.parent / "knowledge"
+
+QUERIES = [
+    "convênio",
+    "quanto custa clareamento",
+    "horário de funcionamento",
+    "parcelamento no cartão",
+    "aparelho dói",
+    "implante demora quanto tempo",
+    "aceita pix",
+    "primeira consulta é paga",
+]
+
+
+def linear_scan(faqs: List[Dict[str, str]], query: str) -> List[Dict[str, str]]:
+    """The original search_faq implementation (substring match, unranked)."""
+    query_lower = query.lower()
+    matches = []
+    for faq in faqs:
+        if query_lower in faq["question"].lower() or query_lower in faq["answer"].lower():
+            matches.append(faq)
+    return matches[:3]
+
+
+def synthetic_faqs(base: List[Dict[str, str]], size: int, seed: int = 42) -> List[Dict[str, str]]:
+    """Grow the FAQ list to `size` entries by shuffling words of real entries."""
+    rng = random.Random(seed)
+    faqs = list(base)
+    while len(faqs) < size:
+        source = rng.choice(base)
+        words = source["answer"].split()
+        rng.shuffle(words)
+        faqs.append({"question": source["question"], "answer": " ".join(words)})
+    return faqs[:size]
+
+
+def time_queries(search, repeat: int) -> Dict[str, float]:
+    """Run every query `repeat` times and return latency stats in microseconds."""
+    samples = []
+    for _ in range(repeat):
+        for query in QUERIES:
+            start = time.perf_counter()
+            search(query)
+            samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        "p50_us": statistics.median(samples),
+        "p95_us": samples[int(len(samples) * 0.95) - 1],
+        "mean_us": statistics.fmean(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 1000, 5000, 20000])
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    with open(KNOWLEDGE_DIR / "faqs.json", "r", encoding="utf-8") as f:
+        base = json.load(f)["faqs"]
+
+    print(f"{'size':>7} | {'build ms':>9} | {'scan p50 µs':>11} | {'bm25 p50 µs':>11} | "
+          f"{'scan p95 µs':>11} | {'bm25 p95 µs':>11}")
+    print("-" * 76)
+
+    for size in args.sizes:
+        faqs = synthetic_faqs(base, size)
+
+        start = time.perf_counter()
+        index = BM25Index([
+            weighted_text((faq["question"], 2), (faq["answer"], 1)) for faq in faqs
+        ])
+        build_ms = (time.perf_counter() - start) * 1e3
+
+        scan = time_queries(lambda q: linear_scan(faqs, q), args.repeat)
+        bm25 = time_queries(lambda q: index.search(q, k=3), args.repeat)
+
+        print(f"{size:>7} | {build_ms:>9.1f} | {scan['p50_us']:>11.1f} | {bm25['p50_us']:>11.1f} | "
+              f"{scan['p95_us']:>11.1f} | {bm25['p95_us']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
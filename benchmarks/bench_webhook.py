@@ -0,0 +1,171 @@
+"""
+Benchmark: per-request overhead of /webhook/message parsing.
+
+Compares the previous handler (FastAPI validates every body into
+WebhookMessage) with the fast path (raw body, orjson/json decode, cheap
+pre-filter, validation only for messages that are processed), on a traffic
+mix where ignored group callbacks outnumber real messages.
+
+Run: python -m benchmarks.bench_webhook [--requests 20000] [--ignored-ratio 10]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Callable, Dict, List
+
+import httpx
+from fastapi import FastAPI, Request
+
+from models.message import (
+    ORJSON_AVAILABLE,
+    WebhookMessage,
+    parse_json_body,
+    webhook_ignore_reason,
+)
+
+
+def make_payload(index: int, ignored: bool) -> bytes:
+    """A realistic Z-API ReceivedCallback body."""
+    payload = {
+        "instanceId": "3C0FFEE",
+        "messageId": f"3EB0{index:016X}",
+        "phone": "5511999990000" if not ignored else "120363000000000000-group",
+        "fromMe": False,
+        "momment": 1718000000000 + index,
+        "status": "RECEIVED",
+        "chatName": "Grupo Família" if ignored else "Maria",
+        "senderPhoto": None,
+        "senderName": "Maria Silva",
+        "participantPhone": "5511988887777" if ignored else None,
+        "photo": "https://pps.whatsapp.net/v/t61/photo.jpg",
+        "broadcast": False,
+        "type": "ReceivedCallback",
+        "text": {"message": "Olá, gostaria de saber o preço do clareamento dental"},
+        "isGroup": ignored,
+        "isNewsletter": False,
+        "waitingMessage": False,
+    }
+    return json.dumps(payload).encode("utf-8")
+
+
+def make_traffic(requests: int, ignored_ratio: int) -> List[bytes]:
+    return [
+        make_payload(i, ignored=(i % (ignored_ratio + 1)) != 0) for i in range(requests)
+    ]
+
+
+def baseline_parse(body: bytes) -> str:
+    """What FastAPI did before: decode, validate, then filter."""
+    message = WebhookMessage.model_validate(json.loads(body))
+    if message.fromMe or message.isGroup:
+        return "ignored"
+    return message.get_message_text() or ""
+
+
+def fast_parse(body: bytes) -> str:
+    """The new handler: decode, pre-filter, validate only what is processed."""
+    data = parse_json_body(body)
+    if webhook_ignore_reason(data):
+        return "ignored"
+    return WebhookMessage.model_validate(data).get_message_text() or ""
+
+
+def time_calls(func: Callable[[bytes], str], traffic: List[bytes]) -> Dict[str, float]:
+    samples = []
+    for body in traffic:
+        start = time.perf_counter()
+        func(body)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        "p50_us": statistics.median(samples),
+        "p95_us": samples[int(len(samples) * 0.95) - 1],
+        "mean_us": statistics.fmean(samples),
+    }
+
+
+def build_app() -> FastAPI:
+    """Minimal app with both handler styles and no side effects."""
+    app = FastAPI()
+
+    @app.post("/baseline")
+    async def baseline(message: WebhookMessage):
+        if message.fromMe or message.isGroup:
+            return {"status": "ignored"}
+        return {"status": "received", "messageId": message.messageId}
+
+    @app.post("/fast")
+    async def fast(request: Request):
+        data = parse_json_body(await request.body())
+        reason = webhook_ignore_reason(data)
+        if reason:
+            return {"status": "ignored", "reason": reason}
+        message = WebhookMessage.model_validate(data)
+        return {"status": "received", "messageId": message.messageId}
+
+    return app
+
+
+async def time_endpoint(client: httpx.AsyncClient, path: str, traffic: List[bytes]) -> Dict[str, float]:
+    headers = {"content-type": "application/json"}
+    samples = []
+    for body in traffic:
+        start = time.perf_counter()
+        response = await client.post(path, content=body, headers=headers)
+        samples.append((time.perf_counter() - start) * 1e6)
+        response.raise_for_status()
+    samples.sort()
+    return {
+        "p50_us": statistics.median(samples),
+        "p95_us": samples[int(len(samples) * 0.95) - 1],
+        "mean_us": statistics.fmean(samples),
+    }
+
+
+async def run_asgi(traffic: List[bytes]) -> Dict[str, Dict[str, float]]:
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm up both routes
+        for path in ("/baseline", "/fast"):
+            await time_endpoint(client, path, traffic[:200])
+        return {
+            "baseline": await time_endpoint(client, "/baseline", traffic),
+            "fast": await time_endpoint(client, "/fast", traffic),
+        }
+
+
+def print_row(label: str, baseline: Dict[str, float], fast: Dict[str, float]):
+    print(f"{label:>8} | {baseline['mean_us']:>12.1f} | {fast['mean_us']:>10.1f} | "
+          f"{baseline['p95_us']:>12.1f} | {fast['p95_us']:>10.1f} | "
+          f"{baseline['mean_us'] / fast['mean_us']:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--ignored-ratio", type=int, default=10,
+                        help="ignored callbacks per processed message")
+    parser.add_argument("--skip-asgi", action="store_true",
+                        help="only measure parsing, not the full ASGI request")
+    args = parser.parse_args()
+
+    traffic = make_traffic(args.requests, args.ignored_ratio)
+    print(f"{args.requests} requests, {args.ignored_ratio}:1 ignored:processed, "
+          f"decoder={'orjson' if ORJSON_AVAILABLE else 'json'}")
+    print(f"{'level':>8} | {'baseline µs':>12} | {'fast µs':>10} | "
+          f"{'baseline p95':>12} | {'fast p95':>10} | {'speedup':>8}")
+    print("-" * 72)
+
+    time_calls(baseline_parse, traffic[:1000])
+    time_calls(fast_parse, traffic[:1000])
+    print_row("parse", time_calls(baseline_parse, traffic), time_calls(fast_parse, traffic))
+
+    if not args.skip_asgi:
+        results = asyncio.run(run_asgi(traffic))
+        print_row("asgi", results["baseline"], results["fast"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,767 @@
+"""
+Load test: end-to-end throughput, latency and memory of the whole app, offline.
+
+Boots main.app against local stand-ins for every external dependency:
+- Z-API: a fake HTTP server (uvicorn on 127.0.0.1) that answers each call
+  after a configurable latency and notices when a reply reaches a patient,
+- OpenAI: a scripted FunctionModel for sdr_agent and the history summarizer,
+  with a configurable latency per request and per streamed chunk,
+- Neo4j: an in-memory Graphiti with the calls GraphitiService makes,
+- dashboards: WebSocket clients that take a while to receive each event,
+then replays a WhatsApp traffic profile against /webhook/message.
+
+Each simulated patient sends a burst of messages, waits for the reply to
+arrive, thinks, and sends the next burst. Reported: patient messages/sec,
+webhook ack latency, latency from a patient's last message to the first and
+to the last reply chunk, and memory growth (tracemalloc). Results are saved
+as JSON; pass an earlier result to --compare to check for regressions.
+
+Z-API rate limiting and the typing delay are off by default, since they
+would hide the app's own throughput; every setting can still be changed
+through the usual environment variables.
+
+Run: python -m benchmarks.load_test [--profile bursty] [--scale 2] [--compare old.json]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from collections import Counter, deque
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple, Union
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+
+try:
+    import resource
+
+    RESOURCE_AVAILABLE = True
+except ImportError:  # Windows
+    RESOURCE_AVAILABLE = False
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Every scripted reply ends with this sentence, so the fake Z-API can tell
+# when the last chunk of a (possibly streamed) reply has been delivered
+REPLY_END = "Posso ajudar em algo mais?"
+
+PATIENT_MESSAGES = [
+    "Oi, boa tarde!",
+    "Quanto custa o clareamento dental?",
+    "Vocês fazem implante?",
+    "Aceitam convênio?",
+    "Qual o horário de funcionamento?",
+    "Dá pra parcelar no cartão?",
+    "Tenho medo de dentista, dói muito?",
+    "Quero colocar aparelho, quanto fica?",
+    "Tem horário na semana que vem?",
+    "Achei caro, tem desconto?",
+    "Preciso fazer uma limpeza",
+    "Ok, obrigado!",
+]
+
+TREATMENT_KEYWORDS = {
+    "clareamento": "clareamento",
+    "implante": "implante",
+    "aparelho": "ortodontia",
+    "limpeza": "limpeza",
+}
+
+
+@dataclass(frozen=True)
+class TrafficProfile:
+    """Shape of the simulated WhatsApp traffic."""
+
+    description: str
+    conversations: int
+    turns: int  # bursts per conversation
+    burst: Tuple[int, int]  # messages per burst (min, max)
+    burst_gap: float  # seconds between messages of a burst
+    think_time: float  # mean seconds between a reply and the next burst
+    ramp_up: float  # conversations start uniformly over this many seconds
+    ignored_ratio: float = 0.0  # group callbacks per patient message
+    dashboard_clients: int = 0
+    dashboard_send_delay: float = 0.0  # seconds each dashboard takes per event
+
+
+PROFILES: Dict[str, TrafficProfile] = {
+    "steady": TrafficProfile(
+        "One message at a time, plus a group callback per message",
+        conversations=40, turns=4, burst=(1, 1), burst_gap=0.0,
+        think_time=1.0, ramp_up=5.0, ignored_ratio=1.0, dashboard_clients=1,
+    ),
+    "bursty": TrafficProfile(
+        "Patients typing several short messages in a row (coalescing)",
+        conversations=30, turns=3, burst=(3, 6), burst_gap=0.3,
+        think_time=1.0, ramp_up=3.0, dashboard_clients=1,
+    ),
+    "concurrent": TrafficProfile(
+        "Hundreds of conversations starting at once",
+        conversations=300, turns=2, burst=(1, 2), burst_gap=0.2,
+        think_time=0.5, ramp_up=2.0, dashboard_clients=1,
+    ),
+    "slow_dashboard": TrafficProfile(
+        "Steady traffic with dashboards that cannot keep up",
+        conversations=40, turns=3, burst=(1, 2), burst_gap=0.2,
+        think_time=1.0, ramp_up=3.0, dashboard_clients=8, dashboard_send_delay=0.5,
+    ),
+}
+
+
+# ========== Stand-ins ==========
+class FakeZAPI:
+    """Z-API HTTP server stand-in that tracks replies per patient."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._first_chunks: Dict[str, List[float]] = {}
+        self._complete: Dict[str, List[float]] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+        self.app = FastAPI()
+        self.app.add_api_route(
+            "/instances/{instance_id}/token/{token}/{endpoint}",
+            self.handle,
+            methods=["GET", "POST", "PUT"],
+        )
+
+    async def handle(self, endpoint: str, request: Request) -> Dict[str, Any]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.calls[endpoint] += 1
+
+        if endpoint == "send-text":
+            payload = await request.json()
+            self._record_reply(payload["phone"], payload.get("message", ""))
+        return {"zaapId": uuid.uuid4().hex, "messageId": uuid.uuid4().hex, "id": uuid.uuid4().hex}
+
+    def _record_reply(self, phone: str, text: str):
+        now = time.perf_counter()
+        self._first_chunks.setdefault(phone, []).append(now)
+        if text.rstrip().endswith(REPLY_END):
+            self._complete.setdefault(phone, []).append(now)
+        event = self._events.get(phone)
+        if event is not None:
+            event.set()
+
+    async def wait_reply(self, phone: str, after: float, timeout: float) -> Tuple[float, float]:
+        """
+        Wait for the first reply chunk and the end of a reply sent after `after`.
+
+        Returns:
+            (first chunk time, last chunk time), in time.perf_counter() seconds
+
+        Raises:
+            asyncio.TimeoutError: If no complete reply arrives within the timeout
+        """
+        event = self._events.setdefault(phone, asyncio.Event())
+        deadline = time.perf_counter() + timeout
+        while True:
+            first = next((t for t in self._first_chunks.get(phone, []) if t >= after), None)
+            last = next((t for t in self._complete.get(phone, []) if t >= after), None)
+            if first is not None and last is not None:
+                self._first_chunks[phone] = []
+                self._complete[phone] = []
+                return first, last
+            event.clear()
+            await asyncio.wait_for(event.wait(), timeout=max(deadline - time.perf_counter(), 0))
+
+
+@dataclass
+class Fact:
+    """The fields GraphitiService reads from a search result (an EntityEdge)."""
+
+    uuid: str
+    fact: str
+    source_node_uuid: str
+    valid_at: datetime
+    invalid_at: Optional[datetime] = None
+
+
+class InMemoryGraphiti:
+    """Graphiti stand-in: episodes become facts, search is word overlap."""
+
+    def __init__(self, latency: float, max_facts: int = 10_000):
+        self.latency = latency
+        # Bounded, so the stand-in does not show up as memory growth of the app
+        self.facts: Deque[Fact] = deque(maxlen=max_facts)
+        self.episodes = 0
+        self.searches = 0
+
+    async def build_indices_and_constraints(self):
+        pass
+
+    async def add_episode(self, name: str, episode_body: str, reference_time: datetime, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self._store(name, episode_body, reference_time)
+
+    async def add_episode_bulk(self, episodes: List[Any]):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for episode in episodes:
+            self._store(episode.name, episode.content, episode.reference_time)
+
+    def _store(self, name: str, body: str, reference_time: datetime):
+        self.episodes += 1
+        self.facts.append(Fact(uuid.uuid4().hex, body[:300], name, reference_time))
+
+    async def search(self, query: str, num_results: int = 10) -> List[Fact]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.searches += 1
+        words = set(query.lower().split())
+        scored = [
+            (len(words & set(fact.fact.lower().split())), index, fact)
+            for index, fact in enumerate(self.facts)
+        ]
+        scored = [item for item in scored if item[0]]
+        scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        return [fact for _, _, fact in scored[:num_results]]
+
+    async def close(self):
+        pass
+
+
+class SlowDashboard:
+    """Dashboard WebSocket stand-in that takes `delay` seconds per event."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += 1
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+class ScriptedLLM:
+    """
+    Deterministic stand-in for the OpenAI model.
+
+    Questions about a treatment get a find_treatment_info call first (like
+    the real model), everything else a direct answer.
+    """
+
+    def __init__(self, latency: float, chunk_delay: float):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.requests = 0
+
+    @staticmethod
+    def _tool_query(messages: List[Any], tool_names: List[str]) -> Optional[str]:
+        """The treatment to look up, or None to answer right away."""
+        from pydantic_ai.messages import ModelRequest, ToolReturnPart, UserPromptPart
+
+        last = messages[-1]
+        if "find_treatment_info" not in tool_names or not isinstance(last, ModelRequest):
+            return None
+        if any(isinstance(part, ToolReturnPart) for part in last.parts):
+            return None
+        prompt = " ".join(
+            part.content for part in last.parts
+            if isinstance(part, UserPromptPart) and isinstance(part.content, str)
+        ).lower()
+        return next((treatment for word, treatment in TREATMENT_KEYWORDS.items() if word in prompt), None)
+
+    @staticmethod
+    def _reply_sentences() -> List[str]:
+        return [
+            "Claro, fico feliz em ajudar! ",
+            "Aqui na clínica avaliamos cada caso com calma na primeira consulta. ",
+            "Os valores dependem do plano de tratamento e podem ser parcelados. ",
+            REPLY_END,
+        ]
+
+    async def respond(self, messages: List[Any], info: Any) -> Any:
+        from pydantic_ai.messages import ModelResponse, TextPart, ToolCallPart
+
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        query = self._tool_query(messages, [tool.name for tool in info.function_tools])
+        if query:
+            return ModelResponse(parts=[ToolCallPart("find_treatment_info", {"treatment_query": query})])
+        return ModelResponse(parts=[TextPart("".join(self._reply_sentences()))])
+
+    async def stream(self, messages: List[Any], info: Any) -> AsyncIterator[Union[str, Dict[int, Any]]]:
+        from pydantic_ai.models.function import DeltaToolCall
+
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        query = self._tool_query(messages, [tool.name for tool in info.function_tools])
+        if query:
+            yield {0: DeltaToolCall("find_treatment_info", json.dumps({"treatment_query": query}))}
+            return
+        for word in re.findall(r"\S+\s*", "".join(self._reply_sentences())):
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            yield word
+
+
+# ========== Harness ==========
+def reserve_port() -> socket.socket:
+    """A listening socket on a free local port, handed to uvicorn later."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    return sock
+
+
+def configure_environment(workdir: Path, zapi_url: str):
+    """
+    Point the app at the stand-ins and at throwaway storage.
+
+    Must run before config.settings is imported. Existing environment
+    variables win, except the Z-API URL.
+    """
+    os.environ["ZAPI_BASE_URL"] = zapi_url
+    defaults = {
+        "ZAPI_INSTANCE_ID": "bench",
+        "ZAPI_TOKEN": "bench",
+        "ZAPI_CLIENT_TOKEN": "bench",
+        "ZAPI_RATE_LIMIT_ENABLED": "false",
+        "OPENAI_API_KEY": "bench",
+        "CLINIC_PHONE": "5511000000000",
+        "DEBUG": "false",
+        "TYPING_DELAY": "0",
+        "EMBEDDING_BACKEND": "hashing",
+        "EMBEDDING_CACHE_DIR": str(workdir / "embeddings"),
+        "EVENT_BUS": "local",
+        "METRICS_DIR": "",
+        "QUEUE_DB_PATH": str(workdir / "queue.db"),
+        "TRANSCRIPT_DB_PATH": str(workdir / "transcripts.db"),
+        "MEMORY_DB_PATH": str(workdir / "memory.db"),
+        "GRAPHITI_SPOOL_PATH": str(workdir / "graphiti_spool.jsonl"),
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+
+
+def webhook_payload(message_id: str, phone: str, name: str, text: str, group: bool = False) -> Dict[str, Any]:
+    """A Z-API ReceivedCallback body."""
+    return {
+        "instanceId": "bench",
+        "messageId": message_id,
+        "phone": "120363000000000000-group" if group else phone,
+        "fromMe": False,
+        "momment": int(time.time() * 1000),
+        "status": "RECEIVED",
+        "chatName": "Grupo Família" if group else name,
+        "senderName": name,
+        "participantPhone": phone if group else None,
+        "type": "ReceivedCallback",
+        "text": {"message": text},
+        "isGroup": group,
+        "isNewsletter": False,
+    }
+
+
+def percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    """Latency summary in milliseconds (nearest rank)."""
+    if not samples:
+        return {"count": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None, "mean_ms": None}
+    ordered = sorted(samples)
+
+    def rank(q: float) -> float:
+        return ordered[min(max(int(q / 100 * len(ordered) + 0.999999), 1), len(ordered)) - 1] * 1000
+
+    return {
+        "count": len(ordered),
+        "p50_ms": round(rank(50), 1),
+        "p95_ms": round(rank(95), 1),
+        "p99_ms": round(rank(99), 1),
+        "max_ms": round(ordered[-1] * 1000, 1),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 1),
+    }
+
+
+class LoadTest:
+    """Replays one traffic profile against the app and collects results."""
+
+    def __init__(self, profile: TrafficProfile, zapi: FakeZAPI, client: httpx.AsyncClient,
+                 seed: int, reply_timeout: float):
+        self.profile = profile
+        self.zapi = zapi
+        self.client = client
+        self.rng = random.Random(seed)
+        self.reply_timeout = reply_timeout
+        self.run_id = uuid.uuid4().hex[:8]
+        self.messages_sent = 0
+        self.callbacks_sent = 0
+        self.statuses: Counter = Counter()
+        self.ack_latencies: List[float] = []
+        self.first_reply_latencies: List[float] = []
+        self.full_reply_latencies: List[float] = []
+        self.reply_timeouts = 0
+
+    async def post(self, payload: Dict[str, Any]) -> int:
+        start = time.perf_counter()
+        try:
+            response = await self.client.post("/webhook/message", json=payload)
+            status = response.status_code
+        except httpx.HTTPError:
+            status = 0
+        self.ack_latencies.append(time.perf_counter() - start)
+        self.statuses[str(status)] += 1
+        return status
+
+    async def conversation(self, index: int):
+        profile = self.profile
+        rng = random.Random(self.rng.random())
+        phone = f"55119{index:08d}"
+        name = f"Paciente {index}"
+        await asyncio.sleep(rng.uniform(0, profile.ramp_up))
+
+        for turn in range(profile.turns):
+            for i in range(rng.randint(*profile.burst)):
+                if i:
+                    await asyncio.sleep(profile.burst_gap)
+                callbacks = int(profile.ignored_ratio) + (rng.random() < profile.ignored_ratio % 1)
+                for c in range(callbacks):
+                    await self.post(webhook_payload(
+                        f"G{self.run_id}-{index}-{turn}-{i}-{c}", phone, name, "kkkk", group=True
+                    ))
+                    self.callbacks_sent += 1
+                await self.post(webhook_payload(
+                    f"M{self.run_id}-{index}-{turn}-{i}", phone, name, rng.choice(PATIENT_MESSAGES)
+                ))
+                self.messages_sent += 1
+
+            sent = time.perf_counter()
+            try:
+                first, last = await self.zapi.wait_reply(phone, sent, self.reply_timeout)
+            except asyncio.TimeoutError:
+                self.reply_timeouts += 1
+                continue
+            self.first_reply_latencies.append(first - sent)
+            self.full_reply_latencies.append(last - sent)
+            await asyncio.sleep(rng.expovariate(1 / profile.think_time) if profile.think_time else 0)
+
+    async def run(self, conversations: int) -> float:
+        """Run all conversations; returns the elapsed seconds."""
+        start = time.perf_counter()
+        await asyncio.gather(*(self.conversation(index) for index in range(conversations)))
+        return time.perf_counter() - start
+
+
+async def wait_for_idle(queue: Any, timeout: float):
+    """Wait until the message queue has no pending or running turns."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        stats = queue.stats()
+        if not stats["pending"] and not stats["running"]:
+            return
+        await asyncio.sleep(0.1)
+
+
+class MemorySampler:
+    """Samples tracemalloc's traced memory while the load runs."""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.samples: List[Tuple[float, float]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._start = 0.0
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            current, _ = tracemalloc.get_traced_memory()
+            self.samples.append((round(time.perf_counter() - self._start, 2), round(current / 2**20, 2)))
+            await asyncio.sleep(self.interval)
+
+
+def git_version() -> Dict[str, Any]:
+    """Commit of the code under test, for comparing results between versions."""
+    root = Path(__file__).parent.parent
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=root, capture_output=True, text=True, check=True,
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def counter_values(snapshot: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Counters of a metrics registry snapshot, as {metric: {labels: value}}."""
+    values = {}
+    for name, metric in snapshot["metrics"].items():
+        if metric["type"] != "counter":
+            continue
+        values[name] = {
+            ",".join(f"{label}={value}" for label, value in zip(metric["labelnames"], labels) if value): total
+            for labels, total in metric["samples"]
+        }
+    return values
+
+
+async def run_load_test(args: argparse.Namespace, profile: TrafficProfile) -> Dict[str, Any]:
+    workdir = Path(tempfile.mkdtemp(prefix="berenice-load-"))
+    sock = reserve_port()
+    host, port = sock.getsockname()
+    configure_environment(workdir, f"http://{host}:{port}")
+
+    # The app reads its settings on import, so import it only now
+    import main
+    from agent.sdr_agent import TracedModel, sdr_agent, summary_agent
+    from config.settings import settings
+    from pydantic_ai.models.function import FunctionModel
+    from services.graphiti_service import graphiti_service
+    from services.metrics_service import REGISTRY
+    from services.queue_service import message_queue
+    from services.timing_service import turn_timings
+    from services.websocket_service import ws_manager
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    zapi = FakeZAPI(args.zapi_latency)
+    server = uvicorn.Server(uvicorn.Config(zapi.app, log_level="warning", lifespan="off"))
+    server_task = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    graph = InMemoryGraphiti(args.graphiti_latency)
+
+    async def connect_stand_in():
+        graphiti_service.graphiti = graph
+
+    graphiti_service._connect = connect_stand_in
+
+    llm = ScriptedLLM(args.llm_latency, args.llm_chunk_delay)
+    model = TracedModel(FunctionModel(llm.respond, stream_function=llm.stream))
+    conversations = max(1, int(profile.conversations * args.scale))
+
+    with sdr_agent.override(model=model), summary_agent.override(model=model):
+        async with main.lifespan(main.app):
+            dashboards = [SlowDashboard(profile.dashboard_send_delay) for _ in range(profile.dashboard_clients)]
+            for dashboard in dashboards:
+                await ws_manager.connect(dashboard)
+
+            transport = httpx.ASGITransport(app=main.app)
+            limits = httpx.Limits(max_connections=None)
+            async with httpx.AsyncClient(transport=transport, base_url="http://app", limits=limits) as client:
+                # Warm up (imports, caches, connection pool) outside the measurement
+                warmup = LoadTest(TrafficProfile("warm-up", 1, 1, (1, 1), 0, 0, 0), zapi, client,
+                                  args.seed, args.reply_timeout)
+                await warmup.run(2)
+                await wait_for_idle(message_queue, args.reply_timeout)
+
+                gc.collect()
+                if args.tracemalloc:
+                    tracemalloc.start()
+                    baseline = tracemalloc.take_snapshot()
+                    baseline_bytes, _ = tracemalloc.get_traced_memory()
+                    tracemalloc.reset_peak()
+                    sampler = MemorySampler()
+                    sampler.start()
+
+                test = LoadTest(profile, zapi, client, args.seed, args.reply_timeout)
+                elapsed = await test.run(conversations)
+                await wait_for_idle(message_queue, args.reply_timeout)
+
+                memory: Dict[str, Any] = {"tracemalloc": args.tracemalloc}
+                if args.tracemalloc:
+                    await sampler.stop()
+                    gc.collect()
+                    final_bytes, peak_bytes = tracemalloc.get_traced_memory()
+                    top = tracemalloc.take_snapshot().compare_to(baseline, "lineno")[:args.top_allocations]
+                    tracemalloc.stop()
+                    memory.update({
+                        "peak_mb": round(peak_bytes / 2**20, 2),
+                        "growth_mb": round((final_bytes - baseline_bytes) / 2**20, 2),
+                        "top_growth": [str(stat) for stat in top],
+                        "samples": sampler.samples,
+                    })
+                if RESOURCE_AVAILABLE:
+                    memory["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+            app_stats = {
+                "queue": message_queue.stats(),
+                "turn_timings": turn_timings.stats(),
+                "websocket": ws_manager.stats(),
+                "dashboards_received": [dashboard.received for dashboard in dashboards],
+                "graphiti": graphiti_service.writer_stats(),
+                "counters": counter_values(REGISTRY.snapshot()),
+            }
+            for dashboard in dashboards:
+                ws_manager.disconnect(dashboard)
+
+    server.should_exit = True
+    await server_task
+
+    return {
+        "benchmark": "load_test",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "version": git_version(),
+        "python": platform.python_version(),
+        "profile": {"name": args.profile, **asdict(profile), "conversations": conversations},
+        "options": {
+            "seed": args.seed,
+            "llm_latency": args.llm_latency,
+            "llm_chunk_delay": args.llm_chunk_delay,
+            "zapi_latency": args.zapi_latency,
+            "graphiti_latency": args.graphiti_latency,
+            "stream_responses": settings.stream_responses,
+            "coalesce_window_seconds": settings.coalesce_window_seconds,
+            "typing_delay": settings.typing_delay,
+            "zapi_rate_limit_enabled": settings.zapi_rate_limit_enabled,
+            "queue_max_concurrency": settings.queue_max_concurrency,
+        },
+        "results": {
+            "elapsed_s": round(elapsed, 2),
+            "messages_sent": test.messages_sent,
+            "callbacks_sent": test.callbacks_sent,
+            "messages_per_sec": round(test.messages_sent / elapsed, 2),
+            "webhooks_per_sec": round((test.messages_sent + test.callbacks_sent) / elapsed, 2),
+            "replies": len(test.full_reply_latencies),
+            "reply_timeouts": test.reply_timeouts,
+            "webhook_status": dict(test.statuses),
+            "webhook_ack": percentiles(test.ack_latencies),
+            "first_reply": percentiles(test.first_reply_latencies),
+            "full_reply": percentiles(test.full_reply_latencies),
+            "memory": memory,
+        },
+        "stand_ins": {
+            "zapi_calls": dict(zapi.calls),
+            "llm_requests": llm.requests,
+            "graphiti_episodes": graph.episodes,
+            "graphiti_searches": graph.searches,
+        },
+        "app": app_stats,
+    }
+
+
+# ========== Reporting ==========
+COMPARED = [
+    ("messages/sec", ("results", "messages_per_sec"), True),
+    ("ack p95 ms", ("results", "webhook_ack", "p95_ms"), False),
+    ("first reply p50 ms", ("results", "first_reply", "p50_ms"), False),
+    ("first reply p95 ms", ("results", "first_reply", "p95_ms"), False),
+    ("first reply p99 ms", ("results", "first_reply", "p99_ms"), False),
+    ("full reply p95 ms", ("results", "full_reply", "p95_ms"), False),
+    ("reply timeouts", ("results", "reply_timeouts"), False),
+    ("memory growth MB", ("results", "memory", "growth_mb"), False),
+    ("peak memory MB", ("results", "memory", "peak_mb"), False),
+]
+
+
+def lookup(result: Dict[str, Any], path: Tuple[str, ...]) -> Optional[float]:
+    for key in path:
+        if not isinstance(result, dict):
+            return None
+        result = result.get(key)
+    return result
+
+
+def print_summary(result: Dict[str, Any]):
+    results = result["results"]
+    profile = result["profile"]
+    print(f"profile={profile['name']} conversations={profile['conversations']} "
+          f"commit={result['version']['commit']}{'+' if result['version']['dirty'] else ''}")
+    print(f"{results['messages_sent']} messages + {results['callbacks_sent']} callbacks "
+          f"in {results['elapsed_s']}s: {results['messages_per_sec']} msg/s, "
+          f"{results['replies']} replies, {results['reply_timeouts']} timeouts, "
+          f"status {results['webhook_status']}")
+    for label in ("webhook_ack", "first_reply", "full_reply"):
+        stats = results[label]
+        print(f"{label:>12}: p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms "
+              f"p99={stats['p99_ms']}ms max={stats['max_ms']}ms")
+    memory = results["memory"]
+    if memory.get("tracemalloc"):
+        print(f"{'memory':>12}: growth={memory['growth_mb']}MB peak={memory['peak_mb']}MB "
+              f"(allocated during the run, tracemalloc)")
+
+
+def print_comparison(old: Dict[str, Any], new: Dict[str, Any]):
+    """Table of key results against an earlier run; flags regressions over 10%."""
+    print(f"\n{'metric':>20} | {'before':>10} | {'after':>10} | {'change':>8}")
+    print("-" * 58)
+    for label, path, higher_is_better in COMPARED:
+        before, after = lookup(old, path), lookup(new, path)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before * 100 if before else 0.0
+        worse = change < -10 if higher_is_better else change > 10
+        flag = "  <- regression" if worse and abs(after - before) > 1e-9 else ""
+        print(f"{label:>20} | {before:>10} | {after:>10} | {change:>+7.1f}%{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="steady")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the profile's conversations")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds per LLM request")
+    parser.add_argument("--llm-chunk-delay", type=float, default=0.01, help="seconds per streamed word")
+    parser.add_argument("--zapi-latency", type=float, default=0.02, help="seconds per Z-API call")
+    parser.add_argument("--graphiti-latency", type=float, default=0.05, help="seconds per graph call")
+    parser.add_argument("--reply-timeout", type=float, default=60.0)
+    parser.add_argument("--no-tracemalloc", dest="tracemalloc", action="store_false",
+                        help="skip memory tracking (tracemalloc slows the app down)")
+    parser.add_argument("--top-allocations", type=int, default=10,
+                        help="allocation sites with the most growth to report")
+    parser.add_argument("--output", type=Path, help="result file (default: benchmarks/results/)")
+    parser.add_argument("--compare", type=Path, help="earlier result file to compare against")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's INFO logs")
+    args = parser.parse_args()
+
+    profile = PROFILES[args.profile]
+    print(f"{args.profile}: {profile.description}")
+    result = asyncio.run(run_load_test(args, profile))
+
+    output = args.output or RESULTS_DIR / (
+        f"load_{args.profile}_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2, ensure_ascii=False, default=str), encoding="utf-8")
+
+    print_summary(result)
+    print(f"Saved {output}")
+    if args.compare:
+        print_comparison(json.loads(args.compare.read_text(encoding="utf-8")), result)
+    if result["results"]["reply_timeouts"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
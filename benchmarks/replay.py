@@ -0,0 +1,292 @@
+"""
+Replay captured Z-API webhooks against a running build, for capacity planning.
+
+Reads capture files written with CAPTURE_ENABLED=true (see
+services/capture_service.py) and re-sends every payload to the same webhook
+endpoint of --target, keeping the original inter-arrival times divided by
+--speed. Given several speeds, it replays once per speed, in order, and
+stops at the first one where the error rate or the lag passes its limit:
+the breaking point.
+
+- lag: how late a request was sent compared to its schedule (the target
+  answers too slowly for --concurrency requests in flight, or the
+  replayer itself cannot keep up)
+- errors: transport failures, timeouts and non-2xx answers (including
+  503 busy from a full message queue)
+
+Message IDs get a per-pass suffix so the target's deduplication does not
+swallow repeated passes (--keep-ids to send them unchanged). Point the
+target's ZAPI_BASE_URL at a Z-API sandbox or stub: its replies go to the
+pseudonymized phone numbers of the capture.
+
+Run: python -m benchmarks.replay data/capture/*.jsonl.gz --target http://localhost:8000 --speed 1 5 10 25 50
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.load_test import percentiles
+from services.capture_service import read_capture
+
+MIN_SPEED = 1.0
+MAX_SPEED = 50.0
+
+
+@dataclass
+class CapturedRequest:
+    """A webhook to re-send, `offset` seconds after the first one."""
+
+    offset: float
+    endpoint: str
+    payload: Optional[Dict[str, Any]]
+    raw: Optional[str] = None
+
+    def body(self, id_suffix: str) -> bytes:
+        if self.payload is None:
+            return (self.raw or "").encode("utf-8")
+        if id_suffix and isinstance(self.payload.get("messageId"), str):
+            return json.dumps({**self.payload, "messageId": self.payload["messageId"] + id_suffix}).encode("utf-8")
+        return json.dumps(self.payload).encode("utf-8")
+
+
+def load_capture(
+    paths: List[Path],
+    endpoints: List[str],
+    start: float = 0.0,
+    duration: Optional[float] = None,
+    limit: Optional[int] = None,
+) -> List[CapturedRequest]:
+    """
+    Merge capture files (e.g. one per worker) in arrival order.
+
+    Args:
+        paths: Capture files
+        endpoints: Endpoints to replay ("message", "status")
+        start: Skip the first `start` seconds of the capture
+        duration: Only replay this many seconds of the capture
+        limit: Only replay this many requests
+    """
+    records = [
+        record
+        for path in paths
+        for record in read_capture(str(path))
+        if record["endpoint"] in endpoints
+    ]
+    records.sort(key=lambda record: record["t"])
+    if not records:
+        return []
+
+    first = records[0]["t"] + start
+    end = first + duration if duration is not None else float("inf")
+    selected = [
+        CapturedRequest(record["t"] - first, record["endpoint"], record.get("payload"), record.get("raw"))
+        for record in records
+        if first <= record["t"] <= end
+    ]
+    return selected[:limit] if limit else selected
+
+
+class PassStats:
+    """Results of one replay pass, overall and per reporting window."""
+
+    def __init__(self):
+        self.sent = 0
+        self.in_flight = 0
+        self.lags: List[float] = []
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors = 0
+        self.windows: List[Dict[str, Any]] = []
+        self._window_start = 0
+        self._window_errors = 0
+
+    def record(self, lag: float, latency: float, status: str, error: bool):
+        self.sent += 1
+        self.lags.append(lag)
+        self.latencies.append(latency)
+        self.statuses[status] += 1
+        if error:
+            self.errors += 1
+            self._window_errors += 1
+
+    def close_window(self, elapsed: float, interval: float) -> Dict[str, Any]:
+        """Summarize the requests finished since the previous window."""
+        lags = self.lags[self._window_start:]
+        sent = len(lags)
+        window = {
+            "elapsed_s": round(elapsed, 1),
+            "sent": sent,
+            "rate": round(sent / interval, 1),
+            "error_rate": round(self._window_errors / sent, 4) if sent else 0.0,
+            "in_flight": self.in_flight,
+            "lag_p95_ms": percentiles(lags)["p95_ms"],
+            "latency_p95_ms": percentiles(self.latencies[self._window_start:])["p95_ms"],
+        }
+        self.windows.append(window)
+        self._window_start = len(self.lags)
+        self._window_errors = 0
+        return window
+
+
+async def replay_pass(
+    requests: List[CapturedRequest],
+    target: str,
+    speed: float,
+    concurrency: int,
+    timeout: float,
+    keep_ids: bool,
+    report_interval: float,
+) -> Dict[str, Any]:
+    """Re-send the capture once at the given speed."""
+    stats = PassStats()
+    id_suffix = "" if keep_ids else f"-replay{uuid.uuid4().hex[:6]}"
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {"content-type": "application/json"}
+
+    async with httpx.AsyncClient(base_url=target, timeout=timeout, limits=limits) as client:
+
+        async def send(request: CapturedRequest, due: float):
+            started = time.perf_counter()
+            status, error = "error", True
+            try:
+                response = await client.post(f"/webhook/{request.endpoint}", content=request.body(id_suffix),
+                                             headers=headers)
+                status, error = str(response.status_code), not response.is_success
+            except httpx.TimeoutException:
+                status = "timeout"
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            finally:
+                stats.in_flight -= 1
+                semaphore.release()
+            stats.record(started - due, time.perf_counter() - started, status, error)
+
+        async def report(begin: float):
+            while True:
+                await asyncio.sleep(report_interval)
+                window = stats.close_window(time.perf_counter() - begin, report_interval)
+                print(f"  {speed:>4g}x t={window['elapsed_s']:>6}s sent={window['sent']:>5} "
+                      f"rate={window['rate']:>7}/s errors={window['error_rate']:>6.1%} "
+                      f"in_flight={window['in_flight']:>4} lag_p95={window['lag_p95_ms']}ms "
+                      f"latency_p95={window['latency_p95_ms']}ms")
+
+        begin = time.perf_counter()
+        reporter = asyncio.create_task(report(begin))
+        tasks = set()
+        for request in requests:
+            due = begin + request.offset / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await semaphore.acquire()
+            stats.in_flight += 1
+            task = asyncio.create_task(send(request, due))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - begin
+        reporter.cancel()
+        await asyncio.gather(reporter, return_exceptions=True)
+
+    captured_span = requests[-1].offset if requests else 0.0
+    return {
+        "speed": speed,
+        "requests": stats.sent,
+        "elapsed_s": round(elapsed, 2),
+        "target_rate": round(stats.sent / (captured_span / speed), 2) if captured_span else None,
+        "achieved_rate": round(stats.sent / elapsed, 2) if elapsed else None,
+        "error_rate": round(stats.errors / stats.sent, 4) if stats.sent else 0.0,
+        "statuses": dict(stats.statuses),
+        "lag": percentiles(stats.lags),
+        "latency": percentiles(stats.latencies),
+        "windows": stats.windows,
+    }
+
+
+def speed_arg(value: str) -> float:
+    speed = float(value)
+    if not MIN_SPEED <= speed <= MAX_SPEED:
+        raise argparse.ArgumentTypeError(f"speed must be between {MIN_SPEED:g} and {MAX_SPEED:g}")
+    return speed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("captures", nargs="+", type=Path, help="capture files (.jsonl.gz)")
+    parser.add_argument("--target", default="http://localhost:8000", help="base URL of the build under test")
+    parser.add_argument("--speed", type=speed_arg, nargs="+", default=[1.0],
+                        help="time compression factors (1-50), replayed in order")
+    parser.add_argument("--concurrency", type=int, default=50, help="maximum requests in flight")
+    parser.add_argument("--timeout", type=float, default=10.0, help="per-request timeout in seconds")
+    parser.add_argument("--endpoints", nargs="+", choices=["message", "status"], default=["message", "status"])
+    parser.add_argument("--start", type=float, default=0.0, help="skip the first seconds of the capture")
+    parser.add_argument("--duration", type=float, help="replay only this many captured seconds")
+    parser.add_argument("--limit", type=int, help="replay only this many requests")
+    parser.add_argument("--keep-ids", action="store_true", help="do not make message IDs unique per pass")
+    parser.add_argument("--max-error-rate", type=float, default=0.01,
+                        help="stop stepping up the speed above this error rate")
+    parser.add_argument("--max-lag", type=float, default=1.0,
+                        help="stop stepping up the speed when the p95 lag exceeds this many seconds")
+    parser.add_argument("--report-interval", type=float, default=10.0, help="seconds between progress lines")
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    args = parser.parse_args()
+
+    requests = load_capture(args.captures, args.endpoints, args.start, args.duration, args.limit)
+    if not requests:
+        sys.exit("No captured requests to replay")
+    captured_span = requests[-1].offset
+    print(f"{len(requests)} requests over {captured_span:.0f}s of captured traffic -> {args.target}")
+
+    passes = []
+    breaking_point = None
+    for speed in args.speed:
+        print(f"Replaying at {speed:g}x (about {captured_span / speed:.0f}s)")
+        result = asyncio.run(replay_pass(
+            requests, args.target, speed, args.concurrency, args.timeout, args.keep_ids, args.report_interval
+        ))
+        passes.append(result)
+        lag_p95 = (result["lag"]["p95_ms"] or 0) / 1000
+        print(f"{speed:>5g}x: {result['requests']} requests in {result['elapsed_s']}s "
+              f"({result['achieved_rate']}/s of {result['target_rate']}/s), "
+              f"errors {result['error_rate']:.2%} {result['statuses']}, "
+              f"lag p50/p95/max {result['lag']['p50_ms']}/{result['lag']['p95_ms']}/{result['lag']['max_ms']}ms, "
+              f"latency p50/p95 {result['latency']['p50_ms']}/{result['latency']['p95_ms']}ms")
+        if result["error_rate"] > args.max_error_rate or lag_p95 > args.max_lag:
+            breaking_point = speed
+            print(f"Breaking point at {speed:g}x (error rate limit {args.max_error_rate:.2%}, "
+                  f"p95 lag limit {args.max_lag:g}s)")
+            break
+
+    sustained = [result["speed"] for result in passes if result["speed"] != breaking_point]
+    report = {
+        "benchmark": "replay",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "target": args.target,
+        "captures": [str(path) for path in args.captures],
+        "requests": len(requests),
+        "captured_seconds": round(captured_span, 1),
+        "concurrency": args.concurrency,
+        "limits": {"max_error_rate": args.max_error_rate, "max_lag_s": args.max_lag},
+        "max_sustained_speed": max(sustained) if sustained else None,
+        "breaking_point": breaking_point,
+        "passes": passes,
+    }
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,16 +19,148 @@ class Settings(BaseSettings):
     neo4j_user: str = "neo4j"
     neo4j_password: str = "password"
 
+    # Graphiti write-behind ingestion
+    graphiti_bulk_ingest: bool = True
+    graphiti_write_queue_size: int = 1000
+    graphiti_write_batch_size: int = 20
+    graphiti_write_flush_interval: float = 2.0
+    graphiti_write_max_retries: int = 3
+    graphiti_write_retry_delay: float = 1.0
+    graphiti_shutdown_flush_timeout: float = 10.0
+    graphiti_connect_timeout: float = 10.0
+    graphiti_reconnect_interval: float = 15.0  # degraded mode: reconnect / spool replay period
+    graphiti_spool_path: str = "data/graphiti_spool.jsonl"
+    graphiti_spool_max_bytes: int = 50_000_000
+
     # OpenAI API
     openai_api_key: str = ""
     model_choice: str = "gpt-4o-mini"
 
+    # Semantic knowledge-base search
+    semantic_search: bool = True
+    embedding_backend: str = "hashing"  # "hashing" (offline) or "openai"
+    embedding_model: str = "text-embedding-3-small"
+    embedding_cache_dir: str = "data/embeddings"
+    semantic_min_score: float = 0.2
+
+    # Knowledge base hot reload (seconds between file checks, 0 disables)
+    knowledge_poll_interval: float = 5.0
+
     # Z-API Configuration
     zapi_instance_id: str = ""
     zapi_token: str = ""
     zapi_client_token: str = ""
     zapi_base_url: str = "https://api.z-api.io"
 
+    # Z-API HTTP client (connection pool and per-endpoint timeouts in seconds)
+    zapi_http2: bool = True
+    zapi_max_connections: int = 20
+    zapi_max_keepalive_connections: int = 10
+    zapi_keepalive_expiry: float = 30.0
+    zapi_connect_timeout: float = 5.0
+    zapi_send_timeout: float = 30.0
+    zapi_media_timeout: float = 60.0
+    zapi_presence_timeout: float = 5.0
+    zapi_read_timeout: float = 10.0
+    # Outbound rate limiting (token buckets, requests per second)
+    zapi_rate_limit_enabled: bool = True
+    zapi_global_rate: float = 10.0
+    zapi_global_burst: int = 20
+    zapi_phone_rate: float = 1.0
+    zapi_phone_burst: int = 5
+    zapi_presence_ttl: float = 10.0  # skip repeating the same presence within this window
+    zapi_max_retries_429: int = 5
+    zapi_backoff_base: float = 1.0
+    zapi_backoff_max: float = 60.0
+    zapi_shutdown_timeout: float = 5.0  # in-flight sends get this long to finish on shutdown
+
+    # Resilience (circuit breakers, retries, deadlines)
+    resilience_failure_threshold: int = 5
+    resilience_reset_timeout: float = 30.0
+    resilience_retry_attempts: int = 3
+    resilience_retry_base_delay: float = 0.2
+    resilience_retry_max_delay: float = 2.0
+    agent_turn_timeout: float = 60.0  # overall budget for one agent turn; 0 disables
+    graphiti_search_timeout: float = 1.5  # per attempt
+    graphiti_search_budget: float = 3.0  # whole search incl. retries; empty result after
+    graphiti_search_hedge_after: float = 0.0  # start a second search after N seconds; 0 disables
+
+    # Tracing (in-process span store for the dashboard)
+    tracing_enabled: bool = True
+    tracing_max_traces: int = 200  # recent traces kept
+    tracing_stats_window: int = 1000  # durations per span name for percentiles
+
+    # Metrics (GET /metrics); set metrics_dir when running several workers
+    metrics_dir: str = ""  # e.g. /tmp/berenice-metrics
+    metrics_snapshot_interval: float = 5.0
+
+    # Webhook traffic capture for replay (benchmarks/replay.py)
+    capture_enabled: bool = False
+    capture_dir: str = "data/capture"
+    capture_anonymize: bool = True
+    capture_secret: str = ""  # key for phone pseudonyms; empty: generated once per capture_dir
+    capture_flush_interval: float = 1.0
+    capture_max_pending: int = 10_000  # buffered payloads; more are dropped
+    capture_max_file_bytes: int = 100_000_000  # start a new file after this
+
+    # Dashboard WebSocket fan-out
+    ws_client_queue_size: int = 100
+    ws_send_timeout: float = 5.0
+    event_bus: str = "local"  # "local", "unix" (same host) or "redis"
+    event_bus_socket_dir: str = "/tmp/berenice-events"
+    event_bus_queue_size: int = 1000
+    event_log_size: int = 1000
+    event_log_path: str = ""  # e.g. data/events.log to keep offsets across restarts
+    event_log_max_bytes: int = 10_000_000
+
+    # Streaming replies (split into several WhatsApp messages as they are generated)
+    stream_responses: bool = True
+    stream_min_chunk_chars: int = 80
+
+    # Turn pipeline
+    typing_delay: float = 1.0  # minimum "typing..." time before the first reply is sent
+    patient_context_prefetch_timeout: float = 1.5  # agent starts without prefetched facts after this
+
+    # Response and tool caches (TTL in seconds)
+    response_cache_enabled: bool = True
+    response_cache_ttl: float = 3600.0
+    response_cache_max_entries: int = 1000
+    response_cache_max_tokens: int = 16  # longer messages (in words) are never cached
+    tool_cache_ttl: float = 600.0
+    tool_cache_max_entries: int = 512
+
+    # Conversation memory (message history fed to the agent)
+    memory_max_conversations: int = 500
+    memory_token_budget: int = 3000
+    memory_summarize_after_messages: int = 8
+    memory_db_path: str = "data/memory.db"  # empty string disables SQLite spillover
+
+    # Conversation state ("memory" or "redis" to share across workers)
+    conversation_store: str = "memory"
+    conversation_idle_ttl: float = 86400.0  # seconds; 0 disables expiry
+    redis_url: str = "redis://localhost:6379/0"
+    redis_key_prefix: str = "berenice:"
+
+    # Webhook deduplication (Z-API redeliveries)
+    dedup_enabled: bool = True
+    dedup_backend: str = "memory"  # or "redis" to share across workers
+    dedup_ttl: float = 3600.0
+    dedup_max_entries: int = 100_000
+    dedup_bloom: bool = False
+    dedup_bloom_error_rate: float = 0.001
+
+    # Dashboard transcripts
+    transcript_db_path: str = "data/transcripts.db"
+
+    # Message Queue
+    queue_db_path: str = "data/queue.db"
+    queue_max_concurrency: int = 10
+    queue_max_pending: int = 1000
+
+    # Message coalescing (debounce window for rapid-fire messages, in seconds)
+    coalesce_window_seconds: float = 1.5
+    coalesce_max_wait_seconds: float = 6.0
+
     # Clinic Configuration
     clinic_name: str = "Clínica Berenice"
     clinic_phone: str = ""
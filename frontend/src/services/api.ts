@@ -151,13 +151,22 @@ export class DashboardWebSocket {
   private onMessageCallback: ((message: Message) => void) | null = null;
   private onStatsCallback: ((stats: Stats) => void) | null = null;
   private onConnectionCallback: ((connected: boolean) => void) | null = null;
+  private logId: string | null = null;
+  private lastOffset: number | null = null;
 
   /**
    * Connect to WebSocket server
+   *
+   * On reconnect, the last seen event offset is sent so the server replays
+   * the events broadcast while we were disconnected.
    */
   connect() {
     try {
-      this.ws = new WebSocket(`${WS_URL}/dashboard/ws`);
+      const resume =
+        this.logId !== null && this.lastOffset !== null
+          ? `?log_id=${encodeURIComponent(this.logId)}&offset=${this.lastOffset}`
+          : '';
+      this.ws = new WebSocket(`${WS_URL}/dashboard/ws${resume}`);
 
       this.ws.onopen = () => {
         console.log('✅ Connected to Berenice AI Dashboard');
@@ -179,11 +188,19 @@ export class DashboardWebSocket {
         try {
           const data = JSON.parse(event.data);
 
-          // Handle different message types
-          if (data.type === 'stats' && this.onStatsCallback) {
-            this.onStatsCallback(data.data);
-          } else if (this.onMessageCallback) {
-            this.onMessageCallback(data);
+          if (data.type === 'connection') {
+            if (this.logId === null) {
+              this.lastOffset = data.offset;
+            }
+            this.logId = data.log_id;
+          } else if (data.type === 'replay') {
+            if (!data.complete) {
+              console.warn('Some dashboard events were lost while disconnected');
+            }
+            data.events.forEach((missed: any) => this.handleEvent(missed));
+            this.lastOffset = Math.max(this.lastOffset ?? 0, data.offset);
+          } else {
+            this.handleEvent(data);
           }
         } catch (error) {
           console.error('Error parsing WebSocket message:', error);
@@ -216,6 +233,22 @@ export class DashboardWebSocket {
     }
   }
 
+  /**
+   * Dispatch a single event to the registered callbacks
+   */
+  private handleEvent(data: any) {
+    if (typeof data.offset === 'number') {
+      this.lastOffset = data.offset;
+    }
+
+    // Handle different message types
+    if (data.type === 'stats' && this.onStatsCallback) {
+      this.onStatsCallback(data.data);
+    } else if (this.onMessageCallback) {
+      this.onMessageCallback(data);
+    }
+  }
+
   /**
    * Disconnect from WebSocket server
    */
@@ -4,10 +4,22 @@ Main FastAPI application for Berenice AI SDR Agent.
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from api.webhooks import router as webhooks_router
+from api.webhooks import router as webhooks_router, process_message, merge_message_payloads
 from api.dashboard import router as dashboard_router
 from services.graphiti_service import graphiti_service
+from services.zapi_service import zapi_service
+from services.queue_service import message_queue
+from services.memory_service import conversation_memory
+from services.conversation_service import conversation_store
+from services.transcript_service import transcript_store
+from services.dedup_service import message_deduplicator
+from services.knowledge_service import knowledge_base
+from services.websocket_service import ws_manager
+from services import resilience_service as resilience
+from services.metrics_service import QUEUE_PENDING, QUEUE_RUNNING, WS_CLIENTS, metrics_exporter
+from services.capture_service import traffic_capture
 from config.settings import settings, validate_settings
 
 # Configure logging
@@ -32,9 +44,38 @@ async def lifespan(app: FastAPI):
         validate_settings()
         logger.info("✅ Configuration validated")
 
-        # Initialize Graphiti
+        # Initialize Graphiti (degraded mode if Neo4j is unreachable)
         await graphiti_service.initialize()
-        logger.info("✅ Graphiti initialized")
+        graphiti_service.start_writer()
+        if graphiti_service.degraded:
+            logger.warning("⚠️ Graphiti unavailable, running degraded (episodes are spooled)")
+        else:
+            logger.info("✅ Graphiti initialized")
+
+        # Open pooled Z-API client
+        await zapi_service.start()
+        logger.info("✅ Z-API client ready")
+
+        # Relay dashboard events between workers
+        await ws_manager.start()
+        logger.info(f"✅ Dashboard event bus ready ({ws_manager.bus.name})")
+
+        # Watch knowledge/ for edits (hot reload without restart)
+        knowledge_base.start_watching()
+        logger.info(f"✅ Knowledge base v{knowledge_base.snapshot.version} loaded")
+
+        # Start message queue workers (resumes jobs persisted before a restart)
+        await message_queue.start(process_message, merge=merge_message_payloads)
+        logger.info("✅ Message queue started")
+
+        # Publish metrics (GET /metrics)
+        WS_CLIENTS.set_function(lambda: len(ws_manager.active_connections))
+        QUEUE_PENDING.set_function(lambda: message_queue.stats()["pending"])
+        QUEUE_RUNNING.set_function(lambda: message_queue.stats()["running"])
+        metrics_exporter.start()
+
+        # Record webhook payloads for replay (CAPTURE_ENABLED)
+        await traffic_capture.start()
 
         logger.info(f"🚀 Application ready on http://{settings.host}:{settings.port}")
         logger.info(f"📱 Clinic: {settings.clinic_name}")
@@ -50,8 +91,21 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     logger.info("Shutting down Berenice AI SDR Agent...")
+    await message_queue.stop()
+    logger.info("✅ Message queue stopped")
+    await metrics_exporter.stop()
+    await traffic_capture.stop()
+    await knowledge_base.stop_watching()
+    await conversation_memory.close()
+    await conversation_store.close()
+    transcript_store.close()
+    await message_deduplicator.close()
+    logger.info("✅ Conversation memory persisted")
+    await ws_manager.stop()
+    await zapi_service.close()
+    logger.info("✅ Z-API client closed")
     await graphiti_service.close()
-    logger.info("✅ Graphiti connection closed")
+    logger.info("✅ Graphiti episodes flushed and connection closed")
 
 
 # Create FastAPI application
@@ -87,6 +141,7 @@ async def root():
         "endpoints": {
             "webhook": "/webhook/message",
             "health": "/webhook/health",
+            "metrics": "/metrics",
             "docs": "/docs",
         },
     }
@@ -95,13 +150,26 @@ async def root():
 @app.get("/health")
 async def health():
     """Health check endpoint."""
+    breakers = resilience.breaker_states()
+    degraded = graphiti_service.degraded or any(
+        breaker["state"] != "closed" for breaker in breakers.values()
+    )
     return {
-        "status": "healthy",
+        "status": "degraded" if degraded else "healthy",
         "service": "berenice-ai-sdr",
-        "graphiti": "connected" if graphiti_service.graphiti else "disconnected",
+        "graphiti": "degraded" if graphiti_service.degraded else "connected",
+        "breakers": breakers,
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics, summed over all workers."""
+    return PlainTextResponse(
+        metrics_exporter.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
 
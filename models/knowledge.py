@@ -0,0 +1,47 @@
+"""
+Pydantic models validating the knowledge base JSON files.
+"""
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field
+
+
+class Treatment(BaseModel):
+    """A treatment entry in treatments.json."""
+
+    id: str
+    name: str
+    description: str
+    duration: str
+    price_range: str
+    frequency: Optional[str] = None
+    benefits: List[str] = Field(default_factory=list)
+    keywords: List[str] = Field(default_factory=list)
+
+
+class TreatmentsFile(BaseModel):
+    """Schema of knowledge/treatments.json."""
+
+    treatments: List[Treatment]
+    payment_options: Dict[str, Any] = Field(default_factory=dict)
+    accepted_insurance: List[str] = Field(default_factory=list)
+
+
+class FAQ(BaseModel):
+    """A question/answer pair in faqs.json."""
+
+    question: str
+    answer: str
+
+
+class ObjectionHandling(BaseModel):
+    """Suggested responses for a common objection in faqs.json."""
+
+    objection: str
+    responses: List[str]
+
+
+class FAQsFile(BaseModel):
+    """Schema of knowledge/faqs.json."""
+
+    faqs: List[FAQ]
+    objection_handling: List[ObjectionHandling] = Field(default_factory=list)
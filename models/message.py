@@ -1,10 +1,18 @@
 """
 Pydantic models for WhatsApp messages.
 """
+import json
 from datetime import datetime
 from typing import Optional, Dict, Any
 from pydantic import BaseModel, Field
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
 
 class WebhookMessage(BaseModel):
     """Model for incoming webhook message from Z-API."""
@@ -59,6 +67,46 @@ class WebhookMessage(BaseModel):
         return self.senderName or self.chatName or self.phone
 
 
+def parse_json_body(body: bytes) -> Any:
+    """
+    Decode a webhook body, using orjson when it is installed.
+
+    Raises:
+        ValueError: If the body is not valid JSON
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def webhook_ignore_reason(data: Any) -> Optional[str]:
+    """
+    Cheap pre-filter on a raw webhook payload.
+
+    Lets callbacks we never process (our own messages, groups, newsletters,
+    non-message events) skip full WebhookMessage validation. Only JSON
+    booleans are checked here; callers must still check the validated
+    message's flags, which also accept values like "true" or 1.
+
+    Args:
+        data: Decoded JSON payload
+
+    Returns:
+        Reason to ignore the payload, or None if it must be validated and processed
+    """
+    if not isinstance(data, dict):
+        return None
+    if data.get("fromMe") is True:
+        return "message_from_self"
+    if data.get("isGroup") is True:
+        return "group_message"
+    if data.get("isNewsletter") is True:
+        return "newsletter"
+    if data.get("type", "ReceivedCallback") != "ReceivedCallback":
+        return "not_a_message"
+    return None
+
+
 class OutgoingMessage(BaseModel):
     """Model for outgoing message to be sent via Z-API."""
 
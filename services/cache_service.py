@@ -0,0 +1,145 @@
+"""
+In-process caches for agent responses and deterministic tool results.
+"""
+import functools
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from agent.retrieval import TOKEN_PATTERN, fold_accents
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU cache whose entries also expire after a fixed time-to-live."""
+
+    def __init__(self, max_entries: int, ttl: float, name: str = "cache"):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.name = name
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a cached value, or default if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entries if full."""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop all entries."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+def memoize(cache: TTLCache, version: Callable[[], Hashable] = lambda: None):
+    """
+    Cache a function's results in a TTLCache.
+
+    Args:
+        cache: Cache to store results in
+        version: Called on every lookup and made part of the key, so results
+            are invalidated when it changes (e.g. the knowledge base version)
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__qualname__, version(), args, tuple(sorted(kwargs.items())))
+            value = cache.get(key, _MISSING)
+            if value is _MISSING:
+                value = func(*args, **kwargs)
+                cache.set(key, value)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+class ResponseCache:
+    """
+    Cache of agent replies keyed on the normalized patient message.
+
+    Messages are lowercased and accent-folded and lose punctuation and
+    extra whitespace, so "Quais convênios?" and "quais convenios" share an
+    entry. Every word is kept: unlike the knowledge-base tokenizer there is
+    no stemming or stopword removal, since words like "com" and "sem" are
+    noise for ranking but change the answer. The knowledge-base version is part
+    of the key so edits to prices or FAQs never serve stale answers.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        self.cache = TTLCache(
+            max_entries or settings.response_cache_max_entries,
+            ttl or settings.response_cache_ttl,
+            name="responses",
+        )
+
+    def key_for(self, message: str, version: Hashable) -> Optional[Tuple]:
+        """
+        Build the cache key for a message.
+
+        Returns:
+            None if caching is disabled or the message has no meaningful tokens
+        """
+        if not settings.response_cache_enabled:
+            return None
+
+        words = TOKEN_PATTERN.findall(fold_accents(message))
+        if not words or len(words) > settings.response_cache_max_tokens:
+            return None
+
+        return (version, " ".join(words))
+
+    def get(self, key: Tuple) -> Optional[str]:
+        return self.cache.get(key)
+
+    def set(self, key: Tuple, response: str):
+        self.cache.set(key, response)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+
+# Global instances
+response_cache = ResponseCache()
+tool_cache = TTLCache(
+    settings.tool_cache_max_entries, settings.tool_cache_ttl, name="tools"
+)
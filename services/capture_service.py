@@ -0,0 +1,277 @@
+"""
+Capture of raw Z-API webhook payloads for replay (benchmarks/replay.py).
+
+Receiving a webhook only appends the raw body and its arrival time to an
+in-memory buffer. A background task periodically anonymizes the batch and
+appends it to a gzip-compressed JSONL file as a separate gzip member, so a
+crash loses at most the last batch and earlier data stays readable.
+
+Phone numbers are replaced by keyed pseudonyms (HMAC-SHA256) of the same
+length that keep the country code and any suffix such as "-group": the
+same patient maps to the same pseudonym in every file written with the same
+key, so replayed conversations stay together. Names and profile photo URLs
+are dropped. Shared contacts keep only pseudonymized phones: their vCard,
+which repeats a third party's numbers and name, is dropped. Message text
+is kept as is.
+
+File format (one JSON object per line):
+    {"capture": {"version": 1, "started": ..., "pid": ..., "anonymized": true}}
+    {"t": <unix arrival time>, "endpoint": "message", "payload": {...}}
+    {"t": ..., "endpoint": "status", "raw": "<body that is not JSON>"}
+"""
+import asyncio
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_FORMAT_VERSION = 1
+
+# Payload fields holding phone numbers or WhatsApp chat IDs
+PHONE_FIELDS = {"phone", "participantPhone", "connectedPhone", "senderLid", "chatLid", "participantLid"}
+# Payload fields holding lists of phone numbers (e.g. a shared contact's)
+PHONE_LIST_FIELDS = {"phones"}
+# Payload fields with other personal data; names are replaced, the rest dropped
+SCRUBBED_FIELDS = {"senderName", "chatName", "displayName", "senderPhoto", "photo", "profileName", "vCard"}
+
+_PHONE_RE = re.compile(r"^(\d+)(.*)$")
+
+
+class PhoneAnonymizer:
+    """Keyed, format-preserving pseudonyms for phone numbers."""
+
+    def __init__(self, key: bytes, keep_prefix: int = 2):
+        self.key = key
+        self.keep_prefix = keep_prefix
+
+    def phone(self, value: str) -> str:
+        """
+        Pseudonym with the same length, country code and suffix.
+
+        Args:
+            value: Phone number or chat ID, e.g. "5511999990000" or "1203...-group"
+        """
+        match = _PHONE_RE.match(value)
+        if not match:
+            return self._digits(value, 12)
+        digits, suffix = match.groups()
+        prefix = digits[:self.keep_prefix] if len(digits) > self.keep_prefix + 4 else ""
+        return prefix + self._digits(digits, len(digits) - len(prefix)) + suffix
+
+    def _digits(self, value: str, length: int) -> str:
+        digest = hmac.new(self.key, value.encode("utf-8"), hashlib.sha256).digest()
+        number = str(int.from_bytes(digest, "big"))
+        while len(number) < length:
+            digest = hashlib.sha256(digest).digest()
+            number += str(int.from_bytes(digest, "big"))
+        return number[:length]
+
+    def payload(self, value: Any) -> Any:
+        """Copy of a webhook payload with phones pseudonymized and names dropped."""
+        if isinstance(value, dict):
+            result = {}
+            for key, item in value.items():
+                if key in PHONE_FIELDS and isinstance(item, str) and item:
+                    result[key] = self.phone(item)
+                elif key in PHONE_LIST_FIELDS and isinstance(item, list):
+                    result[key] = [self.phone(str(phone)) for phone in item]
+                elif key in SCRUBBED_FIELDS and item:
+                    result[key] = f"anon-{self.phone(str(item))[-6:]}" if key.endswith("Name") else None
+                else:
+                    result[key] = self.payload(item)
+            return result
+        if isinstance(value, list):
+            return [self.payload(item) for item in value]
+        return value
+
+
+def load_key(directory: Path, secret: str) -> bytes:
+    """
+    The pseudonym key: the configured secret, or one generated once per
+    capture directory (shared by all workers writing there).
+    """
+    if secret:
+        return secret.encode("utf-8")
+
+    path = directory / ".capture_key"
+    if path.exists():
+        return path.read_bytes()
+
+    # Write a complete key file first, then link it into place: the link
+    # either wins or fails because another worker's key is already there,
+    # so no worker ever reads a key that is still being written
+    key = os.urandom(32).hex().encode("ascii")
+    tmp_path = directory / f".capture_key.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+        f.flush()
+        os.fsync(f.fileno())
+    try:
+        os.link(tmp_path, path)
+    except FileExistsError:
+        key = path.read_bytes()
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return key
+
+
+def read_capture(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Records of a capture file, in file order (header lines skipped).
+
+    A batch cut short by a crash at the end of the file is skipped.
+    """
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if "endpoint" in record:
+                    yield record
+    except (EOFError, gzip.BadGzipFile) as e:
+        logger.warning(f"Capture file {path} ends with an incomplete batch: {e}")
+
+
+class TrafficCapture:
+    """Buffers webhook bodies and writes them to rotating capture files."""
+
+    def __init__(
+        self,
+        directory: str,
+        enabled: bool = False,
+        anonymize: bool = True,
+        secret: str = "",
+        flush_interval: float = 1.0,
+        max_pending: int = 10_000,
+        max_file_bytes: int = 100_000_000,
+    ):
+        self.directory = Path(directory)
+        self.enabled = enabled
+        self.anonymize = anonymize
+        self.secret = secret
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_file_bytes = max_file_bytes
+        self._pending: List[Tuple[float, str, bytes]] = []
+        self._anonymizer: Optional[PhoneAnonymizer] = None
+        self._path: Optional[Path] = None
+        self._task: Optional[asyncio.Task] = None
+        self.captured = 0
+        self.dropped = 0
+        self.files = 0
+
+    def record(self, endpoint: str, body: bytes):
+        """
+        Remember a webhook body (hot path: no parsing, no I/O).
+
+        Args:
+            endpoint: "message" or "status"
+            body: Raw request body
+        """
+        if not self.enabled:
+            return
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._pending.append((time.time(), endpoint, body))
+
+    async def start(self):
+        """Start writing captured payloads (no-op unless capture is enabled)."""
+        if not self.enabled or (self._task is not None and not self._task.done()):
+            return
+        await asyncio.to_thread(self.directory.mkdir, parents=True, exist_ok=True)
+        if self.anonymize:
+            key = await asyncio.to_thread(load_key, self.directory, self.secret)
+            self._anonymizer = PhoneAnonymizer(key)
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.info(f"Capturing webhook payloads to {self.directory}")
+
+    async def stop(self):
+        """Stop the flush task and write what is still buffered."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self._flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush()
+
+    async def _flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        try:
+            await asyncio.to_thread(self._write, batch)
+            self.captured += len(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.error(f"Failed to write {len(batch)} captured webhooks: {e}")
+
+    def _serialize(self, arrived: float, endpoint: str, body: bytes) -> str:
+        record: Dict[str, Any] = {"t": round(arrived, 6), "endpoint": endpoint}
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            record["raw"] = body.decode("utf-8", errors="replace")
+        else:
+            record["payload"] = self._anonymizer.payload(payload) if self._anonymizer else payload
+        return json.dumps(record, ensure_ascii=False)
+
+    def _write(self, batch: List[Tuple[float, str, bytes]]):
+        """Append the batch as one gzip member, starting a new file when needed."""
+        lines = [self._serialize(*item) for item in batch]
+        if self._path is None or self._path.stat().st_size > self.max_file_bytes:
+            self._path = self.directory / (
+                f"webhooks-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl.gz"
+            )
+            header = {"capture": {
+                "version": CAPTURE_FORMAT_VERSION,
+                "started": time.time(),
+                "pid": os.getpid(),
+                "anonymized": self._anonymizer is not None,
+            }}
+            lines.insert(0, json.dumps(header))
+            self.files += 1
+
+        data = gzip.compress(("\n".join(lines) + "\n").encode("utf-8"))
+        with open(self._path, "ab") as f:
+            f.write(data)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "captured": self.captured,
+            "pending": len(self._pending),
+            "dropped": self.dropped,
+            "files": self.files,
+            "file": str(self._path) if self._path else None,
+        }
+
+
+# Global instance
+traffic_capture = TrafficCapture(
+    settings.capture_dir,
+    enabled=settings.capture_enabled,
+    anonymize=settings.capture_anonymize,
+    secret=settings.capture_secret,
+    flush_interval=settings.capture_flush_interval,
+    max_pending=settings.capture_max_pending,
+    max_file_bytes=settings.capture_max_file_bytes,
+)
@@ -0,0 +1,252 @@
+"""
+Shared conversation state (new-conversation detection and dashboard listing).
+
+The in-memory store is enough for a single process. With several uvicorn
+workers or replicas, use the Redis store so every worker sees the same
+conversations.
+"""
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from config.settings import settings
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    aioredis = None
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationStore(ABC):
+    """
+    Storage for per-phone conversation state.
+
+    A state is a dict with phone, patient_name, started_at, last_activity
+    (datetimes) and messages_count. Conversations idle for longer than the
+    TTL expire.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+
+    @abstractmethod
+    async def touch(self, phone: str, patient_name: str) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Record a message: create the conversation if needed and atomically
+        increment its message count.
+
+        Args:
+            phone: Patient phone number
+            patient_name: Patient name
+
+        Returns:
+            (True if this message started a new conversation, updated state)
+        """
+
+    @abstractmethod
+    async def get(self, phone: str) -> Optional[Dict[str, Any]]:
+        """Return the state of a conversation, or None if missing/expired."""
+
+    @abstractmethod
+    async def list(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Return active conversations, most recently active first.
+
+        Args:
+            limit: Maximum number of conversations
+        """
+
+    @abstractmethod
+    async def delete(self, phone: str) -> bool:
+        """Remove a conversation. Returns True if it existed."""
+
+    @abstractmethod
+    async def count(self) -> int:
+        """Number of active conversations."""
+
+    async def close(self):
+        """Release backend resources."""
+
+
+class InMemoryConversationStore(ConversationStore):
+    """Process-local store; conversations are ordered by last activity."""
+
+    def __init__(self, ttl: float):
+        super().__init__(ttl)
+        self._states: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._expires: Dict[str, float] = {}
+
+    def _prune(self):
+        if self.ttl <= 0:
+            return
+        now = time.monotonic()
+        while self._states:
+            phone = next(iter(self._states))
+            if self._expires[phone] > now:
+                break
+            del self._states[phone]
+            del self._expires[phone]
+
+    async def touch(self, phone: str, patient_name: str) -> Tuple[bool, Dict[str, Any]]:
+        self._prune()
+        now = datetime.now()
+
+        state = self._states.get(phone)
+        is_new = state is None
+        if is_new:
+            state = {"phone": phone, "started_at": now, "messages_count": 0}
+            self._states[phone] = state
+
+        state["patient_name"] = patient_name
+        state["last_activity"] = now
+        state["messages_count"] += 1
+        self._states.move_to_end(phone)
+        self._expires[phone] = time.monotonic() + self.ttl
+
+        return is_new, dict(state)
+
+    async def get(self, phone: str) -> Optional[Dict[str, Any]]:
+        self._prune()
+        state = self._states.get(phone)
+        return dict(state) if state else None
+
+    async def list(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        self._prune()
+        states = [dict(state) for state in reversed(self._states.values())]
+        return states[:limit] if limit else states
+
+    async def delete(self, phone: str) -> bool:
+        self._expires.pop(phone, None)
+        return self._states.pop(phone, None) is not None
+
+    async def count(self) -> int:
+        self._prune()
+        return len(self._states)
+
+
+class RedisConversationStore(ConversationStore):
+    """
+    Store backed by any Redis-protocol server.
+
+    Each conversation is a hash with its own expiry; a sorted set indexed by
+    last-activity time lists the conversations for the dashboard.
+    """
+
+    def __init__(self, ttl: float, url: Optional[str] = None, client=None, prefix: Optional[str] = None):
+        super().__init__(ttl)
+        if client is None:
+            if not REDIS_AVAILABLE:
+                raise RuntimeError("conversation_store=redis requires the 'redis' package")
+            client = aioredis.from_url(url or settings.redis_url, decode_responses=True)
+        self.client = client
+        self.prefix = prefix if prefix is not None else settings.redis_key_prefix
+        self.index_key = f"{self.prefix}conversations"
+
+    def _key(self, phone: str) -> str:
+        return f"{self.prefix}conversation:{phone}"
+
+    @staticmethod
+    def _decode(phone: str, raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if not raw:
+            return None
+        raw = {
+            (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+            for k, v in raw.items()
+        }
+        return {
+            "phone": phone,
+            "patient_name": raw.get("patient_name", "Unknown"),
+            "started_at": datetime.fromisoformat(raw["started_at"]) if raw.get("started_at") else None,
+            "last_activity": datetime.fromisoformat(raw["last_activity"]) if raw.get("last_activity") else None,
+            "messages_count": int(raw.get("messages_count", 0)),
+        }
+
+    async def _prune(self):
+        if self.ttl > 0:
+            await self.client.zremrangebyscore(self.index_key, "-inf", time.time() - self.ttl)
+
+    async def touch(self, phone: str, patient_name: str) -> Tuple[bool, Dict[str, Any]]:
+        key = self._key(phone)
+        now = datetime.now()
+
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hsetnx(key, "started_at", now.isoformat())
+            pipe.hset(key, mapping={
+                "patient_name": patient_name,
+                "last_activity": now.isoformat(),
+            })
+            pipe.hincrby(key, "messages_count", 1)
+            if self.ttl > 0:
+                pipe.expire(key, max(int(self.ttl), 1))
+            pipe.zadd(self.index_key, {phone: time.time()})
+            pipe.hgetall(key)
+            results = await pipe.execute()
+
+        messages_count = results[2]
+        return messages_count == 1, self._decode(phone, results[-1])
+
+    async def get(self, phone: str) -> Optional[Dict[str, Any]]:
+        return self._decode(phone, await self.client.hgetall(self._key(phone)))
+
+    async def list(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        await self._prune()
+        phones = await self.client.zrevrange(self.index_key, 0, (limit or 0) - 1)
+        phones = [p.decode() if isinstance(p, bytes) else p for p in phones]
+        if not phones:
+            return []
+
+        # One round trip for all hashes
+        async with self.client.pipeline(transaction=False) as pipe:
+            for phone in phones:
+                pipe.hgetall(self._key(phone))
+            results = await pipe.execute()
+
+        states = []
+        for phone, raw in zip(phones, results):
+            state = self._decode(phone, raw)
+            if state is not None:
+                states.append(state)
+        return states
+
+    async def delete(self, phone: str) -> bool:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(self._key(phone))
+            pipe.zrem(self.index_key, phone)
+            deleted, _ = await pipe.execute()
+        return bool(deleted)
+
+    async def count(self) -> int:
+        await self._prune()
+        return await self.client.zcard(self.index_key)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def get_conversation_store(backend: Optional[str] = None) -> ConversationStore:
+    """
+    Create the conversation store configured in settings.
+
+    Args:
+        backend: "memory" or "redis"; defaults to settings
+
+    Returns:
+        Conversation store instance
+    """
+    backend = backend or settings.conversation_store
+    ttl = settings.conversation_idle_ttl
+    if backend == "memory":
+        return InMemoryConversationStore(ttl)
+    if backend == "redis":
+        return RedisConversationStore(ttl)
+    raise ValueError(f"Unknown conversation store: {backend}")
+
+
+# Global instance
+conversation_store = get_conversation_store()
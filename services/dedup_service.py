@@ -0,0 +1,288 @@
+"""
+Deduplication of redelivered Z-API webhooks.
+
+Z-API redelivers a webhook when our response is slow, so the same
+messageId can arrive more than once. The first delivery claims the ID and
+stores its ack; later deliveries within the TTL get the original ack back
+and are not processed again.
+"""
+import hashlib
+import json
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from config.settings import settings
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    aioredis = None
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RotatingBloomFilter:
+    """
+    Two Bloom generations so old IDs age out.
+
+    The current generation is retired once it is full or older than the
+    TTL, so an ID is remembered for at least one TTL.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, ttl: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.ttl = ttl
+        self.current = BloomFilter(capacity, error_rate)
+        self.previous: Optional[BloomFilter] = None
+        self._rotated_at = time.monotonic()
+
+    def _maybe_rotate(self):
+        if self.current.count >= self.capacity or time.monotonic() - self._rotated_at >= self.ttl:
+            self.previous = self.current
+            self.current = BloomFilter(self.capacity, self.error_rate)
+            self._rotated_at = time.monotonic()
+
+    def add(self, item: str):
+        self._maybe_rotate()
+        self.current.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        return item in self.current or (self.previous is not None and item in self.previous)
+
+
+class DedupIndex(ABC):
+    """Time-bounded index of claimed message IDs and their acks."""
+
+    @abstractmethod
+    async def claim(self, message_id: str, ack: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Claim a message ID.
+
+        Args:
+            message_id: Z-API messageId
+            ack: Response to return for later duplicates
+
+        Returns:
+            None if the ID was new and is now claimed, otherwise the original ack
+        """
+
+    @abstractmethod
+    async def release(self, message_id: str):
+        """Forget a claim, e.g. when the message could not be queued."""
+
+    async def close(self):
+        """Release backend resources."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class MemoryDedupIndex(DedupIndex):
+    """
+    In-process index: an insertion-ordered dict with TTL and a size bound.
+
+    An optional Bloom filter in front answers "definitely new" without
+    touching the dict; a positive answer is always confirmed by the exact
+    index, so false positives never drop a message.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, bloom: Optional[RotatingBloomFilter] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.bloom = bloom
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.bloom_negatives = 0
+
+    def _prune(self, now: float):
+        while self._entries:
+            message_id, (expires, _ack) = next(iter(self._entries.items()))
+            if expires > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[message_id]
+
+    async def claim(self, message_id: str, ack: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+
+        if self.bloom is not None and message_id not in self.bloom:
+            self.bloom_negatives += 1
+        else:
+            entry = self._entries.get(message_id)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+
+        self._entries[message_id] = (now + self.ttl, ack)
+        self._entries.move_to_end(message_id)
+        if self.bloom is not None:
+            self.bloom.add(message_id)
+        self._prune(now)
+        return None
+
+    async def release(self, message_id: str):
+        # The Bloom filter keeps the ID; the exact index is authoritative
+        self._entries.pop(message_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bloom": self.bloom is not None,
+            "bloom_negatives": self.bloom_negatives,
+        }
+
+
+class RedisDedupIndex(DedupIndex):
+    """
+    Index shared by all workers: one key per message ID, claimed atomically
+    with SET NX and expired by Redis.
+    """
+
+    def __init__(self, ttl: float, url: Optional[str] = None, client=None, prefix: Optional[str] = None):
+        self.ttl = max(int(ttl), 1)
+        if client is None:
+            if not REDIS_AVAILABLE:
+                raise RuntimeError("dedup_backend=redis requires the 'redis' package")
+            client = aioredis.from_url(url or settings.redis_url, decode_responses=True)
+        self.client = client
+        self.prefix = f"{prefix if prefix is not None else settings.redis_key_prefix}msg:"
+
+    async def claim(self, message_id: str, ack: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        key = self.prefix + message_id
+        if await self.client.set(key, json.dumps(ack), nx=True, ex=self.ttl):
+            return None
+
+        original = await self.client.get(key)
+        if original is None:
+            # Expired between the two calls; treat as a fresh claim
+            return await self.claim(message_id, ack)
+        return json.loads(original)
+
+    async def release(self, message_id: str):
+        await self.client.delete(self.prefix + message_id)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class MessageDeduplicator:
+    """Front door used by the webhook: counts duplicates and fails open."""
+
+    def __init__(self, index: Optional[DedupIndex]):
+        self.index = index
+        self.claimed = 0
+        self.duplicates = 0
+        self.errors = 0
+
+    async def claim(self, message_id: str, ack: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Claim a message ID.
+
+        Args:
+            message_id: Z-API messageId
+            ack: Response to return for later duplicates
+
+        Returns:
+            None if the message should be processed, otherwise the original ack
+        """
+        if self.index is None or not message_id:
+            return None
+
+        try:
+            original = await self.index.claim(message_id, ack)
+        except Exception as e:
+            # A broken dedup backend must not stop message intake
+            self.errors += 1
+            logger.error(f"Dedup index unavailable, processing {message_id}: {e}")
+            return None
+
+        if original is None:
+            self.claimed += 1
+        else:
+            self.duplicates += 1
+            logger.info(f"Duplicate webhook for message {message_id}")
+        return original
+
+    async def release(self, message_id: str):
+        """Forget a claim so a redelivery is processed."""
+        if self.index is None or not message_id:
+            return
+        try:
+            await self.index.release(message_id)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Failed to release dedup claim for {message_id}: {e}")
+
+    async def close(self):
+        if self.index is not None:
+            await self.index.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.index is not None,
+            "claimed": self.claimed,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+            **(self.index.stats() if self.index else {}),
+        }
+
+
+def get_deduplicator(backend: Optional[str] = None) -> MessageDeduplicator:
+    """
+    Create the deduplicator configured in settings.
+
+    Args:
+        backend: "memory" or "redis"; defaults to settings
+
+    Returns:
+        Deduplicator (a no-op one when dedup is disabled)
+    """
+    if not settings.dedup_enabled:
+        return MessageDeduplicator(None)
+
+    backend = backend or settings.dedup_backend
+    if backend == "memory":
+        bloom = None
+        if settings.dedup_bloom:
+            bloom = RotatingBloomFilter(
+                settings.dedup_max_entries, settings.dedup_bloom_error_rate, settings.dedup_ttl
+            )
+        return MessageDeduplicator(
+            MemoryDedupIndex(settings.dedup_ttl, settings.dedup_max_entries, bloom)
+        )
+    if backend == "redis":
+        return MessageDeduplicator(RedisDedupIndex(settings.dedup_ttl))
+    raise ValueError(f"Unknown dedup backend: {backend}")
+
+
+# Global instance
+message_deduplicator = get_deduplicator()
@@ -0,0 +1,310 @@
+"""
+Event bus relaying dashboard events between worker processes.
+
+Each worker publishes the events it broadcasts and relays the events
+published by other workers to its own WebSocket clients, so a dashboard
+sees all traffic no matter which worker it is connected to.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional, Set
+from config.settings import settings
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    aioredis = None
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Called with the raw JSON text of every event received from the bus
+EventHandler = Callable[[str], None]
+
+# Max size of one newline-delimited event on the Unix socket transport
+MAX_EVENT_BYTES = 2 ** 20
+
+
+class EventBus(ABC):
+    """Publish/subscribe transport for serialized dashboard events."""
+
+    name: str
+
+    def __init__(self):
+        self._handlers: List[EventHandler] = []
+        self.published = 0
+        self.received = 0
+
+    async def start(self, handler: EventHandler):
+        """
+        Start receiving events.
+
+        Args:
+            handler: Called with the JSON text of each event
+        """
+        self._handlers.append(handler)
+
+    async def stop(self):
+        """Stop the transport."""
+
+    @abstractmethod
+    def publish(self, text: str):
+        """
+        Publish a serialized event without blocking the caller.
+
+        Args:
+            text: JSON text of the event
+        """
+
+    def _dispatch(self, text: str):
+        self.received += 1
+        for handler in self._handlers:
+            try:
+                handler(text)
+            except Exception as e:
+                logger.error(f"Event handler failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"backend": self.name, "published": self.published, "received": self.received}
+
+
+class LocalEventBus(EventBus):
+    """In-process bus: events go straight to the handlers of this process."""
+
+    name = "local"
+
+    def publish(self, text: str):
+        self.published += 1
+        self._dispatch(text)
+
+
+class QueuedEventBus(EventBus):
+    """
+    Base for network transports.
+
+    publish() only appends to a bounded outbox; a sender task does the I/O,
+    dropping the oldest events if the transport cannot keep up.
+    """
+
+    def __init__(self, queue_size: int):
+        super().__init__()
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.failed = 0
+        self._outbox: Deque[str] = deque()
+        self._ready = asyncio.Event()
+        self._sender: Optional[asyncio.Task] = None
+
+    async def start(self, handler: EventHandler):
+        await super().start(handler)
+        if self._sender is None:
+            self._sender = asyncio.create_task(self._send_loop())
+
+    async def stop(self):
+        if self._sender:
+            self._sender.cancel()
+            await asyncio.gather(self._sender, return_exceptions=True)
+            self._sender = None
+
+    def publish(self, text: str):
+        if len(self._outbox) >= self.queue_size:
+            self._outbox.popleft()
+            self.dropped += 1
+        self._outbox.append(text)
+        self._ready.set()
+
+    async def _send_loop(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+
+            while self._outbox:
+                text = self._outbox.popleft()
+                try:
+                    await self._send(text)
+                    self.published += 1
+                except Exception as e:
+                    self.failed += 1
+                    logger.warning(f"Failed to publish dashboard event via {self.name}: {e}")
+
+    @abstractmethod
+    async def _send(self, text: str):
+        """Deliver one event to the other workers."""
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **super().stats(),
+            "queued": len(self._outbox),
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+class UnixSocketEventBus(QueuedEventBus):
+    """
+    Bus between workers on the same host.
+
+    Every worker listens on its own socket in a shared directory and sends
+    newline-delimited events to the sockets of all other workers.
+    """
+
+    name = "unix"
+
+    def __init__(self, directory: str, queue_size: int, rescan_interval: float = 1.0):
+        super().__init__(queue_size)
+        self.directory = Path(directory)
+        self.path = self.directory / f"{os.getpid()}-{uuid.uuid4().hex[:8]}.sock"
+        self.rescan_interval = rescan_interval
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: Dict[Path, asyncio.StreamWriter] = {}
+        self._inbound: Set[asyncio.StreamWriter] = set()
+        self._known: List[Path] = []
+        self._scanned_at = 0.0
+
+    async def start(self, handler: EventHandler):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._server = await asyncio.start_unix_server(
+            self._handle_peer, path=str(self.path), limit=MAX_EVENT_BYTES
+        )
+        await super().start(handler)
+        logger.info(f"Event bus listening on {self.path}")
+
+    async def stop(self):
+        await super().stop()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for writer in [*self._peers.values(), *self._inbound]:
+            writer.close()
+        self._peers.clear()
+        self._inbound.clear()
+        self.path.unlink(missing_ok=True)
+
+    async def _handle_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._inbound.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self._dispatch(line.decode("utf-8").rstrip("\n"))
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+            logger.warning(f"Event bus peer connection failed: {e}")
+        finally:
+            self._inbound.discard(writer)
+            writer.close()
+
+    def _discover(self) -> List[Path]:
+        now = time.monotonic()
+        if now - self._scanned_at >= self.rescan_interval:
+            self._known = [p for p in self.directory.glob("*.sock") if p != self.path]
+            self._scanned_at = now
+        return self._known
+
+    async def _connect(self, path: Path) -> Optional[asyncio.StreamWriter]:
+        try:
+            _reader, writer = await asyncio.open_unix_connection(str(path), limit=MAX_EVENT_BYTES)
+        except ConnectionRefusedError:
+            # Socket file left behind by a worker that died
+            path.unlink(missing_ok=True)
+            return None
+        except FileNotFoundError:
+            return None
+        self._peers[path] = writer
+        return writer
+
+    async def _send(self, text: str):
+        data = text.encode("utf-8") + b"\n"
+        for path in self._discover():
+            writer = self._peers.get(path) or await self._connect(path)
+            if writer is None:
+                continue
+            try:
+                writer.write(data)
+                await writer.drain()
+            except (ConnectionError, OSError):
+                writer.close()
+                self._peers.pop(path, None)
+
+
+class RedisEventBus(QueuedEventBus):
+    """Bus over Redis pub/sub, for workers on different hosts or replicas."""
+
+    name = "redis"
+
+    def __init__(self, queue_size: int, url: Optional[str] = None, client=None,
+                 channel: Optional[str] = None):
+        super().__init__(queue_size)
+        if client is None:
+            if not REDIS_AVAILABLE:
+                raise RuntimeError("event_bus=redis requires the 'redis' package")
+            client = aioredis.from_url(url or settings.redis_url, decode_responses=True)
+        self.client = client
+        self.channel = channel or f"{settings.redis_key_prefix}events"
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, handler: EventHandler):
+        await super().start(handler)
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        await super().stop()
+        if self._listener:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        await self.client.aclose()
+
+    async def _listen(self):
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = message["data"]
+                    self._dispatch(data.decode("utf-8") if isinstance(data, bytes) else data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Event bus subscription lost, reconnecting: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def _send(self, text: str):
+        await self.client.publish(self.channel, text)
+
+
+def get_event_bus(backend: Optional[str] = None) -> EventBus:
+    """
+    Create the event bus configured in settings.
+
+    Args:
+        backend: "local", "unix" or "redis"; defaults to settings
+
+    Returns:
+        Event bus instance
+    """
+    backend = backend or settings.event_bus
+    if backend == "local":
+        return LocalEventBus()
+    if backend == "unix":
+        return UnixSocketEventBus(settings.event_bus_socket_dir, settings.event_bus_queue_size)
+    if backend == "redis":
+        return RedisEventBus(settings.event_bus_queue_size)
+    raise ValueError(f"Unknown event bus: {backend}")
+
+
+# Global instance
+event_bus = get_event_bus()
@@ -0,0 +1,145 @@
+"""
+Replayable log of dashboard events for WebSocket resume.
+
+Broadcast events are kept in a ring buffer under monotonically increasing
+offsets. A reconnecting dashboard passes the last offset it saw and gets
+the events it missed in one batch. The log can also be persisted to an
+append-only file so offsets survive restarts.
+"""
+import logging
+import os
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Transient events that are not worth replaying
+UNLOGGED_TYPES = {"agent_stream", "stats", "connection", "pong"}
+
+
+class EventLog:
+    """
+    Ring buffer of serialized events.
+
+    File format (one record per line):
+        #<log id>
+        <offset>\\t<event JSON>
+    """
+
+    def __init__(self, capacity: int, path: Optional[str] = None, max_bytes: int = 0):
+        self.capacity = capacity
+        self.path = Path(path) if path else None
+        self.max_bytes = max_bytes
+        self.log_id = uuid.uuid4().hex[:12]
+        self.offset = 0
+        self._events: Deque[Tuple[int, str]] = deque(maxlen=capacity)
+        self._file = None
+
+        if self.path:
+            self._open()
+
+    @property
+    def first_offset(self) -> int:
+        """Oldest offset still in the buffer (offset + 1 when empty)."""
+        return self._events[0][0] if self._events else self.offset + 1
+
+    def append(self, text: str) -> int:
+        """
+        Add a serialized event.
+
+        Args:
+            text: JSON text of the event (must already contain its offset)
+
+        Returns:
+            Offset of the event
+        """
+        self.offset += 1
+        self._events.append((self.offset, text))
+
+        if self._file:
+            try:
+                self._file.write(f"{self.offset}\t{text}\n")
+                self._file.flush()
+                if self.max_bytes and self._file.tell() > self.max_bytes:
+                    self._compact()
+            except OSError as e:
+                logger.error(f"Failed to persist dashboard event: {e}")
+
+        return self.offset
+
+    def since(self, offset: int) -> Tuple[List[str], bool]:
+        """
+        Events after the given offset.
+
+        Args:
+            offset: Last offset the client saw
+
+        Returns:
+            (event texts, True if no events were lost since that offset)
+        """
+        complete = offset + 1 >= self.first_offset
+        return [text for event_offset, text in self._events if event_offset > offset], complete
+
+    def close(self):
+        """Close the backing file."""
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "log_id": self.log_id,
+            "offset": self.offset,
+            "first_offset": self.first_offset,
+            "buffered": len(self._events),
+            "capacity": self.capacity,
+            "persistent": self._file is not None,
+        }
+
+    def _open(self):
+        """Restore the buffer from the file, then keep appending to it."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.rstrip("\n")
+                    if line.startswith("#"):
+                        self.log_id = line[1:]
+                        continue
+                    offset, _, text = line.partition("\t")
+                    try:
+                        self.offset = int(offset)
+                    except ValueError:
+                        # Torn write at the end of the file
+                        continue
+                    self._events.append((self.offset, text))
+            logger.info(f"Restored {len(self._events)} dashboard events up to offset {self.offset}")
+
+        self._file = open(self.path, "a", encoding="utf-8")
+        if self._file.tell() == 0:
+            self._file.write(f"#{self.log_id}\n")
+            self._file.flush()
+
+    def _compact(self):
+        """Rewrite the file with only the buffered events."""
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(f"#{self.log_id}\n")
+            for offset, text in self._events:
+                f.write(f"{offset}\t{text}\n")
+
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+
+# Global instance
+event_log = EventLog(
+    settings.event_log_size,
+    settings.event_log_path or None,
+    settings.event_log_max_bytes,
+)
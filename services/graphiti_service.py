@@ -1,12 +1,24 @@
 """
 Graphiti Service for knowledge graph management.
+
+When Neo4j is unreachable the service runs degraded instead of failing:
+episodes are spooled to a local file and replayed once the graph is back,
+and searches return no results within a latency budget.
 """
+import asyncio
 import json
 import logging
+import os
+import time
+from pathlib import Path
 from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional
 from graphiti_core import Graphiti
 from graphiti_core.nodes import EpisodeType
+from graphiti_core.utils.bulk_utils import RawEpisode
+from services import resilience_service as resilience
+from services.tracing_service import traced
+from services.metrics_service import GRAPHITI_DURATION, GRAPHITI_OPERATIONS, timed
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -18,26 +30,97 @@ class GraphitiService:
     def __init__(self):
         self.graphiti: Optional[Graphiti] = None
 
+        # Write-behind episode ingestion
+        self._episode_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._episodes_written = 0
+        self._episodes_failed = 0
+
+        # Degraded mode: local spool of unwritten episodes and reconnection
+        self.spool_path = Path(settings.graphiti_spool_path)
+        self._recovery_task: Optional[asyncio.Task] = None
+        self._episodes_spooled = 0
+        self._episodes_replayed = 0
+        self._reconnects = 0
+
+    @property
+    def degraded(self) -> bool:
+        """True while Graphiti is not connected or its circuit breaker is open."""
+        return self.graphiti is None or resilience.get_breaker("graphiti").state == "open"
+
     async def initialize(self):
-        """Initialize Graphiti connection and build indices."""
+        """
+        Initialize Graphiti connection and build indices.
+
+        Never raises: if Neo4j is unreachable the service starts degraded
+        and the recovery task keeps trying to connect.
+        """
         try:
-            self.graphiti = Graphiti(
-                settings.neo4j_uri,
-                settings.neo4j_user,
-                settings.neo4j_password,
-            )
-            await self.graphiti.build_indices_and_constraints()
+            await self._connect()
             logger.info("Graphiti initialized successfully")
         except Exception as e:
-            logger.error(f"Failed to initialize Graphiti: {e}")
+            logger.error(f"Failed to initialize Graphiti, running degraded: {e!r}")
+
+    @traced("graphiti.connect", kind="client")
+    async def _connect(self):
+        """Open a Graphiti connection; self.graphiti is only set once it works."""
+        graphiti = Graphiti(
+            settings.neo4j_uri,
+            settings.neo4j_user,
+            settings.neo4j_password,
+        )
+        try:
+            await asyncio.wait_for(
+                graphiti.build_indices_and_constraints(),
+                timeout=settings.graphiti_connect_timeout,
+            )
+        except BaseException:
+            try:
+                await graphiti.close()
+            except Exception:
+                pass
             raise
+        self.graphiti = graphiti
 
     async def close(self):
-        """Close Graphiti connection."""
+        """Flush pending episodes and close Graphiti connection."""
+        await self.stop_writer()
+
         if self.graphiti:
             await self.graphiti.close()
             logger.info("Graphiti connection closed")
 
+    def _build_conversation_episode(
+        self,
+        phone: str,
+        patient_name: Optional[str],
+        message_text: str,
+        message_type: str = "text",
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> RawEpisode:
+        """Build the episode stored for a conversation message."""
+        if metadata:
+            episode_content = {
+                "phone": phone,
+                "patient_name": patient_name,
+                "message": message_text,
+                "message_type": message_type,
+                **metadata,
+            }
+            episode_type = EpisodeType.json
+            episode_body = json.dumps(episode_content)
+        else:
+            episode_body = f"Patient {patient_name or phone}: {message_text}"
+            episode_type = EpisodeType.text
+
+        return RawEpisode(
+            name=f"Conversation_{phone}_{datetime.now(timezone.utc).isoformat()}",
+            content=episode_body,
+            source=episode_type,
+            source_description=f"WhatsApp conversation with {patient_name or phone}",
+            reference_time=datetime.now(timezone.utc),
+        )
+
     async def add_conversation_episode(
         self,
         phone: str,
@@ -55,40 +138,309 @@ class GraphitiService:
             message_text: The message content
             message_type: Type of message (text, image, audio, etc.)
             metadata: Additional metadata (sentiment, intent, etc.)
-        """
-        if not self.graphiti:
-            raise RuntimeError("Graphiti not initialized")
 
+        If the graph is unavailable the episode is spooled for replay.
+        """
+        episode = self._build_conversation_episode(
+            phone, patient_name, message_text, message_type, metadata
+        )
         try:
-            # Build episode content
-            if metadata:
-                episode_content = {
-                    "phone": phone,
-                    "patient_name": patient_name,
-                    "message": message_text,
-                    "message_type": message_type,
-                    **metadata,
-                }
-                episode_type = EpisodeType.json
-                episode_body = json.dumps(episode_content)
-            else:
-                episode_body = f"Patient {patient_name or phone}: {message_text}"
-                episode_type = EpisodeType.text
-
-            # Add episode to graph
-            await self.graphiti.add_episode(
-                name=f"Conversation_{phone}_{datetime.now(timezone.utc).isoformat()}",
-                episode_body=episode_body,
-                source=episode_type,
-                source_description=f"WhatsApp conversation with {patient_name or phone}",
-                reference_time=datetime.now(timezone.utc),
-            )
+            if self.degraded:
+                raise RuntimeError("Graphiti degraded")
+            await self._add_episode(episode)
 
             logger.info(f"Added conversation episode for {phone}")
         except Exception as e:
-            logger.error(f"Failed to add conversation episode: {e}")
+            logger.error(f"Failed to add conversation episode, spooling it: {e}")
+            self._spool([episode])
+
+    def enqueue_conversation_episode(
+        self,
+        phone: str,
+        patient_name: Optional[str],
+        message_text: str,
+        message_type: str = "text",
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Queue a conversation episode for background ingestion.
+
+        Returns immediately; the writer task flushes queued episodes in
+        batches. When the queue is full the episode is spooled to disk and
+        replayed with the rest of the spool.
+
+        Args:
+            phone: Patient phone number
+            patient_name: Patient name (if known)
+            message_text: The message content
+            message_type: Type of message (text, image, audio, etc.)
+            metadata: Additional metadata (sentiment, intent, etc.)
+        """
+        if self._episode_queue is None:
+            self._episode_queue = asyncio.Queue(maxsize=settings.graphiti_write_queue_size)
+
+        episode = self._build_conversation_episode(
+            phone, patient_name, message_text, message_type, metadata
+        )
+
+        if self._episode_queue.full():
+            logger.warning("Graphiti write queue full, spooling episode")
+            self._spool([episode])
+            return
+
+        self._episode_queue.put_nowait(episode)
+
+    def start_writer(self):
+        """Start the background task that flushes queued episodes."""
+        if self._episode_queue is None:
+            self._episode_queue = asyncio.Queue(maxsize=settings.graphiti_write_queue_size)
+
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._writer_loop())
+            logger.info("Graphiti episode writer started")
+
+        if self._recovery_task is None or self._recovery_task.done():
+            self._recovery_task = asyncio.create_task(self._recovery_loop())
+
+    async def stop_writer(self):
+        """
+        Flush queued episodes (bounded by the shutdown timeout) and stop the
+        writer. Episodes still queued after the timeout are spooled.
+        """
+        if self._recovery_task is not None:
+            self._recovery_task.cancel()
+            await asyncio.gather(self._recovery_task, return_exceptions=True)
+            self._recovery_task = None
+
+        if self._writer_task is None:
+            return
+
+        try:
+            await asyncio.wait_for(
+                self._episode_queue.join(),
+                timeout=settings.graphiti_shutdown_flush_timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Graphiti flush timed out with {self._episode_queue.qsize()} episodes pending"
+            )
+
+        self._writer_task.cancel()
+        await asyncio.gather(self._writer_task, return_exceptions=True)
+        self._writer_task = None
+
+        pending = []
+        while not self._episode_queue.empty():
+            pending.append(self._episode_queue.get_nowait())
+            self._episode_queue.task_done()
+        if pending:
+            self._spool(pending)
+        logger.info("Graphiti episode writer stopped")
+
+    async def _writer_loop(self):
+        """Collect queued episodes into batches and write them to the graph."""
+        while True:
+            batch = [await self._episode_queue.get()]
+
+            # Give the batch a short window to fill up
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + settings.graphiti_write_flush_interval
+            while len(batch) < settings.graphiti_write_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self._episode_queue.get(), timeout=remaining)
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._episode_queue.task_done()
+
+    async def _write_batch(self, batch: List[RawEpisode]):
+        """
+        Write a batch of episodes, retrying with exponential backoff.
+
+        Retries only write the episodes a failed attempt did not get to.
+        Episodes that cannot be written (or arrive while degraded, or when
+        shutdown interrupts the write) are spooled.
+        """
+        remaining = list(batch)
+        try:
+            for attempt in range(settings.graphiti_write_max_retries + 1):
+                if self.degraded:
+                    self._spool(remaining)
+                    return
+
+                try:
+                    await self._write_episodes(remaining)
+                    logger.info(f"Wrote {len(batch)} episodes to Graphiti")
+                    return
+                except Exception as e:
+                    if attempt >= settings.graphiti_write_max_retries:
+                        logger.error(f"Failed to write {len(remaining)} of {len(batch)} episodes to Graphiti: {e}")
+                        self._spool(remaining)
+                        return
+
+                    delay = resilience.backoff_delay(
+                        attempt,
+                        settings.graphiti_write_retry_delay,
+                        settings.graphiti_write_retry_delay * 2 ** settings.graphiti_write_max_retries,
+                    )
+                    if isinstance(e, resilience.CircuitOpenError):
+                        # No point retrying before the breaker lets a trial call through
+                        delay = max(delay, e.retry_in)
+                    logger.warning(
+                        f"Graphiti write failed ({e}), retrying {len(remaining)} episodes in {delay:.1f}s"
+                    )
+                    await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # Shutdown interrupted the write; keep what is left for replay
+            self._spool(remaining)
             raise
+        finally:
+            self._episodes_written += len(batch) - len(remaining)
+
+    @traced("graphiti.write", kind="client")
+    @timed(GRAPHITI_DURATION, GRAPHITI_OPERATIONS, operation="write")
+    async def _write_episodes(self, batch: List[RawEpisode]):
+        """
+        Write episodes in one bulk call (when enabled) or one by one.
+
+        Written episodes are removed from `batch`, so after a failure it
+        holds only the episodes still to write.
+        """
+        if not self.graphiti:
+            raise RuntimeError("Graphiti not initialized")
+
+        if settings.graphiti_bulk_ingest and len(batch) > 1:
+            episodes = list(batch)
+            await resilience.call(
+                "graphiti", lambda: self.graphiti.add_episode_bulk(episodes)
+            )
+            batch.clear()
+        else:
+            while batch:
+                await self._add_episode(batch[0])
+                del batch[0]
 
+    @traced("graphiti.add_episode", kind="client")
+    @timed(GRAPHITI_DURATION, GRAPHITI_OPERATIONS, operation="add_episode")
+    async def _add_episode(self, episode: RawEpisode):
+        """Add a single episode to the graph."""
+        await resilience.call(
+            "graphiti",
+            lambda: self.graphiti.add_episode(
+                name=episode.name,
+                episode_body=episode.content,
+                source=episode.source,
+                source_description=episode.source_description,
+                reference_time=episode.reference_time,
+            ),
+        )
+
+    # ========== Degraded mode ==========
+    def _spool(self, batch: List[RawEpisode]):
+        """Append episodes to the local spool file for later replay."""
+        try:
+            self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+            if (
+                self.spool_path.exists()
+                and self.spool_path.stat().st_size >= settings.graphiti_spool_max_bytes
+            ):
+                raise OSError(f"spool is full ({settings.graphiti_spool_max_bytes} bytes)")
+
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                for episode in batch:
+                    f.write(episode.model_dump_json() + "\n")
+            self._episodes_spooled += len(batch)
+            logger.warning(f"Spooled {len(batch)} episodes to {self.spool_path}")
+        except OSError as e:
+            self._episodes_failed += len(batch)
+            logger.error(f"Failed to spool {len(batch)} episodes, dropping them: {e}")
+
+    @property
+    def _replay_path(self) -> Path:
+        return self.spool_path.with_name(self.spool_path.name + ".replay")
+
+    async def _replay_spool(self):
+        """
+        Write spooled episodes back to the graph, oldest first.
+
+        The spool is renamed before replaying so episodes spooled meanwhile
+        go to a fresh file. If the graph fails again, the episodes not yet
+        written are spooled again.
+        """
+        replay_path = self._replay_path
+        if not replay_path.exists():
+            if not self.spool_path.exists() or self.spool_path.stat().st_size == 0:
+                return
+            os.replace(self.spool_path, replay_path)
+
+        episodes = []
+        with open(replay_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    episodes.append(RawEpisode.model_validate_json(line))
+                except ValueError:
+                    # Torn write at the end of the file
+                    continue
+
+        logger.info(f"Replaying {len(episodes)} spooled episodes to Graphiti")
+        batch_size = settings.graphiti_write_batch_size
+        for start in range(0, len(episodes), batch_size):
+            batch = episodes[start:start + batch_size]
+            size = len(batch)
+            try:
+                await self._write_episodes(batch)
+            except Exception as e:
+                logger.warning(f"Graphiti replay interrupted ({e}), respooling")
+                self._spool(batch + episodes[start + size:])
+                replay_path.unlink()
+                return
+            except asyncio.CancelledError:
+                self._spool(batch + episodes[start + size:])
+                replay_path.unlink()
+                raise
+            finally:
+                self._episodes_replayed += size - len(batch)
+                self._episodes_written += size - len(batch)
+
+        replay_path.unlink()
+        logger.info(f"Replayed {len(episodes)} spooled episodes")
+
+    async def _recovery_loop(self):
+        """Reconnect while degraded and replay the spool once the graph is back."""
+        while True:
+            await asyncio.sleep(settings.graphiti_reconnect_interval)
+            try:
+                if self.graphiti is None:
+                    await self._connect()
+                    self._reconnects += 1
+                    logger.info("Graphiti reconnected, leaving degraded mode")
+                if not self.degraded:
+                    await self._replay_spool()
+            except Exception as e:
+                logger.warning(f"Graphiti still unavailable: {e!r}")
+
+    def writer_stats(self) -> Dict[str, Any]:
+        """Return write-behind ingestion statistics."""
+        return {
+            "degraded": self.degraded,
+            "pending": self._episode_queue.qsize() if self._episode_queue else 0,
+            "written": self._episodes_written,
+            "failed": self._episodes_failed,
+            "spooled": self._episodes_spooled,
+            "replayed": self._episodes_replayed,
+            "reconnects": self._reconnects,
+        }
+
+    @traced("graphiti.search", kind="client")
     async def search_patient_history(
         self, query: str, limit: int = 5
     ) -> List[Dict[str, Any]]:
@@ -100,13 +452,25 @@ class GraphitiService:
             limit: Maximum number of results
 
         Returns:
-            List of relevant facts from the knowledge graph
+            List of relevant facts from the knowledge graph (empty when the
+            graph is degraded or the search exceeds its latency budget)
         """
-        if not self.graphiti:
-            raise RuntimeError("Graphiti not initialized")
+        if self.degraded:
+            GRAPHITI_OPERATIONS.inc(operation="search", outcome="degraded")
+            return []
 
+        start = time.perf_counter()
         try:
-            results = await self.graphiti.search(query, limit=limit)
+            # Reads are idempotent: retry with backoff, optionally hedge slow
+            # ones, but never past the search budget
+            with resilience.deadline(settings.graphiti_search_budget):
+                results = await resilience.call(
+                    "graphiti",
+                    lambda: self.graphiti.search(query, num_results=limit),
+                    timeout=settings.graphiti_search_timeout,
+                    retry=resilience.default_retry_policy(),
+                    hedge_after=settings.graphiti_search_hedge_after or None,
+                )
 
             formatted_results = []
             for result in results:
@@ -128,10 +492,14 @@ class GraphitiService:
                 formatted_results.append(formatted_result)
 
             logger.info(f"Found {len(formatted_results)} results for query: {query}")
+            GRAPHITI_OPERATIONS.inc(operation="search", outcome="ok")
             return formatted_results
         except Exception as e:
-            logger.error(f"Failed to search patient history: {e}")
-            raise
+            GRAPHITI_OPERATIONS.inc(operation="search", outcome="error")
+            logger.warning(f"Patient history unavailable, continuing without it: {e}")
+            return []
+        finally:
+            GRAPHITI_DURATION.observe(time.perf_counter() - start, operation="search")
 
     async def add_patient_event(
         self,
@@ -148,30 +516,32 @@ class GraphitiService:
             patient_name: Patient name
             event_type: Type of event (appointment_scheduled, lead_qualified, etc.)
             event_data: Event details
+
+        If the graph is unavailable the event is spooled for replay.
         """
-        if not self.graphiti:
-            raise RuntimeError("Graphiti not initialized")
+        episode_content = {
+            "phone": phone,
+            "patient_name": patient_name,
+            "event_type": event_type,
+            **event_data,
+        }
+        episode = RawEpisode(
+            name=f"Event_{event_type}_{phone}_{datetime.now(timezone.utc).isoformat()}",
+            content=json.dumps(episode_content),
+            source=EpisodeType.json,
+            source_description=f"Patient event: {event_type}",
+            reference_time=datetime.now(timezone.utc),
+        )
 
         try:
-            episode_content = {
-                "phone": phone,
-                "patient_name": patient_name,
-                "event_type": event_type,
-                **event_data,
-            }
-
-            await self.graphiti.add_episode(
-                name=f"Event_{event_type}_{phone}_{datetime.now(timezone.utc).isoformat()}",
-                episode_body=json.dumps(episode_content),
-                source=EpisodeType.json,
-                source_description=f"Patient event: {event_type}",
-                reference_time=datetime.now(timezone.utc),
-            )
+            if self.degraded:
+                raise RuntimeError("Graphiti degraded")
+            await self._add_episode(episode)
 
             logger.info(f"Added event {event_type} for patient {patient_name}")
         except Exception as e:
-            logger.error(f"Failed to add patient event: {e}")
-            raise
+            logger.error(f"Failed to add patient event, spooling it: {e}")
+            self._spool([episode])
 
     async def get_patient_context(
         self, phone: str, limit: int = 10
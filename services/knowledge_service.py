@@ -0,0 +1,245 @@
+"""
+Hot-reloadable knowledge base (treatments, FAQs and objection handling).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from agent.retrieval import BM25Index, weighted_text
+from agent.embeddings import EmbeddingIndex, get_embedding_backend
+from models.knowledge import FAQsFile, TreatmentsFile
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_DIR = Path(__file__).parent.parent / "knowledge"
+KNOWLEDGE_FILES = ("treatments.json", "faqs.json")
+
+
+@dataclass(frozen=True)
+class KnowledgeSnapshot:
+    """
+    Immutable, fully indexed view of the knowledge base.
+
+    Readers grab ``knowledge_base.snapshot`` once per call and never see a
+    partially loaded state; reloads build a new snapshot and swap it in.
+    """
+
+    version: int
+    content_hash: str
+    loaded_at: datetime
+    treatments_data: Dict[str, Any]
+    faqs_data: Dict[str, Any]
+    treatment_index: BM25Index
+    faq_index: BM25Index
+    objection_index: BM25Index
+    _semantic_indexes: Dict[str, EmbeddingIndex] = field(default_factory=dict, repr=False)
+    _semantic_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def semantic_index(self, name: str) -> EmbeddingIndex:
+        """
+        Get a semantic index ("treatments" or "faqs"), building it on first use.
+
+        Args:
+            name: Index name
+
+        Returns:
+            Embedding index for this snapshot's entries
+        """
+        index = self._semantic_indexes.get(name)
+        if index is None:
+            with self._semantic_lock:
+                index = self._semantic_indexes.get(name)
+                if index is None:
+                    index = EmbeddingIndex(name, self._semantic_texts(name), get_embedding_backend())
+                    self._semantic_indexes[name] = index
+        return index
+
+    def _semantic_texts(self, name: str):
+        if name == "treatments":
+            return [
+                " ".join([t["name"], " ".join(t.get("keywords", [])), t["description"]])
+                for t in self.treatments_data["treatments"]
+            ]
+        return [f"{faq['question']} {faq['answer']}" for faq in self.faqs_data["faqs"]]
+
+    def info(self) -> Dict[str, Any]:
+        """Summary for dashboard stats."""
+        return {
+            "version": self.version,
+            "content_hash": self.content_hash,
+            "loaded_at": self.loaded_at.isoformat(),
+            "treatments": len(self.treatments_data["treatments"]),
+            "faqs": len(self.faqs_data["faqs"]),
+        }
+
+
+def _read_files(directory: Path) -> Tuple[Dict[str, bytes], str]:
+    """Read the raw knowledge files and hash their contents."""
+    raw = {name: (directory / name).read_bytes() for name in KNOWLEDGE_FILES}
+    digest = hashlib.sha256()
+    for name in KNOWLEDGE_FILES:
+        digest.update(raw[name])
+    return raw, digest.hexdigest()[:16]
+
+
+def build_snapshot(
+    directory: Path, version: int, build_semantic: bool = False
+) -> KnowledgeSnapshot:
+    """
+    Parse, validate and index the knowledge files.
+
+    Args:
+        directory: Directory containing treatments.json and faqs.json
+        version: Version number for the new snapshot
+        build_semantic: Also build the semantic indexes up front
+
+    Returns:
+        New snapshot
+
+    Raises:
+        ValueError: If a file is not valid JSON or does not match the schema
+    """
+    raw, content_hash = _read_files(directory)
+
+    try:
+        treatments = TreatmentsFile.model_validate_json(raw["treatments.json"])
+        faqs = FAQsFile.model_validate_json(raw["faqs.json"])
+    except Exception as e:
+        raise ValueError(f"Invalid knowledge base: {e}") from e
+
+    # Keep the original dicts so tools return exactly what the files contain
+    treatments_data = json.loads(raw["treatments.json"])
+    faqs_data = json.loads(raw["faqs.json"])
+
+    snapshot = KnowledgeSnapshot(
+        version=version,
+        content_hash=content_hash,
+        loaded_at=datetime.now(),
+        treatments_data=treatments_data,
+        faqs_data=faqs_data,
+        treatment_index=BM25Index([
+            weighted_text(
+                (t.name, 3), (" ".join(t.keywords), 2), (t.description, 1), (" ".join(t.benefits), 1)
+            )
+            for t in treatments.treatments
+        ]),
+        faq_index=BM25Index([
+            weighted_text((faq.question, 2), (faq.answer, 1)) for faq in faqs.faqs
+        ]),
+        objection_index=BM25Index([
+            weighted_text((o.objection, 3), (" ".join(o.responses), 1))
+            for o in faqs.objection_handling
+        ]),
+    )
+
+    if build_semantic and settings.semantic_search:
+        for name in ("treatments", "faqs"):
+            snapshot.semantic_index(name)
+
+    return snapshot
+
+
+class KnowledgeBase:
+    """
+    Holds the current knowledge snapshot and reloads it when files change.
+
+    The first snapshot is loaded synchronously so the agent tools work
+    without an event loop; later reloads parse and index off the event
+    loop and replace the snapshot reference atomically.
+    """
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(directory or KNOWLEDGE_DIR)
+        self.snapshot: KnowledgeSnapshot = build_snapshot(self.directory, version=1)
+        self.last_error: Optional[str] = None
+        self._reload_lock: Optional[asyncio.Lock] = None
+        self._watch_task: Optional[asyncio.Task] = None
+
+    async def reload(self, force: bool = False, raise_errors: bool = False) -> bool:
+        """
+        Reload the knowledge files if their content changed.
+
+        Args:
+            force: Rebuild even if the content hash is unchanged
+            raise_errors: Re-raise a failed reload instead of only recording it
+
+        Returns:
+            True if a new snapshot was swapped in
+
+        Raises:
+            Exception: If the reload failed and raise_errors is set
+        """
+        if self._reload_lock is None:
+            self._reload_lock = asyncio.Lock()
+
+        async with self._reload_lock:
+            try:
+                _raw, content_hash = await asyncio.to_thread(_read_files, self.directory)
+                if not force and content_hash == self.snapshot.content_hash:
+                    # Files are back to the loaded content: an earlier error is stale
+                    self.last_error = None
+                    return False
+
+                snapshot = await asyncio.to_thread(
+                    build_snapshot, self.directory, self.snapshot.version + 1, True
+                )
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Knowledge base reload failed, keeping version "
+                             f"{self.snapshot.version}: {e}")
+                if raise_errors:
+                    raise
+                return False
+
+            self.snapshot = snapshot
+            self.last_error = None
+            logger.info(f"Knowledge base reloaded: version {snapshot.version} "
+                        f"({snapshot.content_hash})")
+            return True
+
+    def start_watching(self):
+        """Poll the knowledge directory for changes in the background."""
+        if settings.knowledge_poll_interval <= 0:
+            return
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def stop_watching(self):
+        """Stop the background watcher."""
+        if self._watch_task:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+
+    def _mtimes(self) -> Tuple[float, ...]:
+        return tuple(
+            (self.directory / name).stat().st_mtime for name in KNOWLEDGE_FILES
+        )
+
+    async def _watch(self):
+        last_mtimes = self._mtimes()
+        while True:
+            await asyncio.sleep(settings.knowledge_poll_interval)
+            try:
+                mtimes = self._mtimes()
+            except OSError as e:
+                logger.warning(f"Cannot stat knowledge files: {e}")
+                continue
+
+            if mtimes != last_mtimes:
+                last_mtimes = mtimes
+                await self.reload()
+
+    def info(self) -> Dict[str, Any]:
+        """Current snapshot information plus the last reload error."""
+        return {**self.snapshot.info(), "last_error": self.last_error}
+
+
+# Global instance
+knowledge_base = KnowledgeBase()
@@ -0,0 +1,331 @@
+"""
+Per-phone conversation memory fed to the SDR agent as message history.
+"""
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelRequest,
+    SystemPromptPart,
+    UserPromptPart,
+)
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "Resumo da conversa anterior com o paciente:"
+
+Summarizer = Callable[[str, List[ModelMessage]], Awaitable[str]]
+
+
+@dataclass
+class ConversationHistory:
+    """Compacted message history for a single phone number."""
+
+    messages: List[ModelMessage] = field(default_factory=list)
+    summary: str = ""
+    # Messages dropped by compaction and not yet folded into the summary
+    unsummarized: List[ModelMessage] = field(default_factory=list)
+
+
+def estimate_tokens(messages: List[ModelMessage]) -> int:
+    """Rough token estimate (~4 characters per token) for a list of messages."""
+    chars = 0
+    for message in messages:
+        for part in message.parts:
+            content = getattr(part, "content", None)
+            if content is None:
+                content = getattr(part, "args", None)
+            chars += len(str(content)) if content is not None else 0
+    return chars // 4
+
+
+def _is_turn_start(message: ModelMessage) -> bool:
+    """A turn starts at a request carrying the patient's prompt."""
+    return isinstance(message, ModelRequest) and any(
+        isinstance(part, UserPromptPart) for part in message.parts
+    )
+
+
+def _is_summary_part(part: Any) -> bool:
+    return isinstance(part, SystemPromptPart) and part.content.startswith(SUMMARY_PREFIX)
+
+
+class HistoryStore:
+    """SQLite spillover for histories evicted from the in-memory LRU."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS histories (
+                    phone TEXT PRIMARY KEY,
+                    messages BLOB NOT NULL,
+                    summary TEXT NOT NULL,
+                    unsummarized BLOB NOT NULL DEFAULT '[]',
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            # Databases created before unsummarized turns were persisted
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(histories)")}
+            if "unsummarized" not in columns:
+                self._conn.execute(
+                    "ALTER TABLE histories ADD COLUMN unsummarized BLOB NOT NULL DEFAULT '[]'"
+                )
+        return self._conn
+
+    def save(self, phone: str, history: ConversationHistory):
+        """Persist a history, replacing any previous copy."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO histories "
+                "(phone, messages, summary, unsummarized, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    phone,
+                    ModelMessagesTypeAdapter.dump_json(history.messages),
+                    history.summary,
+                    ModelMessagesTypeAdapter.dump_json(history.unsummarized),
+                    time.time(),
+                ),
+            )
+            conn.commit()
+
+    def load(self, phone: str) -> Optional[ConversationHistory]:
+        """Load a persisted history, if any."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT messages, summary, unsummarized FROM histories WHERE phone = ?", (phone,)
+            ).fetchone()
+
+        if not row:
+            return None
+
+        return ConversationHistory(
+            messages=ModelMessagesTypeAdapter.validate_json(row[0]),
+            summary=row[1],
+            unsummarized=ModelMessagesTypeAdapter.validate_json(row[2]),
+        )
+
+    def delete(self, phone: str):
+        """Remove a persisted history."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM histories WHERE phone = ?", (phone,))
+            conn.commit()
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+
+
+class ConversationMemory:
+    """
+    Bounded message-history store keyed by phone number.
+
+    Recent conversations live in an in-memory LRU; evicted ones spill over
+    to SQLite when a database path is configured. Histories are truncated
+    to a token budget at turn boundaries, and dropped turns are
+    periodically folded into a running summary by the configured summarizer.
+    """
+
+    def __init__(
+        self,
+        max_conversations: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        db_path: Optional[str] = None,
+    ):
+        self.max_conversations = max_conversations or settings.memory_max_conversations
+        self.token_budget = token_budget or settings.memory_token_budget
+        db_path = settings.memory_db_path if db_path is None else db_path
+        self.store = HistoryStore(db_path) if db_path else None
+
+        self.summarizer: Optional[Summarizer] = None
+        self._histories: "OrderedDict[str, ConversationHistory]" = OrderedDict()
+        self._summary_tasks: Set[asyncio.Task] = set()
+        self._hits = 0
+        self._misses = 0
+
+    def set_summarizer(self, summarizer: Summarizer):
+        """Configure the coroutine used to summarize dropped turns."""
+        self.summarizer = summarizer
+
+    async def _get(self, phone: str, track: bool = True) -> Optional[ConversationHistory]:
+        """Fetch a history from the LRU, falling back to the spillover store."""
+        history = self._histories.get(phone)
+        if history is None and self.store:
+            history = await asyncio.to_thread(self.store.load, phone)
+            if history is not None:
+                await self._put(phone, history)
+        elif history is not None:
+            self._histories.move_to_end(phone)
+
+        if track:
+            if history is not None:
+                self._hits += 1
+            else:
+                self._misses += 1
+        return history
+
+    async def _put(self, phone: str, history: ConversationHistory):
+        """Insert into the LRU, spilling the least recently used entries."""
+        self._histories[phone] = history
+        self._histories.move_to_end(phone)
+
+        while len(self._histories) > self.max_conversations:
+            evicted_phone, evicted = self._histories.popitem(last=False)
+            if self.store:
+                await asyncio.to_thread(self.store.save, evicted_phone, evicted)
+
+    async def get_history(self, phone: str) -> List[ModelMessage]:
+        """
+        Get the message history to pass to the agent for a phone number.
+
+        Args:
+            phone: Patient phone number
+
+        Returns:
+            Messages ready for ``message_history`` (empty for new patients)
+        """
+        history = await self._get(phone)
+        if not history or not history.messages:
+            return []
+
+        messages = list(history.messages)
+        if history.summary and isinstance(messages[0], ModelRequest):
+            first = messages[0]
+            system_parts = [p for p in first.parts if isinstance(p, SystemPromptPart)]
+            other_parts = [p for p in first.parts if not isinstance(p, SystemPromptPart)]
+            summary_part = SystemPromptPart(content=f"{SUMMARY_PREFIX}\n{history.summary}")
+            messages[0] = replace(first, parts=[*system_parts, summary_part, *other_parts])
+
+        return messages
+
+    async def save(self, phone: str, messages: List[ModelMessage]):
+        """
+        Store the full message list of the latest agent run, compacted.
+
+        Args:
+            phone: Patient phone number
+            messages: Result of ``AgentRunResult.all_messages()``
+        """
+        history = await self._get(phone, track=False) or ConversationHistory()
+        history.messages = self._compact(history, messages)
+        await self._put(phone, history)
+
+        if (
+            self.summarizer
+            and len(history.unsummarized) >= settings.memory_summarize_after_messages
+        ):
+            self._schedule_summary(phone, history)
+
+    def _compact(
+        self, history: ConversationHistory, messages: List[ModelMessage]
+    ) -> List[ModelMessage]:
+        """Truncate messages to the token budget at turn boundaries."""
+        if not messages:
+            return []
+
+        # Separate the system prompt (pydantic-ai does not re-add it when
+        # message history is given) and strip any injected summary.
+        system_parts = []
+        body = list(messages)
+        if isinstance(body[0], ModelRequest):
+            first = body[0]
+            system_parts = [
+                p for p in first.parts
+                if isinstance(p, SystemPromptPart) and not _is_summary_part(p)
+            ]
+            rest = [p for p in first.parts if not isinstance(p, SystemPromptPart)]
+            body[0] = replace(first, parts=rest)
+
+        turn_starts = [i for i, message in enumerate(body) if _is_turn_start(message)]
+        if not turn_starts:
+            return messages
+
+        # Keep the earliest turn start whose suffix fits the budget,
+        # but always keep at least the most recent turn.
+        cut = turn_starts[-1]
+        for start in reversed(turn_starts[:-1]):
+            if estimate_tokens(body[start:]) > self.token_budget:
+                break
+            cut = start
+
+        if cut > 0:
+            history.unsummarized.extend(m for m in body[:cut] if m.parts)
+
+        kept = body[cut:]
+        kept[0] = replace(kept[0], parts=[*system_parts, *kept[0].parts])
+        return kept
+
+    def _schedule_summary(self, phone: str, history: ConversationHistory):
+        """Fold dropped turns into the running summary in the background."""
+        dropped = history.unsummarized
+        history.unsummarized = []
+
+        async def summarize():
+            try:
+                history.summary = await self.summarizer(history.summary, dropped)
+                if self.store and phone not in self._histories:
+                    await asyncio.to_thread(self.store.save, phone, history)
+                logger.info(f"Updated conversation summary for {phone}")
+            except Exception as e:
+                # Keep the turns so the next attempt includes them
+                history.unsummarized = dropped + history.unsummarized
+                logger.error(f"Failed to summarize conversation for {phone}: {e}")
+
+        task = asyncio.create_task(summarize())
+        self._summary_tasks.add(task)
+        task.add_done_callback(self._summary_tasks.discard)
+
+    async def clear(self, phone: str):
+        """Forget the history of a phone number."""
+        self._histories.pop(phone, None)
+        if self.store:
+            await asyncio.to_thread(self.store.delete, phone)
+
+    async def close(self):
+        """Wait for pending summaries and persist in-memory histories."""
+        if self._summary_tasks:
+            await asyncio.gather(*self._summary_tasks, return_exceptions=True)
+
+        if self.store:
+            for phone, history in list(self._histories.items()):
+                await asyncio.to_thread(self.store.save, phone, history)
+            await asyncio.to_thread(self.store.close)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return memory statistics for the dashboard."""
+        return {
+            "conversations_in_memory": len(self._histories),
+            "max_conversations": self.max_conversations,
+            "token_budget": self.token_budget,
+            "hits": self._hits,
+            "misses": self._misses,
+            "pending_summaries": len(self._summary_tasks),
+        }
+
+
+# Global instance
+conversation_memory = ConversationMemory()
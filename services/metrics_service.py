@@ -0,0 +1,429 @@
+"""
+Prometheus-style metrics for GET /metrics.
+
+Recording is cheap and takes no lock: counters and histograms write to a
+per-thread shard (the event loop and each tool worker thread get their own
+dict), and shards are only summed when metrics are collected.
+
+With several workers, each one periodically writes a snapshot of its
+metrics to METRICS_DIR/<pid>.json, and /metrics serves the sum over all
+snapshots, so a scrape that lands on any worker sees the whole service.
+"""
+import asyncio
+import bisect
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class Registry:
+    """All metrics of the process."""
+
+    def __init__(self):
+        self.metrics: List["Metric"] = []
+
+    def register(self, metric: "Metric"):
+        self.metrics.append(metric)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable values of every metric."""
+        return {
+            "pid": os.getpid(),
+            "time": time.time(),
+            "metrics": {metric.name: metric.snapshot() for metric in self.metrics},
+        }
+
+
+class Metric:
+    """Base class: a named family of label combinations."""
+
+    type = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional[Registry] = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict[LabelValues, Any]] = []
+        self._shards_lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _shard(self) -> Dict[LabelValues, Any]:
+        """This thread's values; the lock is only taken on a thread's first write."""
+        try:
+            return self._local.values
+        except AttributeError:
+            values: Dict[LabelValues, Any] = {}
+            with self._shards_lock:
+                self._shards.append(values)
+            self._local.values = values
+            return values
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _shard_copies(self) -> List[Dict[LabelValues, Any]]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        return [shard.copy() for shard in shards]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": [[list(key), value] for key, value in self._collect().items()],
+        }
+
+    def _collect(self) -> Dict[LabelValues, Any]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonic counter."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def _collect(self) -> Dict[LabelValues, float]:
+        totals: Dict[LabelValues, float] = {}
+        for shard in self._shard_copies():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+
+class Gauge(Metric):
+    """
+    Current value, set from the event loop or computed at collection time.
+
+    Across workers gauges are summed over live workers.
+    """
+
+    type = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: Any):
+        self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]):
+        """Compute the (unlabelled) value when metrics are collected."""
+        self._function = function
+
+    def _collect(self) -> Dict[LabelValues, float]:
+        if self._function is not None:
+            try:
+                self._values[()] = float(self._function())
+            except Exception as e:
+                logger.error(f"Failed to compute gauge {self.name}: {e}")
+        return dict(self._values)
+
+
+class Histogram(Metric):
+    """Latency histogram with fixed buckets (seconds)."""
+
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any):
+        shard = self._shard()
+        key = self._key(labels)
+        state = shard.get(key)
+        if state is None:
+            # [per-bucket counts (+Inf last), sum]
+            state = shard[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def _collect(self) -> Dict[LabelValues, Any]:
+        totals: Dict[LabelValues, Any] = {}
+        for shard in self._shard_copies():
+            for key, (counts, total) in shard.items():
+                merged = totals.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+                for i, count in enumerate(list(counts)):
+                    merged[0][i] += count
+                merged[1] += total
+        return totals
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**super().snapshot(), "buckets": list(self.buckets)}
+
+
+def timed(histogram: Histogram, counter: Optional[Counter] = None, **labels: Any):
+    """
+    Decorator observing each call's duration (and counting it with an
+    "outcome" label of "ok" or "error"). Works for sync and async functions
+    and keeps the wrapped signature.
+
+    Args:
+        histogram: Duration histogram
+        counter: Call counter (must have an "outcome" label)
+        labels: Label values for both metrics
+    """
+    def record(start: float, outcome: str):
+        histogram.observe(time.perf_counter() - start, **labels)
+        if counter is not None:
+            counter.inc(outcome=outcome, **labels)
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException:
+                    record(start, "error")
+                    raise
+                record(start, "ok")
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                record(start, "error")
+                raise
+            record(start, "ok")
+            return result
+        return wrapper
+
+    return decorator
+
+
+# ========== Aggregation and exposition ==========
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Sum metrics over worker snapshots.
+
+    Counters and histograms of exited workers still count (their totals
+    already happened); gauges only come from live workers.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for snapshot in snapshots:
+        alive = snapshot.get("pid") == os.getpid() or _pid_alive(snapshot.get("pid", 0))
+        for name, metric in snapshot["metrics"].items():
+            if metric["type"] == "gauge" and not alive:
+                continue
+            target = merged.setdefault(name, {**metric, "samples": {}})
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                if metric["type"] == "histogram":
+                    counts, total = value
+                    current = target["samples"].setdefault(key, [[0] * len(counts), 0.0])
+                    for i, count in enumerate(counts):
+                        current[0][i] += count
+                    current[1] += total
+                else:
+                    target["samples"][key] = target["samples"].get(key, 0.0) + value
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else f"{int(value)}"
+
+
+def render(merged: Dict[str, Dict[str, Any]]) -> str:
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name, metric in merged.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        names = metric["labelnames"]
+
+        for key, value in sorted(metric["samples"].items()):
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_labels(names, key)} {_number(value)}")
+                continue
+
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip([*metric["buckets"], "+Inf"], counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == "+Inf" else f'le="{bound}"'
+                lines.append(f"{name}_bucket{_labels(names, key, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, key)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(names, key)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """Writes this worker's snapshot and serves the aggregate of all workers."""
+
+    def __init__(self, registry: Registry, directory: Optional[str] = None, interval: float = 5.0):
+        self.registry = registry
+        self.directory = Path(directory) if directory else None
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def _path(self) -> Path:
+        return self.directory / f"{os.getpid()}.json"
+
+    def write_snapshot(self):
+        """Atomically replace this worker's snapshot file."""
+        if self.directory is None:
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(self.registry.snapshot()), encoding="utf-8")
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            logger.error(f"Failed to write metrics snapshot: {e}")
+
+    def _snapshots(self) -> List[Dict[str, Any]]:
+        own = self.registry.snapshot()
+        if self.directory is None:
+            return [own]
+
+        snapshots = [own]
+        for path in self.directory.glob("*.json"):
+            if path == self._path:
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable metrics snapshot {path}: {e}")
+        return snapshots
+
+    def render(self) -> str:
+        """Metrics of all workers in Prometheus text format."""
+        return render(merge_snapshots(self._snapshots()))
+
+    def start(self):
+        """Periodically publish this worker's snapshot (multi-worker only)."""
+        if self.directory is not None and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.write_snapshot()
+
+    async def _flush_loop(self):
+        while True:
+            self.write_snapshot()
+            await asyncio.sleep(self.interval)
+
+
+REGISTRY = Registry()
+
+# ========== Metrics ==========
+WEBHOOKS = Counter(
+    "berenice_webhooks_total", "Z-API message webhooks by outcome (and reason when ignored)",
+    ["outcome", "reason"],
+)
+WEBHOOK_DURATION = Histogram(
+    "berenice_webhook_duration_seconds", "Time to acknowledge a message webhook"
+)
+TURN_DURATION = Histogram(
+    "berenice_turn_duration_seconds", "Time to process a queued turn end to end",
+)
+AGENT_RUNS = Counter(
+    "berenice_agent_runs_total", "Agent runs by mode (run, stream, cache) and outcome",
+    ["mode", "outcome"],
+)
+AGENT_RUN_DURATION = Histogram(
+    "berenice_agent_run_duration_seconds", "Agent run duration by mode", ["mode"]
+)
+LLM_TOKENS = Counter(
+    "berenice_llm_tokens_total", "LLM tokens used by agent runs", ["model", "type"]
+)
+LLM_REQUESTS = Counter(
+    "berenice_llm_requests_total", "LLM requests made by agent runs", ["model"]
+)
+TOOL_CALLS = Counter(
+    "berenice_tool_calls_total", "Agent tool calls by tool and outcome", ["tool", "outcome"]
+)
+TOOL_DURATION = Histogram(
+    "berenice_tool_duration_seconds", "Agent tool call duration", ["tool"]
+)
+GRAPHITI_OPERATIONS = Counter(
+    "berenice_graphiti_operations_total", "Graphiti reads and writes by outcome",
+    ["operation", "outcome"],
+)
+GRAPHITI_DURATION = Histogram(
+    "berenice_graphiti_duration_seconds", "Graphiti operation duration", ["operation"]
+)
+ZAPI_REQUESTS = Counter(
+    "berenice_zapi_requests_total", "Z-API HTTP requests by endpoint and status",
+    ["endpoint", "status"],
+)
+ZAPI_DURATION = Histogram(
+    "berenice_zapi_request_duration_seconds", "Z-API HTTP request duration", ["endpoint"]
+)
+WS_CLIENTS = Gauge(
+    "berenice_websocket_clients", "Connected dashboard WebSocket clients"
+)
+WS_DROPPED = Counter(
+    "berenice_websocket_dropped_events_total", "Dashboard events dropped for slow clients",
+    ["reason"],
+)
+QUEUE_PENDING = Gauge(
+    "berenice_queue_pending", "Messages waiting in the processing queue"
+)
+QUEUE_RUNNING = Gauge(
+    "berenice_queue_running", "Turns being processed"
+)
+
+# Global instance
+metrics_exporter = MetricsExporter(
+    REGISTRY, settings.metrics_dir or None, settings.metrics_snapshot_interval
+)
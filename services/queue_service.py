@@ -0,0 +1,276 @@
+"""
+Durable per-phone work queue for incoming patient messages.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    """A unit of work waiting to be processed for a phone number."""
+
+    id: int
+    phone: str
+    payload: Dict[str, Any]
+    created_at: float
+
+
+JobHandler = Callable[..., Awaitable[Any]]
+PayloadMerger = Callable[[List[Dict[str, Any]]], Dict[str, Any]]
+
+
+class JobStore:
+    """SQLite-backed persistence for pending jobs."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Open the database and create the jobs table."""
+        if self.db_path != ":memory:":
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                phone TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def close(self):
+        """Close the database connection."""
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    def insert(self, phone: str, payload: Dict[str, Any], created_at: float) -> int:
+        """Persist a job and return its id."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (phone, payload, created_at) VALUES (?, ?, ?)",
+                (phone, json.dumps(payload), created_at),
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def delete(self, job_ids: List[int]):
+        """Remove completed jobs."""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in job_ids]
+            )
+            self._conn.commit()
+
+    def load_pending(self) -> List[Job]:
+        """Load all pending jobs in arrival order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, phone, payload, created_at FROM jobs ORDER BY id"
+            ).fetchall()
+
+        return [
+            Job(id=row[0], phone=row[1], payload=json.loads(row[2]), created_at=row[3])
+            for row in rows
+        ]
+
+
+class MessageQueue:
+    """
+    Work queue sharded by phone number.
+
+    Jobs for the same phone run strictly in arrival order, while different
+    phones are processed in parallel up to a global concurrency limit.
+    Pending jobs are persisted and resumed after a restart (at-least-once).
+
+    When a merge function is given, jobs for the same phone arriving within
+    the coalescing window are merged into a single handler call.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        coalesce_window: Optional[float] = None,
+        coalesce_max_wait: Optional[float] = None,
+    ):
+        self.store = JobStore(db_path or settings.queue_db_path)
+        self.max_concurrency = max_concurrency or settings.queue_max_concurrency
+        self.max_pending = max_pending or settings.queue_max_pending
+        self.coalesce_window = (
+            settings.coalesce_window_seconds if coalesce_window is None else coalesce_window
+        )
+        self.coalesce_max_wait = (
+            settings.coalesce_max_wait_seconds
+            if coalesce_max_wait is None
+            else coalesce_max_wait
+        )
+
+        self._handler: Optional[JobHandler] = None
+        self._merge: Optional[PayloadMerger] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending: Dict[str, Deque[Job]] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._size = 0
+        self._running = 0
+        self._processed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._coalesced = 0
+
+    async def start(self, handler: JobHandler, merge: Optional[PayloadMerger] = None):
+        """
+        Open the job store and resume any jobs left over from a previous run.
+
+        Args:
+            handler: Coroutine function called with each job payload as kwargs
+            merge: Optional function merging several payloads of one phone into one
+        """
+        self._handler = handler
+        self._merge = merge
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        await asyncio.to_thread(self.store.open)
+        pending = await asyncio.to_thread(self.store.load_pending)
+
+        for job in pending:
+            self._push(job)
+
+        if pending:
+            logger.info(f"Resumed {len(pending)} pending jobs from {self.store.db_path}")
+
+    async def stop(self):
+        """Stop all workers. Unfinished jobs stay persisted for the next start."""
+        workers = list(self._workers.values())
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+        self._workers.clear()
+        self._pending.clear()
+        self._size = 0
+        await asyncio.to_thread(self.store.close)
+
+    async def enqueue(self, phone: str, payload: Dict[str, Any]) -> bool:
+        """
+        Add a job for a phone number.
+
+        Args:
+            phone: Phone number used as the ordering key
+            payload: Keyword arguments for the job handler
+
+        Returns:
+            False if the queue is full and the job was rejected
+        """
+        if self._size >= self.max_pending:
+            self._rejected += 1
+            logger.warning(f"Queue full ({self._size} pending), rejecting job for {phone}")
+            return False
+
+        created_at = time.time()
+        job_id = await asyncio.to_thread(self.store.insert, phone, payload, created_at)
+        self._push(Job(id=job_id, phone=phone, payload=payload, created_at=created_at))
+        return True
+
+    def _push(self, job: Job):
+        """Append a job to its phone shard and make sure a worker is running."""
+        self._pending.setdefault(job.phone, deque()).append(job)
+        self._size += 1
+
+        if job.phone not in self._workers:
+            self._workers[job.phone] = asyncio.create_task(self._worker(job.phone))
+
+    async def _wait_for_quiet(self, shard: Deque[Job]):
+        """
+        Debounce: wait until no new job arrived for the coalescing window,
+        but never longer than the max wait since the oldest pending job.
+        """
+        while shard:
+            deadline = min(
+                shard[-1].created_at + self.coalesce_window,
+                shard[0].created_at + self.coalesce_max_wait,
+            )
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining)
+
+    async def _worker(self, phone: str):
+        """Process jobs for a single phone number in order."""
+        shard = self._pending[phone]
+
+        try:
+            while shard:
+                if self._merge and self.coalesce_window > 0:
+                    await self._wait_for_quiet(shard)
+                    batch = list(shard)
+                else:
+                    batch = [shard[0]]
+
+                if len(batch) > 1:
+                    payload = self._merge([job.payload for job in batch])
+                    self._coalesced += len(batch) - 1
+                    logger.info(f"Coalesced {len(batch)} messages from {phone}")
+                else:
+                    payload = batch[0].payload
+
+                async with self._semaphore:
+                    self._running += 1
+                    try:
+                        await self._handler(**payload)
+                        self._processed += 1
+                    except Exception as e:
+                        self._failed += 1
+                        logger.error(
+                            f"Job {batch[-1].id} for {phone} failed: {e}", exc_info=True
+                        )
+                    finally:
+                        self._running -= 1
+
+                for _ in batch:
+                    shard.popleft()
+                self._size -= len(batch)
+                await asyncio.to_thread(self.store.delete, [job.id for job in batch])
+        finally:
+            if not shard:
+                self._pending.pop(phone, None)
+            self._workers.pop(phone, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue statistics for the dashboard."""
+        return {
+            "pending": self._size,
+            "running": self._running,
+            "active_phones": len(self._workers),
+            "max_concurrency": self.max_concurrency,
+            "max_pending": self.max_pending,
+            "processed": self._processed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "coalesced": self._coalesced,
+        }
+
+
+# Global instance
+message_queue = MessageQueue()
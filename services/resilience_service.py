@@ -0,0 +1,326 @@
+"""
+Resilience policies shared by calls to Z-API, OpenAI and Neo4j.
+
+- Circuit breakers per dependency: after repeated failures calls fail fast
+  until the dependency has had time to recover.
+- Retries with exponential backoff and full jitter, for idempotent calls.
+- Deadlines carried in a context variable, so every call made while
+  handling a turn shares the turn's overall time budget.
+- Optional hedging for idempotent reads: a second attempt is started when
+  the first is slow, and the first result wins.
+"""
+import asyncio
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple, Type, TypeVar
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Absolute deadline (time.monotonic()) of the current unit of work, if any
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+    def __init__(self, dependency: str, retry_in: float):
+        super().__init__(f"{dependency} unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.dependency = dependency
+        self.retry_in = retry_in
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when the current deadline leaves no time for a call."""
+
+
+# ========== Deadlines ==========
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Run a block under a time budget.
+
+    Nested budgets never extend an outer one.
+
+    Args:
+        seconds: Budget in seconds (None or <= 0 leaves the current deadline)
+    """
+    current = _deadline.get()
+    if not seconds or seconds <= 0:
+        yield
+        return
+
+    new = time.monotonic() + seconds
+    token = _deadline.set(new if current is None else min(current, new))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def use_deadline(absolute: Optional[float]) -> Iterator[None]:
+    """Re-enter a deadline captured with current_deadline() (e.g. in another task)."""
+    token = _deadline.set(absolute)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline() -> Optional[float]:
+    """The absolute deadline of the current context, if any."""
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None without a deadline."""
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+
+def effective_timeout(timeout: Optional[float]) -> Optional[float]:
+    """
+    Combine a per-call timeout with the current deadline.
+
+    Raises:
+        DeadlineExceeded: If the deadline has already passed
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Deadline exceeded")
+    return left if timeout is None else min(timeout, left)
+
+
+# ========== Circuit breakers ==========
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed: calls go through. After `failure_threshold` consecutive
+    failures the breaker opens and calls fail fast. After `reset_timeout`
+    it is half-open: one trial call goes through, and its outcome closes or
+    re-opens the breaker.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self.total_failures = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        """
+        Check that a call may go through.
+
+        Raises:
+            CircuitOpenError: If the breaker is open (or its trial call is running)
+        """
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return
+
+        self.rejected += 1
+        retry_in = max(self.reset_timeout - (time.monotonic() - self.opened_at), 0.0)
+        raise CircuitOpenError(self.name, retry_in)
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info(f"Circuit for {self.name} closed")
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self, error: BaseException):
+        self.failures += 1
+        self.total_failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+
+        if self._trial_running or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self._trial_running:
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} failures: {error}")
+            self.opened_at = time.monotonic()
+        self._trial_running = False
+
+    def release_trial(self):
+        """End a trial call whose outcome says nothing about the dependency."""
+        self._trial_running = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "total_failures": self.total_failures,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(dependency: str) -> CircuitBreaker:
+    """Get (or create) the breaker of a dependency."""
+    breaker = _breakers.get(dependency)
+    if breaker is None:
+        breaker = _breakers[dependency] = CircuitBreaker(
+            dependency,
+            settings.resilience_failure_threshold,
+            settings.resilience_reset_timeout,
+        )
+    return breaker
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    """State of every breaker, for /health."""
+    return {name: breaker.stats() for name, breaker in sorted(_breakers.items())}
+
+
+# ========== Retries and hedging ==========
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Exponential backoff with full jitter."""
+
+    attempts: int = 3
+    base_delay: float = 0.2
+    max_delay: float = 2.0
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,)
+
+    def delay(self, attempt: int) -> float:
+        """Sleep before retry number `attempt` (0-based)."""
+        return backoff_delay(attempt, self.base_delay, self.max_delay)
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(max, base * 2^attempt)]."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def default_retry_policy() -> RetryPolicy:
+    return RetryPolicy(
+        attempts=settings.resilience_retry_attempts,
+        base_delay=settings.resilience_retry_base_delay,
+        max_delay=settings.resilience_retry_max_delay,
+    )
+
+
+async def _hedged(func: Callable[[], Awaitable[T]], hedge_after: float) -> T:
+    """Start a second attempt if the first has not finished after hedge_after."""
+    first = asyncio.ensure_future(func())
+    tasks = {first}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if done:
+            return first.result()
+
+        tasks.add(asyncio.ensure_future(func()))
+        error: Optional[BaseException] = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _counts_as_failure(error: BaseException) -> bool:
+    return True
+
+
+async def call(
+    dependency: str,
+    func: Callable[[], Awaitable[T]],
+    *,
+    timeout: Optional[float] = None,
+    retry: Optional[RetryPolicy] = None,
+    hedge_after: Optional[float] = None,
+    is_failure: Callable[[BaseException], bool] = _counts_as_failure,
+) -> T:
+    """
+    Call a dependency under its circuit breaker and the current deadline.
+
+    Args:
+        dependency: Breaker name ("zapi", "openai", "graphiti", ...)
+        func: Makes the call; invoked again for retries and hedges
+        timeout: Per-attempt timeout (capped by the current deadline)
+        retry: Retry policy; only pass one for idempotent calls
+        hedge_after: Start a parallel second attempt after this many seconds
+            (idempotent reads only)
+        is_failure: Whether an error says the dependency is unhealthy (e.g.
+            HTTP 4xx should not open the breaker)
+
+    Returns:
+        Result of func
+
+    Raises:
+        CircuitOpenError: If the dependency's breaker is open
+        DeadlineExceeded: If the deadline leaves no time for the call
+    """
+    breaker = get_breaker(dependency)
+    attempts = retry.attempts if retry else 1
+
+    for attempt in range(attempts):
+        breaker.before_call()
+        attempt_timeout = None
+        try:
+            attempt_timeout = effective_timeout(timeout)
+            attempt_call = (lambda: _hedged(func, hedge_after)) if hedge_after else func
+            if attempt_timeout is None:
+                result = await attempt_call()
+            else:
+                result = await asyncio.wait_for(attempt_call(), timeout=attempt_timeout)
+        except asyncio.CancelledError:
+            breaker.release_trial()
+            raise
+        except Exception as e:
+            deadline_bound = attempt_timeout is not None and (timeout is None or attempt_timeout < timeout)
+            if isinstance(e, asyncio.TimeoutError) and deadline_bound:
+                # The turn ran out of time; that says nothing about this dependency
+                breaker.release_trial()
+                raise DeadlineExceeded(f"Deadline exceeded calling {dependency}") from e
+            if isinstance(e, DeadlineExceeded) or not is_failure(e):
+                breaker.release_trial()
+                raise
+            breaker.record_failure(e)
+
+            last_attempt = attempt + 1 >= attempts
+            if last_attempt or not isinstance(e, retry.retry_on) or breaker.state != "closed":
+                raise
+
+            delay = retry.delay(attempt)
+            left = remaining()
+            if left is not None and delay >= left:
+                raise
+            logger.warning(f"{dependency} call failed ({e!r}), retry {attempt + 1} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
@@ -0,0 +1,86 @@
+"""
+Per-stage timings of message turns.
+
+A turn runs as a pipeline of stages, several of them concurrent. Each stage
+records when it started (relative to the turn) and how long it took, so the
+critical path of a turn can be read straight from its timing line.
+"""
+import time
+from collections import deque
+from typing import Any, Awaitable, Deque, Dict, TypeVar
+from services.tracing_service import tracer
+
+T = TypeVar("T")
+
+
+class TurnTimer:
+    """Stage timings of a single turn."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, Dict[str, float]] = {}
+
+    async def stage(self, name: str, awaitable: Awaitable[T]) -> T:
+        """
+        Await a stage in a "turn.<name>" span and record its timing (also
+        when it fails).
+
+        Args:
+            name: Stage name
+            awaitable: Work of the stage
+
+        Returns:
+            Result of the awaitable
+        """
+        start = time.perf_counter()
+        try:
+            with tracer.span(f"turn.{name}"):
+                return await awaitable
+        finally:
+            end = time.perf_counter()
+            self.stages[name] = {
+                "start_ms": (start - self.started) * 1000,
+                "ms": (end - start) * 1000,
+            }
+
+    @property
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def summary(self) -> str:
+        """One-line summary ordered by start time: name@start+duration."""
+        stages = sorted(self.stages.items(), key=lambda item: item[1]["start_ms"])
+        parts = [f"{name}@{t['start_ms']:.0f}+{t['ms']:.0f}ms" for name, t in stages]
+        return f"total={self.total_ms:.0f}ms " + " ".join(parts)
+
+
+class TimingStats:
+    """Rolling per-stage timing statistics across turns."""
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self.turns = 0
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, timer: TurnTimer):
+        self.turns += 1
+        for name, timing in (*timer.stages.items(), ("total", {"ms": timer.total_ms})):
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+            samples.append(timing["ms"])
+
+    def stats(self) -> Dict[str, Any]:
+        stages: Dict[str, Dict[str, float]] = {}
+        for name, samples in self._samples.items():
+            ordered = sorted(samples)
+            stages[name] = {
+                "avg_ms": round(sum(ordered) / len(ordered), 1),
+                "p50_ms": round(ordered[len(ordered) // 2], 1),
+                "max_ms": round(ordered[-1], 1),
+            }
+        return {"turns": self.turns, "window": self.window, "stages": stages}
+
+
+# Global instance
+turn_timings = TimingStats()
@@ -0,0 +1,356 @@
+"""
+Lightweight in-process tracing of message turns.
+
+Spans follow the OpenTelemetry model (trace/span IDs, parent, kind,
+attributes, status, links) and serialize to OTLP/JSON field names, but are
+exported to an in-memory store so they work offline. The trace ID doubles
+as the turn ID: it is carried in a context variable through every await of
+the turn, and across the message queue as a W3C traceparent.
+"""
+import functools
+import inspect
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, List, NamedTuple, Optional
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SpanContext(NamedTuple):
+    """Identifies a span in another task or process."""
+
+    trace_id: str
+    span_id: str
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = (
+        "name", "kind", "trace_id", "span_id", "parent_span_id", "start_ns", "end_ns",
+        "attributes", "status", "status_message", "events", "links",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_span_id: Optional[str] = None,
+        kind: str = "internal",
+        attributes: Optional[Dict[str, Any]] = None,
+        links: Optional[List[SpanContext]] = None,
+    ):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent_span_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = attributes or {}
+        self.status = "UNSET"
+        self.status_message = ""
+        self.events: List[Dict[str, Any]] = []
+        self.links = links or []
+
+    @property
+    def context(self) -> SpanContext:
+        return SpanContext(self.trace_id, self.span_id)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_exception(self, error: BaseException):
+        """Mark the span failed (OpenTelemetry "exception" event)."""
+        self.status = "ERROR"
+        self.status_message = f"{type(error).__name__}: {error}"
+        self.events.append({
+            "name": "exception",
+            "timeUnixNano": time.time_ns(),
+            "attributes": {"exception.type": type(error).__name__, "exception.message": str(error)},
+        })
+
+    def to_dict(self) -> Dict[str, Any]:
+        """OTLP/JSON-style representation."""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round(self.duration_ms, 2),
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.status_message},
+            "events": self.events,
+            "links": [{"traceId": link.trace_id, "spanId": link.span_id} for link in self.links],
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span when tracing is disabled."""
+
+    trace_id = None
+    span_id = None
+    context = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def record_exception(self, error: BaseException):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    """The active span of the current task, if any."""
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    """The turn ID: trace ID of the active span."""
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+@contextmanager
+def use_span(span: Optional[Span]) -> Iterator[None]:
+    """Make a span captured in another task the active one (e.g. in a worker)."""
+    token = _current_span.set(span)
+    try:
+        yield
+    finally:
+        _current_span.reset(token)
+
+
+def format_traceparent(span: Optional[Span] = None) -> Optional[str]:
+    """W3C traceparent header for a span (the active one by default)."""
+    span = span or _current_span.get()
+    if span is None:
+        return None
+    return f"00-{span.trace_id}-{span.span_id}-01"
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """Parse a W3C traceparent; None if missing or malformed."""
+    if not value:
+        return None
+    parts = value.split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return SpanContext(parts[1], parts[2])
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of a sorted list."""
+    rank = math.ceil(q / 100 * len(ordered))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+class InMemoryExporter:
+    """
+    Keeps the most recent traces and a rolling window of durations per
+    span name, for the dashboard.
+    """
+
+    def __init__(self, max_traces: int, window: int):
+        self.max_traces = max_traces
+        self.window = window
+        self._traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._durations: Dict[str, Deque[float]] = {}
+        self.exported = 0
+        # Sync agent tools run in worker threads
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is None:
+                spans = self._traces[span.trace_id] = []
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            else:
+                # A turn continues the trace of its webhook; keep it among the recent ones
+                self._traces.move_to_end(span.trace_id)
+            spans.append(span)
+
+            durations = self._durations.get(span.name)
+            if durations is None:
+                durations = self._durations[span.name] = deque(maxlen=self.window)
+            durations.append(span.duration_ms)
+            self.exported += 1
+
+    def trace(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        """A trace with its spans ordered by start time."""
+        with self._lock:
+            spans = list(self._traces.get(trace_id) or [])
+        if not spans:
+            return None
+        ordered = sorted(spans, key=lambda span: span.start_ns)
+        start = ordered[0].start_ns
+        end = max(span.end_ns or span.start_ns for span in ordered)
+        roots = [span for span in ordered if span.parent_span_id is None]
+        return {
+            "trace_id": trace_id,
+            "root": roots[0].name if roots else ordered[0].name,
+            "start": start,
+            "duration_ms": round((end - start) / 1e6, 2),
+            "error": any(span.status == "ERROR" for span in ordered),
+            "spans": [span.to_dict() for span in ordered],
+        }
+
+    def recent_traces(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """The latest traces, newest first."""
+        with self._lock:
+            trace_ids = list(self._traces.keys())[-limit:]
+        traces = (self.trace(trace_id) for trace_id in reversed(trace_ids))
+        return [trace for trace in traces if trace is not None]
+
+    def stage_percentiles(self) -> Dict[str, Dict[str, float]]:
+        """p50/p95/p99 duration per span name over the rolling window."""
+        with self._lock:
+            windows = {name: list(durations) for name, durations in self._durations.items()}
+
+        stats = {}
+        for name, durations in sorted(windows.items()):
+            ordered = sorted(durations)
+            stats[name] = {
+                "count": len(ordered),
+                "p50_ms": round(_percentile(ordered, 50), 2),
+                "p95_ms": round(_percentile(ordered, 95), 2),
+                "p99_ms": round(_percentile(ordered, 99), 2),
+                "max_ms": round(ordered[-1], 2),
+            }
+        return stats
+
+    def stats(self) -> Dict[str, Any]:
+        return {"traces": len(self._traces), "max_traces": self.max_traces, "exported": self.exported}
+
+
+class Tracer:
+    """Creates spans and hands finished ones to the exporter."""
+
+    def __init__(self, exporter: InMemoryExporter, enabled: bool = True):
+        self.exporter = exporter
+        self.enabled = enabled
+
+    def start_span(
+        self,
+        name: str,
+        kind: str = "internal",
+        attributes: Optional[Dict[str, Any]] = None,
+        parent: Optional[SpanContext] = None,
+        links: Optional[List[SpanContext]] = None,
+    ) -> Span:
+        """
+        Start a span without making it the active one (use end_span).
+
+        Args:
+            name: Span name, e.g. "zapi.send-text"
+            kind: "server", "client", "consumer" or "internal"
+            attributes: Initial attributes
+            parent: Remote parent; defaults to the active span
+            links: Related spans in other traces (e.g. coalesced messages)
+        """
+        if parent is None:
+            active = _current_span.get()
+            parent = active.context if active else None
+
+        if parent is None:
+            return Span(name, os.urandom(16).hex(), None, kind, attributes, links)
+        return Span(name, parent.trace_id, parent.span_id, kind, attributes, links)
+
+    def end_span(self, span: Span):
+        if not self.enabled:
+            return
+        span.end_ns = time.time_ns()
+        if span.status == "UNSET":
+            span.status = "OK"
+        try:
+            self.exporter.export(span)
+        except Exception as e:
+            logger.error(f"Failed to export span {span.name}: {e}")
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        kind: str = "internal",
+        attributes: Optional[Dict[str, Any]] = None,
+        parent: Optional[SpanContext] = None,
+        links: Optional[List[SpanContext]] = None,
+    ) -> Iterator[Span]:
+        """
+        Run a block as the active span; exceptions mark it failed.
+
+        Works in sync and async code: the span is carried by a context
+        variable, so tasks created inside the block inherit it.
+        """
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+
+        span = self.start_span(name, kind, attributes, parent, links)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span)
+
+
+def traced(name: Optional[str] = None, kind: str = "internal") -> Callable[[Callable], Callable]:
+    """
+    Decorator running each call of a function (sync or async) in a span.
+
+    The wrapper keeps the wrapped signature, annotations and docstring, so
+    it can sit under FastAPI route and pydantic-ai tool decorators.
+
+    Args:
+        name: Span name (defaults to the function's qualified name)
+        kind: Span kind
+    """
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(span_name, kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(span_name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+# Global instance
+tracer = Tracer(
+    InMemoryExporter(settings.tracing_max_traces, settings.tracing_stats_window),
+    enabled=settings.tracing_enabled,
+)
@@ -0,0 +1,191 @@
+"""
+Append-only store of conversation transcripts for the dashboard.
+
+Every message received from or sent to a patient is written to SQLite, so
+the dashboard can page through an exact, ordered history without
+searching the knowledge graph.
+"""
+import asyncio
+import base64
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(timestamp: float, row_id: int) -> str:
+    """Opaque pagination cursor pointing at a transcript entry."""
+    return base64.urlsafe_b64encode(json.dumps([timestamp, row_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(timestamp), int(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class TranscriptStore:
+    """SQLite transcript table indexed on (phone, timestamp)."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    phone TEXT NOT NULL,
+                    direction TEXT NOT NULL,
+                    author TEXT NOT NULL,
+                    sender_name TEXT,
+                    message TEXT NOT NULL,
+                    message_id TEXT,
+                    timestamp REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_transcripts_phone_ts "
+                "ON transcripts (phone, timestamp, id)"
+            )
+            # A redelivered or resumed message is recorded only once
+            self._conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_transcripts_message "
+                "ON transcripts (message_id, direction) WHERE message_id IS NOT NULL"
+            )
+        return self._conn
+
+    def _insert(self, row: Tuple) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR IGNORE INTO transcripts "
+                "(phone, direction, author, sender_name, message, message_id, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+            conn.commit()
+
+    async def append(
+        self,
+        phone: str,
+        direction: str,
+        message: str,
+        author: str,
+        sender_name: Optional[str] = None,
+        message_id: Optional[str] = None,
+    ):
+        """
+        Record a message. Failures are logged, never raised, so the reply
+        path is not affected.
+
+        Args:
+            phone: Patient phone number
+            direction: "input" (from the patient) or "output" (to the patient)
+            message: Message text
+            author: "patient", "agent" or "operator"
+            sender_name: Display name of the author
+            message_id: Z-API message ID, if known
+        """
+        row = (phone, direction, author, sender_name, message, message_id, time.time())
+        try:
+            await asyncio.to_thread(self._insert, row)
+            self.written += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Failed to record transcript for {phone}: {e}")
+
+    def _page(self, phone: str, limit: int, before: Optional[Tuple[float, int]]) -> List[Tuple]:
+        query = (
+            "SELECT id, direction, author, sender_name, message, message_id, timestamp "
+            "FROM transcripts WHERE phone = ?"
+        )
+        params: List[Any] = [phone]
+        if before is not None:
+            query += " AND (timestamp, id) < (?, ?)"
+            params.extend(before)
+        query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            return self._connect().execute(query, params).fetchall()
+
+    async def page(
+        self, phone: str, limit: int = 50, before: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Get a page of a patient's transcript.
+
+        Pages go backwards in time: the first page holds the latest messages
+        and next_cursor fetches the ones before it.
+
+        Args:
+            phone: Patient phone number
+            limit: Maximum number of messages
+            before: Cursor from a previous page
+
+        Returns:
+            Dict with messages (oldest first) and next_cursor (None at the start)
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        cursor = decode_cursor(before) if before else None
+        rows = await asyncio.to_thread(self._page, phone, limit, cursor)
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][6], rows[-1][0]) if has_more else None
+
+        messages = [
+            {
+                "phone": phone,
+                "direction": direction,
+                "author": author,
+                "sender_name": sender_name,
+                "message": message,
+                "message_id": message_id,
+                "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+            }
+            for _id, direction, author, sender_name, message, message_id, timestamp in reversed(rows)
+        ]
+        return {"messages": messages, "next_cursor": next_cursor}
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"written": self.written, "failed": self.failed}
+
+
+# Global instance
+transcript_store = TranscriptStore(settings.transcript_db_path)
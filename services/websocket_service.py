@@ -1,62 +1,259 @@
 """
 WebSocket service for real-time message broadcasting to dashboard.
 """
+import asyncio
 import logging
 import json
-from typing import Set, Dict, Any
+import os
+import uuid
+from collections import deque
+from typing import Deque, Dict, Any, Optional, Tuple
 from fastapi import WebSocket
 from datetime import datetime
+from services.event_bus_service import EventBus, event_bus
+from services.event_log_service import EventLog, UNLOGGED_TYPES, event_log
+from services.metrics_service import WS_DROPPED
+from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Event types where only the most recent pending message matters
+COALESCED_TYPES = {"stats", "agent_status"}
+
+
+class DashboardClient:
+    """A dashboard connection with its own bounded outbound queue and writer task."""
+
+    def __init__(self, websocket: WebSocket, max_queue: int):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.queue: Deque[Tuple[Optional[str], str]] = deque()
+        self.sent = 0
+        self.dropped = 0
+        self._ready = asyncio.Event()
+        self.writer: Optional[asyncio.Task] = None
+
+    def enqueue(self, text: str, coalesce_key: Optional[str] = None):
+        """
+        Queue a pre-serialized message for this client.
+
+        Args:
+            text: JSON text to send
+            coalesce_key: If set, pending messages with the same key are replaced
+        """
+        if coalesce_key is not None:
+            before = len(self.queue)
+            self.queue = deque(item for item in self.queue if item[0] != coalesce_key)
+            if len(self.queue) < before:
+                self.dropped += before - len(self.queue)
+                WS_DROPPED.inc(before - len(self.queue), reason="coalesced")
+
+        if len(self.queue) >= self.max_queue:
+            self.queue.popleft()
+            self.dropped += 1
+            WS_DROPPED.inc(reason="overflow")
+
+        self.queue.append((coalesce_key, text))
+        self._ready.set()
+
+    async def run(self):
+        """Send queued messages in order until the connection fails."""
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+
+            while self.queue:
+                _key, text = self.queue.popleft()
+                await asyncio.wait_for(
+                    self.websocket.send_text(text), timeout=settings.ws_send_timeout
+                )
+                self.sent += 1
+
 
 class WebSocketManager:
-    """Manages WebSocket connections for the dashboard."""
+    """
+    Manages WebSocket connections for the dashboard.
+
+    Broadcasts are delivered to this worker's clients and published on the
+    event bus; events published by other workers are relayed to this
+    worker's clients. Every event carries the publishing worker's ``origin``
+    and a per-origin ``seq`` number, so clients can detect gaps.
+    """
+
+    def __init__(self, bus: Optional[EventBus] = None, log: Optional[EventLog] = None):
+        self.active_connections: Dict[WebSocket, DashboardClient] = {}
+        self.dropped_total = 0
+        self.bus = bus or event_bus
+        self.log = log or event_log
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.sequence = 0
+        # Serialized events start with the origin, so our own events echoed
+        # back by the bus are skipped without parsing them
+        self._origin_prefix = json.dumps({"origin": self.origin})[:-1]
 
-    def __init__(self):
-        self.active_connections: Set[WebSocket] = set()
+    async def start(self):
+        """Start relaying events from other workers."""
+        await self.bus.start(self._on_bus_event)
 
-    async def connect(self, websocket: WebSocket):
-        """Accept a new WebSocket connection."""
+    async def stop(self):
+        """Stop the event bus and close the event log."""
+        await self.bus.stop()
+        self.log.close()
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        offset: Optional[int] = None,
+        log_id: Optional[str] = None,
+    ):
+        """
+        Accept a new WebSocket connection.
+
+        Args:
+            websocket: The connection
+            offset: Last event offset a reconnecting client saw
+            log_id: Event log the offset belongs to (from the greeting)
+        """
         await websocket.accept()
-        self.active_connections.add(websocket)
+
+        client = DashboardClient(websocket, settings.ws_client_queue_size)
+        client.writer = asyncio.create_task(self._run_client(client))
+        self.active_connections[websocket] = client
         logger.info(f"New dashboard connection. Total: {len(self.active_connections)}")
 
         # Send initial state
-        await websocket.send_json({
+        self.send_to(websocket, {
             "type": "connection",
             "status": "connected",
             "timestamp": datetime.now().isoformat(),
-            "message": "Connected to Berenice AI Dashboard"
+            "message": "Connected to Berenice AI Dashboard",
+            "log_id": self.log.log_id,
+            "offset": self.log.offset,
+        })
+
+        # Queued before any live event, so the client sees no gap or duplicate
+        if offset is not None:
+            client.enqueue(self._replay_batch(offset, log_id))
+
+    def _replay_batch(self, offset: int, log_id: Optional[str]) -> str:
+        """
+        Build the message carrying the events a reconnecting client missed.
+
+        "complete" is false when the client must reload full state instead:
+        the offset belongs to another log or has been evicted from the buffer.
+        """
+        if log_id == self.log.log_id:
+            events, complete = self.log.since(offset)
+        else:
+            events, complete = [], False
+
+        logger.info(f"Replaying {len(events)} events from offset {offset} (complete={complete})")
+        header = json.dumps({
+            "type": "replay",
+            "log_id": self.log.log_id,
+            "from_offset": offset,
+            "offset": self.log.offset,
+            "complete": complete,
         })
+        return f'{header[:-1]}, "events": [{",".join(events)}]}}'
 
     def disconnect(self, websocket: WebSocket):
         """Remove a WebSocket connection."""
-        self.active_connections.discard(websocket)
+        client = self.active_connections.pop(websocket, None)
+        if client is None:
+            return
+
+        self.dropped_total += client.dropped
+        if client.writer and client.writer is not asyncio.current_task():
+            client.writer.cancel()
         logger.info(f"Dashboard disconnected. Remaining: {len(self.active_connections)}")
 
+    async def _run_client(self, client: DashboardClient):
+        """Writer task: drop the connection if sending fails or stalls."""
+        try:
+            await client.run()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to send message to dashboard: {e}")
+            self.disconnect(client.websocket)
+
+    def send_to(self, websocket: WebSocket, message: Dict[str, Any]):
+        """
+        Queue a message for a single dashboard connection.
+
+        Args:
+            websocket: Target connection
+            message: Message data
+        """
+        client = self.active_connections.get(websocket)
+        if client:
+            client.enqueue(json.dumps(message, default=str))
+
     async def broadcast(self, message: Dict[str, Any]):
         """
-        Broadcast a message to all connected dashboards.
+        Broadcast a message to all connected dashboards on every worker.
+
+        The message is serialized once and queued for every client; slow
+        clients never delay the caller or other clients.
 
         Args:
             message: Message data to broadcast
         """
+        self.sequence += 1
+        event = {"origin": self.origin, "seq": self.sequence, **message}
+        text = json.dumps(event, default=str)
+
+        self._fan_out(event, text)
+        self.bus.publish(text)
+
+    def _on_bus_event(self, text: str):
+        """Relay an event published by another worker to our clients."""
+        if text.startswith(self._origin_prefix):
+            return
+
+        try:
+            event = json.loads(text)
+        except ValueError:
+            logger.warning("Ignoring malformed event from the event bus")
+            return
+
+        self._fan_out(event, text)
+
+    def _fan_out(self, event: Dict[str, Any], text: str):
+        message_type = event.get("type")
+
+        if message_type not in UNLOGGED_TYPES:
+            # Prepend the offset to the already serialized event
+            text = f'{{"offset": {self.log.offset + 1}, {text[1:]}'
+            self.log.append(text)
+
         if not self.active_connections:
             return
 
-        disconnected = set()
+        coalesce_key = None
+        if message_type in COALESCED_TYPES:
+            coalesce_key = f"{event.get('origin')}:{message_type}:{event.get('phone', '')}"
 
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                logger.error(f"Failed to send message to dashboard: {e}")
-                disconnected.add(connection)
+        for client in self.active_connections.values():
+            client.enqueue(text, coalesce_key)
 
-        # Remove failed connections
-        for connection in disconnected:
-            self.disconnect(connection)
+    def stats(self) -> Dict[str, Any]:
+        """Return connection and queue metrics."""
+        depths = [len(client.queue) for client in self.active_connections.values()]
+        return {
+            "clients": len(self.active_connections),
+            "queued": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "sent": sum(client.sent for client in self.active_connections.values()),
+            "dropped": self.dropped_total + sum(
+                client.dropped for client in self.active_connections.values()
+            ),
+            "origin": self.origin,
+            "sequence": self.sequence,
+            "event_bus": self.bus.stats(),
+            "event_log": self.log.stats(),
+        }
 
     async def broadcast_incoming_message(
         self,
@@ -125,6 +322,21 @@ class WebSocketManager:
             "timestamp": datetime.now().isoformat(),
         })
 
+    async def broadcast_agent_stream(self, phone: str, delta: str):
+        """
+        Broadcast a chunk of the agent reply while it is being generated.
+
+        Args:
+            phone: Patient phone number
+            delta: Newly generated text
+        """
+        await self.broadcast({
+            "type": "agent_stream",
+            "phone": phone,
+            "delta": delta,
+            "timestamp": datetime.now().isoformat(),
+        })
+
     async def broadcast_stats(self, stats: Dict[str, Any]):
         """
         Broadcast system statistics.
@@ -1,13 +1,360 @@
 """
 Z-API Service for WhatsApp integration.
 """
+import asyncio
 import httpx
 import logging
-from typing import Dict, Any, Optional, List
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+from services import resilience_service as resilience
+from services import tracing_service as tracing
+from services.metrics_service import ZAPI_DURATION, ZAPI_REQUESTS
 from config.settings import settings
 
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Outbound priority classes, most urgent first
+PRIORITY_REPLY = 0
+PRIORITY_PRESENCE = 1
+PRIORITY_RECEIPT = 2
+PRIORITY_NAMES = {PRIORITY_REPLY: "replies", PRIORITY_PRESENCE: "presence", PRIORITY_RECEIPT: "receipts"}
+
+# Adaptive rate: halve on 429, recover slowly on success
+MIN_RATE_FACTOR = 0.1
+RATE_RECOVERY_STEP = 0.05
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def delay(self, now: float, rate: Optional[float] = None) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        rate = rate or self.rate
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+@dataclass
+class OutboundJob:
+    """A queued Z-API call and the callers waiting for its result."""
+
+    priority: int
+    phone: Optional[str]
+    call: Callable[[], Awaitable[Dict[str, Any]]]
+    futures: List[asyncio.Future] = field(default_factory=list)
+    coalesce_key: Optional[Hashable] = None
+    attempts: int = 0
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Parse a Retry-After header (seconds or HTTP date)."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class OutboundScheduler:
+    """
+    Smooths outbound Z-API calls instead of firing them as fast as possible.
+
+    Calls wait for a token from the global bucket and from their phone's
+    bucket, and are dispatched by priority class (replies, then presence
+    updates, then read receipts). A phone that is out of tokens does not
+    hold back other phones. On HTTP 429 the call is retried after
+    Retry-After (or an exponential backoff), all sends pause, and the
+    global rate is halved, recovering gradually as calls succeed.
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        global_burst: int,
+        phone_rate: float,
+        phone_burst: int,
+        max_retries: int,
+    ):
+        self.global_rate = global_rate
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.phone_rate = phone_rate
+        self.phone_burst = phone_burst
+        self.max_retries = max_retries
+        self.rate_factor = 1.0
+        self.paused_until = 0.0
+
+        self._queues: Dict[int, Deque[OutboundJob]] = {p: deque() for p in PRIORITY_NAMES}
+        self._pending: Dict[Hashable, OutboundJob] = {}
+        self._phone_buckets: Dict[str, TokenBucket] = {}
+        self._pruned_at = time.monotonic()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._running: set = set()
+
+        self.sent = 0
+        self.failed = 0
+        self.throttled = 0
+        self.coalesced = 0
+
+    def start(self):
+        """Start the dispatcher task."""
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch_loop())
+
+    async def stop(self, timeout: Optional[float] = None):
+        """
+        Stop dispatching, let in-flight calls finish and fail the queued ones.
+
+        Args:
+            timeout: Seconds to wait for in-flight calls before cancelling
+                them (defaults to settings.zapi_shutdown_timeout)
+        """
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+
+        if self._running:
+            running = list(self._running)
+            _, unfinished = await asyncio.wait(
+                running, timeout=settings.zapi_shutdown_timeout if timeout is None else timeout
+            )
+            if unfinished:
+                logger.warning(f"Cancelling {len(unfinished)} in-flight Z-API calls")
+                for task in unfinished:
+                    task.cancel()
+                await asyncio.gather(*unfinished, return_exceptions=True)
+
+        for queue in self._queues.values():
+            while queue:
+                self._resolve(queue.popleft(), error=RuntimeError("Z-API scheduler stopped"))
+        self._pending.clear()
+
+    async def submit(
+        self,
+        priority: int,
+        phone: Optional[str],
+        call: Callable[[], Awaitable[Dict[str, Any]]],
+        coalesce_key: Optional[Hashable] = None,
+    ) -> Dict[str, Any]:
+        """
+        Queue a call and wait for its result.
+
+        Args:
+            priority: PRIORITY_REPLY, PRIORITY_PRESENCE or PRIORITY_RECEIPT
+            phone: Phone the call is for (per-phone rate limit)
+            call: Performs the HTTP request
+            coalesce_key: A queued call with the same key is replaced by this
+                one, and both callers get the result of the newer call
+
+        Returns:
+            Response from Z-API
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+
+        job = self._pending.get(coalesce_key) if coalesce_key is not None else None
+        if job is not None:
+            job.call = call
+            job.futures.append(future)
+            self.coalesced += 1
+        else:
+            job = OutboundJob(priority, phone, call, [future], coalesce_key)
+            self._queues[priority].append(job)
+            if coalesce_key is not None:
+                self._pending[coalesce_key] = job
+
+        self._wakeup.set()
+        return await future
+
+    def _phone_bucket(self, phone: str) -> TokenBucket:
+        bucket = self._phone_buckets.get(phone)
+        if bucket is None:
+            bucket = self._phone_buckets[phone] = TokenBucket(self.phone_rate, self.phone_burst)
+        return bucket
+
+    def _prune_buckets(self, now: float):
+        """Forget buckets of idle phones so memory stays bounded."""
+        if now - self._pruned_at < 60:
+            return
+        self._pruned_at = now
+        queued = {job.phone for queue in self._queues.values() for job in queue}
+        for phone in [p for p, b in self._phone_buckets.items() if p not in queued and b.is_full(now)]:
+            del self._phone_buckets[phone]
+
+    def _next_job(self) -> Tuple[Optional[OutboundJob], Optional[float]]:
+        """
+        Pick the next dispatchable job.
+
+        Returns:
+            (job, None) if a job can go now, otherwise (None, seconds to wait
+            or None to wait for a new submission)
+        """
+        if not any(self._queues.values()):
+            return None, None
+
+        now = time.monotonic()
+        self._prune_buckets(now)
+        if now < self.paused_until:
+            return None, self.paused_until - now
+
+        global_delay = self.global_bucket.delay(now, self.global_rate * self.rate_factor)
+        if global_delay > 0:
+            return None, global_delay
+
+        wait = None
+        for priority in sorted(self._queues):
+            queue = self._queues[priority]
+            for index, job in enumerate(queue):
+                delay = self._phone_bucket(job.phone).delay(now) if job.phone else 0.0
+                if delay == 0.0:
+                    del queue[index]
+                    if job.coalesce_key is not None:
+                        self._pending.pop(job.coalesce_key, None)
+                    self.global_bucket.take()
+                    if job.phone:
+                        self._phone_buckets[job.phone].take()
+                    return job, None
+                wait = delay if wait is None else min(wait, delay)
+        return None, wait
+
+    async def _dispatch_loop(self):
+        while True:
+            self._wakeup.clear()
+            job, wait = self._next_job()
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self._run(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, job: OutboundJob):
+        job.attempts += 1
+        try:
+            result = await job.call()
+        except asyncio.CancelledError:
+            self._resolve(job, error=RuntimeError("Z-API scheduler stopped"))
+            raise
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 429 and job.attempts <= self.max_retries:
+                self._throttle(job, e.response)
+                return
+            self.failed += 1
+            self._resolve(job, error=e)
+        except Exception as e:
+            self.failed += 1
+            self._resolve(job, error=e)
+        else:
+            self.sent += 1
+            self.rate_factor = min(1.0, self.rate_factor + RATE_RECOVERY_STEP)
+            self._resolve(job, result=result)
+
+    def _throttle(self, job: OutboundJob, response: httpx.Response):
+        """
+        Back off after a 429 and put the job back at the front of its class,
+        where later calls with its coalesce key are merged into it again.
+        """
+        delay = retry_after_seconds(response)
+        if delay is None:
+            delay = settings.zapi_backoff_base * 2 ** (job.attempts - 1)
+        delay = min(delay, settings.zapi_backoff_max)
+
+        self.throttled += 1
+        self.rate_factor = max(MIN_RATE_FACTOR, self.rate_factor / 2)
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        logger.warning(
+            f"Z-API rate limited (attempt {job.attempts}), pausing {delay:.1f}s; "
+            f"rate now {self.global_rate * self.rate_factor:.1f}/s"
+        )
+
+        if job.coalesce_key is not None:
+            newer = self._pending.get(job.coalesce_key)
+            if newer is not None:
+                # A newer call with the same key was queued meanwhile and
+                # supersedes this one
+                newer.futures.extend(job.futures)
+                self.coalesced += 1
+                self._wakeup.set()
+                return
+            self._pending[job.coalesce_key] = job
+
+        self._queues[job.priority].appendleft(job)
+        self._wakeup.set()
+
+    @staticmethod
+    def _resolve(job: OutboundJob, result: Any = None, error: Optional[BaseException] = None):
+        for future in job.futures:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": {name: len(self._queues[p]) for p, name in PRIORITY_NAMES.items()},
+            "in_flight": len(self._running),
+            "sent": self.sent,
+            "failed": self.failed,
+            "throttled": self.throttled,
+            "coalesced": self.coalesced,
+            "rate_per_second": round(self.global_rate * self.rate_factor, 2),
+            "paused_for": round(max(self.paused_until - time.monotonic(), 0.0), 2),
+            "tracked_phones": len(self._phone_buckets),
+        }
+
+
+def is_zapi_failure(error: BaseException) -> bool:
+    """Client errors (4xx, including 429) do not mean Z-API is down."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return True
+
+
+ZAPI_RETRY_POLICY = resilience.RetryPolicy(
+    attempts=settings.resilience_retry_attempts,
+    base_delay=settings.resilience_retry_base_delay,
+    max_delay=settings.resilience_retry_max_delay,
+    retry_on=(httpx.TransportError, httpx.HTTPStatusError),
+)
+
 
 class ZAPIService:
     """Client for Z-API WhatsApp integration."""
@@ -31,6 +378,205 @@ class ZAPIService:
 
         self.base_url = f"{self.base_url}/instances/{self.instance_id}/token/{self.token}"
         self.headers = {"Client-Token": self.client_token, "Content-Type": "application/json"}
+        self.client: Optional[httpx.AsyncClient] = None
+        self.scheduler: Optional[OutboundScheduler] = None
+        if settings.zapi_rate_limit_enabled:
+            self.scheduler = OutboundScheduler(
+                global_rate=settings.zapi_global_rate,
+                global_burst=settings.zapi_global_burst,
+                phone_rate=settings.zapi_phone_rate,
+                phone_burst=settings.zapi_phone_burst,
+                max_retries=settings.zapi_max_retries_429,
+            )
+        # Last presence sent per phone: (status, monotonic time)
+        self._presence: Dict[str, Tuple[str, float]] = {}
+
+    def _build_client(self) -> httpx.AsyncClient:
+        """Create the pooled HTTP client shared by all Z-API calls."""
+        http2 = settings.zapi_http2 and HTTP2_AVAILABLE
+        if settings.zapi_http2 and not HTTP2_AVAILABLE:
+            logger.warning("HTTP/2 requested but 'h2' is not installed, using HTTP/1.1")
+
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.zapi_max_connections,
+                max_keepalive_connections=settings.zapi_max_keepalive_connections,
+                keepalive_expiry=settings.zapi_keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                settings.zapi_send_timeout, connect=settings.zapi_connect_timeout
+            ),
+        )
+
+    async def start(self):
+        """Open the long-lived HTTP client (called from the app lifespan)."""
+        if self.client is None or self.client.is_closed:
+            self.client = self._build_client()
+            logger.info("Z-API HTTP client started")
+        if self.scheduler:
+            self.scheduler.start()
+
+    async def close(self):
+        """Close the HTTP client and release pooled connections."""
+        if self.scheduler:
+            await self.scheduler.stop()
+        if self.client is not None and not self.client.is_closed:
+            await self.client.aclose()
+            logger.info("Z-API HTTP client closed")
+        self.client = None
+
+    async def _request(
+        self,
+        method: str,
+        endpoint: str,
+        timeout: float,
+        json: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        idempotent: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Perform a request against the Z-API instance using the pooled client.
+
+        Runs under the "zapi" circuit breaker and the current deadline.
+        Idempotent requests are retried on connection errors and 5xx.
+
+        Args:
+            method: HTTP method
+            endpoint: Endpoint path relative to the instance URL (e.g. "send-text")
+            timeout: Read/write timeout for this endpoint
+            json: JSON payload
+            params: Query parameters
+            idempotent: Safe to repeat (presence, read receipts, GETs)
+
+        Returns:
+            Decoded JSON response
+        """
+        if self.client is None or self.client.is_closed:
+            # Allows use outside the app lifespan (scripts, tests)
+            await self.start()
+
+        attributes = {"http.request.method": method, "zapi.endpoint": endpoint}
+        with tracing.tracer.span(f"zapi.{endpoint}", kind="client", attributes=attributes) as span:
+            attempts = 0
+
+            async def attempt() -> Dict[str, Any]:
+                nonlocal attempts
+                attempts += 1
+                span.set_attribute("zapi.attempts", attempts)
+                request_timeout = resilience.effective_timeout(timeout)
+                start = time.perf_counter()
+                status = "error"
+                try:
+                    response = await self.client.request(
+                        method,
+                        f"/{endpoint}",
+                        json=json,
+                        params=params,
+                        timeout=httpx.Timeout(request_timeout, connect=settings.zapi_connect_timeout),
+                    )
+                    status = str(response.status_code)
+                finally:
+                    ZAPI_REQUESTS.inc(endpoint=endpoint, status=status)
+                    ZAPI_DURATION.observe(time.perf_counter() - start, endpoint=endpoint)
+                span.set_attribute("http.response.status_code", response.status_code)
+                response.raise_for_status()
+                return response.json()
+
+            return await resilience.call(
+                "zapi",
+                attempt,
+                retry=ZAPI_RETRY_POLICY if idempotent else None,
+                is_failure=is_zapi_failure,
+            )
+
+    async def _send(
+        self,
+        endpoint: str,
+        timeout: float,
+        payload: Dict[str, Any],
+        priority: int,
+        coalesce_key: Optional[Hashable] = None,
+        on_success: Optional[Callable[[], None]] = None,
+        idempotent: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        POST through the outbound scheduler (or directly if rate limiting is off).
+
+        Args:
+            endpoint: Endpoint path relative to the instance URL
+            timeout: Read/write timeout for this endpoint
+            payload: JSON payload (its "phone" selects the per-phone bucket)
+            priority: Priority class
+            coalesce_key: Replace a queued call with the same key
+            on_success: Called after the request succeeded
+            idempotent: Safe to retry
+
+        Returns:
+            Decoded JSON response
+        """
+        # The call runs in the scheduler's task, so carry the caller's deadline
+        # and span over
+        caller_deadline = resilience.current_deadline()
+        caller_span = tracing.current_span()
+
+        async def call() -> Dict[str, Any]:
+            with resilience.use_deadline(caller_deadline), tracing.use_span(caller_span):
+                result = await self._request(
+                    "POST", endpoint, timeout=timeout, json=payload, idempotent=idempotent
+                )
+            if on_success:
+                on_success()
+            return result
+
+        if self.scheduler is None:
+            return await call()
+        return await self.scheduler.submit(priority, payload.get("phone"), call, coalesce_key)
+
+    async def _send_reply(self, endpoint: str, timeout: float, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a message; WhatsApp clears the typing indicator when it arrives."""
+        phone = payload["phone"]
+        return await self._send(
+            endpoint, timeout, payload, PRIORITY_REPLY,
+            on_success=lambda: self._presence.pop(phone, None),
+        )
+
+    async def _set_presence(self, phone: str, status: str) -> Dict[str, Any]:
+        """
+        Send a presence update, skipping it if the same status was sent recently.
+
+        A queued update for the same phone is replaced by the newer one.
+        """
+        now = time.monotonic()
+        last = self._presence.get(phone)
+        if last and last[0] == status and now - last[1] < settings.zapi_presence_ttl:
+            return {"coalesced": True}
+
+        if len(self._presence) > 10000:
+            self._presence = {
+                p: v for p, v in self._presence.items() if now - v[1] < settings.zapi_presence_ttl
+            }
+
+        def remember():
+            self._presence[phone] = (status, time.monotonic())
+
+        return await self._send(
+            "send-presence",
+            settings.zapi_presence_timeout,
+            {"phone": phone, "status": status},
+            PRIORITY_PRESENCE,
+            coalesce_key=("presence", phone),
+            on_success=remember,
+            idempotent=True,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Outbound scheduler metrics."""
+        if self.scheduler is None:
+            return {"rate_limited": False}
+        return {"rate_limited": True, **self.scheduler.stats()}
 
     async def send_text(
         self, phone: str, message: str
@@ -45,17 +591,14 @@ class ZAPIService:
         Returns:
             Response from Z-API
         """
-        url = f"{self.base_url}/send-text"
         payload = {"phone": phone, "message": message}
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url, json=payload, headers=self.headers, timeout=30.0
-                )
-                response.raise_for_status()
-                logger.info(f"Message sent to {phone}")
-                return response.json()
+            result = await self._send_reply(
+                "send-text", settings.zapi_send_timeout, payload
+            )
+            logger.info(f"Message sent to {phone}")
+            return result
         except httpx.HTTPError as e:
             logger.error(f"Failed to send message to {phone}: {e}")
             raise
@@ -74,20 +617,17 @@ class ZAPIService:
         Returns:
             Response from Z-API
         """
-        url = f"{self.base_url}/send-image"
         payload = {"phone": phone, "image": image_url}
 
         if caption:
             payload["caption"] = caption
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url, json=payload, headers=self.headers, timeout=30.0
-                )
-                response.raise_for_status()
-                logger.info(f"Image sent to {phone}")
-                return response.json()
+            result = await self._send_reply(
+                "send-image", settings.zapi_media_timeout, payload
+            )
+            logger.info(f"Image sent to {phone}")
+            return result
         except httpx.HTTPError as e:
             logger.error(f"Failed to send image to {phone}: {e}")
             raise
@@ -107,20 +647,17 @@ class ZAPIService:
         Returns:
             Response from Z-API
         """
-        url = f"{self.base_url}/send-document"
         payload = {"phone": phone, "document": file_url, "fileName": filename}
 
         if caption:
             payload["caption"] = caption
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url, json=payload, headers=self.headers, timeout=30.0
-                )
-                response.raise_for_status()
-                logger.info(f"File sent to {phone}")
-                return response.json()
+            result = await self._send_reply(
+                "send-document", settings.zapi_media_timeout, payload
+            )
+            logger.info(f"File sent to {phone}")
+            return result
         except httpx.HTTPError as e:
             logger.error(f"Failed to send file to {phone}: {e}")
             raise
@@ -144,7 +681,6 @@ class ZAPIService:
         Returns:
             Response from Z-API
         """
-        url = f"{self.base_url}/send-button-list"
         payload = {
             "phone": phone,
             "title": title,
@@ -153,13 +689,11 @@ class ZAPIService:
         }
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url, json=payload, headers=self.headers, timeout=30.0
-                )
-                response.raise_for_status()
-                logger.info(f"Button list sent to {phone}")
-                return response.json()
+            result = await self._send_reply(
+                "send-button-list", settings.zapi_send_timeout, payload
+            )
+            logger.info(f"Button list sent to {phone}")
+            return result
         except httpx.HTTPError as e:
             logger.error(f"Failed to send button list to {phone}: {e}")
             raise
@@ -175,16 +709,13 @@ class ZAPIService:
         Returns:
             Response from Z-API
         """
-        url = f"{self.base_url}/read-message"
         payload = {"phone": phone, "messageId": message_id}
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url, json=payload, headers=self.headers, timeout=30.0
-                )
-                response.raise_for_status()
-                return response.json()
+            return await self._send(
+                "read-message", settings.zapi_read_timeout, payload, PRIORITY_RECEIPT,
+                idempotent=True,
+            )
         except httpx.HTTPError as e:
             logger.error(f"Failed to mark message as read: {e}")
             raise
@@ -199,16 +730,8 @@ class ZAPIService:
         Returns:
             Response from Z-API
         """
-        url = f"{self.base_url}/send-presence"
-        payload = {"phone": phone, "status": "composing"}
-
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url, json=payload, headers=self.headers, timeout=30.0
-                )
-                response.raise_for_status()
-                return response.json()
+            return await self._set_presence(phone, "composing")
         except httpx.HTTPError as e:
             logger.error(f"Failed to set typing status: {e}")
             raise
@@ -223,16 +746,8 @@ class ZAPIService:
         Returns:
             Response from Z-API
         """
-        url = f"{self.base_url}/send-presence"
-        payload = {"phone": phone, "status": "available"}
-
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url, json=payload, headers=self.headers, timeout=30.0
-                )
-                response.raise_for_status()
-                return response.json()
+            return await self._set_presence(phone, "available")
         except httpx.HTTPError as e:
             logger.error(f"Failed to clear typing status: {e}")
             raise
@@ -247,16 +762,16 @@ class ZAPIService:
         Returns:
             Response from Z-API with profile picture URL
         """
-        url = f"{self.base_url}/profile-picture"
         params = {"phone": phone}
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    url, params=params, headers=self.headers, timeout=30.0
-                )
-                response.raise_for_status()
-                return response.json()
+            return await self._request(
+                "GET",
+                "profile-picture",
+                timeout=settings.zapi_read_timeout,
+                params=params,
+                idempotent=True,
+            )
         except httpx.HTTPError as e:
             logger.error(f"Failed to get profile picture: {e}")
             raise
@@ -0,0 +1,118 @@
+"""
+Conversation store tests.
+
+The Redis store runs against fakeredis; the in-memory store runs the same
+checks as the reference behaviour.
+"""
+import asyncio
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from services.conversation_service import InMemoryConversationStore, RedisConversationStore  # noqa: E402
+
+BACKENDS = ["memory", "redis"]
+
+
+def make_store(backend: str, ttl: float = 3600.0, server=None):
+    if backend == "memory":
+        return InMemoryConversationStore(ttl)
+    client = fakeredis.FakeAsyncRedis(server=server or fakeredis.FakeServer(), decode_responses=True)
+    return RedisConversationStore(ttl, client=client, prefix="test:")
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_touch_creates_then_updates(backend):
+    async def scenario():
+        store = make_store(backend)
+        is_new, state = await store.touch("5511999990001", "Ana")
+        assert is_new
+        assert state["messages_count"] == 1
+        assert state["patient_name"] == "Ana"
+
+        is_new, updated = await store.touch("5511999990001", "Ana Souza")
+        assert not is_new
+        assert updated["messages_count"] == 2
+        assert updated["patient_name"] == "Ana Souza"
+        assert updated["started_at"] == state["started_at"]
+        assert updated["last_activity"] >= state["last_activity"]
+        assert await store.get("5511999990001") == updated
+        await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_redis_concurrent_touches_from_several_workers():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        workers = [make_store("redis", server=server) for _ in range(4)]
+        results = await asyncio.gather(*(
+            workers[i % len(workers)].touch("5511999990001", "Ana") for i in range(100)
+        ))
+
+        assert sum(is_new for is_new, _ in results) == 1
+        assert sorted(state["messages_count"] for _, state in results) == list(range(1, 101))
+        assert (await workers[0].get("5511999990001"))["messages_count"] == 100
+        assert await workers[1].count() == 1
+        for worker in workers:
+            await worker.close()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_idle_conversations_expire(backend):
+    async def scenario():
+        store = make_store(backend, ttl=1)
+        await store.touch("5511999990001", "Ana")
+        assert await store.count() == 1
+
+        await asyncio.sleep(1.2)
+        assert await store.get("5511999990001") is None
+        assert await store.list() == []
+        assert await store.count() == 0
+
+        is_new, state = await store.touch("5511999990001", "Ana")
+        assert is_new
+        assert state["messages_count"] == 1
+        await store.close()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_list_orders_by_last_activity(backend):
+    async def scenario():
+        store = make_store(backend)
+        for phone in ["5511000000001", "5511000000002", "5511000000003"]:
+            await store.touch(phone, f"Paciente {phone[-1]}")
+            await asyncio.sleep(0.01)
+        await store.touch("5511000000001", "Paciente 1")
+
+        states = await store.list()
+        assert [s["phone"] for s in states] == ["5511000000001", "5511000000003", "5511000000002"]
+        assert [s["messages_count"] for s in states] == [2, 1, 1]
+        assert states[1]["patient_name"] == "Paciente 3"
+        assert [s["phone"] for s in await store.list(limit=2)] == ["5511000000001", "5511000000003"]
+
+        assert await store.delete("5511000000003")
+        assert not await store.delete("5511000000003")
+        assert [s["phone"] for s in await store.list()] == ["5511000000001", "5511000000002"]
+        assert await store.count() == 2
+        await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_redis_list_skips_index_entries_without_state():
+    async def scenario():
+        store = make_store("redis")
+        await store.touch("5511000000001", "Ana")
+        await store.touch("5511000000002", "Bia")
+        # The hash expired (or was removed) before the index was pruned
+        await store.client.delete(store._key("5511000000001"))
+
+        assert [s["phone"] for s in await store.list()] == ["5511000000002"]
+        await store.close()
+
+    asyncio.run(scenario())